@@ -61,6 +61,15 @@ class LW_process:
         self.__process = process
 
 
+CLI_COMMANDS: dict[str, str] = {
+    'bloom': 'rebuild bloom filter of read books history and report its false positive rate',
+    'dedup': 'find books with the same content in library',
+    'dedup-link': 'find books with the same content in library and replace extra copies with hard links'
+}
+"""
+Commands, which are run instead of the application.
+"""
+
 __console_process: LW_process = None
 __browser_process: LW_process = None
 
@@ -129,6 +138,24 @@ def __start_app():
         raise Exception(f'Start app functionality failed due to - {e}')
 
 
+def __run_command(command: str):
+    """
+    Run one of cli commands and exit
+    :param command: name of command
+    :return: None
+    """
+    if command not in CLI_COMMANDS:
+        print(f'Unknown command "{command}", available commands:')
+        for name, description in CLI_COMMANDS.items():
+            print(f'  {name} - {description}')
+        return
+    bootloader = BootLoader(logger=__global_logger, app_config=__app_config)
+    if command == 'bloom':
+        bootloader.run_bloom_report()
+    elif command in ('dedup', 'dedup-link'):
+        bootloader.run_dedup_report(hard_link=command == 'dedup-link')
+
+
 def __clean_app_entities():
     """
     Delete app entities in case of error or finish
@@ -150,7 +177,10 @@ if __name__ == '__main__':
         print(f'"{APP_NAME}" utility starting')
         __init_app_entities()
         __init_app()
-        __start_app()
+        if len(sys.argv) > 1:
+            __run_command(sys.argv[1])
+        else:
+            __start_app()
     except Exception as e:
         print(f'All functionality failed with exception - {e}, app exiting')
         __clean_app_entities()
@@ -5,7 +5,15 @@ from pathlib import Path
 from typing import Final
 
 from core.entities.BotLogger import BotLogger
-from data.Constants import INPUT_SYM, STATIC_DIR_NAME_FOR_FAV
+from data.Constants import (
+    INPUT_SYM,
+    STATIC_DIR_NAME_FOR_FAV,
+    STATIC_FAVOURITE_INDEX_NAME,
+    STATIC_HISTORY_DB_NAME,
+    STATIC_LIBRARY_INDEX_NAME,
+    STATIC_OUTBOX_NAME,
+    STATIC_REMOTE_CACHE_NAME
+)
 
 
 class Config_param_names(Enum):
@@ -17,6 +25,10 @@ class Config_param_names(Enum):
     ENABLE_LOGS = 'is_enable_logs'
     EXCLUDE_DIRS = 'exclude_directories'
     CENTRAL_DIR = 'central_dir'
+    HISTORY_STORAGE = 'history_storage'
+    COMPACTION_THRESHOLD = 'compaction_threshold'
+    REMOTE_CACHE_TTL = 'remote_cache_ttl'
+    BACKUP_CODEC = 'backup_codec'
 
 
 class SingletonMeta(type):
@@ -75,6 +87,26 @@ class App_config(metaclass=SingletonMeta):
 
     __is_multithread: bool
 
+    __history_storage: str
+    """
+    Storage mode of history in Memorize module, 'only-local' (read file) or 'sqlite'.
+    """
+
+    __compaction_threshold: float
+    """
+    Share of removed lines in read file, after which file is rewritten without them.
+    """
+
+    __remote_cache_ttl: float
+    """
+    Seconds, during which cached answer of remote storage is used without revalidation.
+    """
+
+    __backup_codec: str
+    """
+    Compression of books in archive backup - gzip, xz or zstd.
+    """
+
     __global_logger: Final[BotLogger] = BotLogger()
     """
     Global instance of logger class.
@@ -82,7 +114,9 @@ class App_config(metaclass=SingletonMeta):
     """
 
     def __init__(self, run_os: str, read_book_file_name: str = 'read.txt', config_file_name: str = 'config.txt',
-                 is_auto: bool = True, is_logs: bool = False, is_multithread: bool = False, exclude_dirs: list = None):
+                 is_auto: bool = True, is_logs: bool = False, is_multithread: bool = False, exclude_dirs: list = None,
+                 history_storage: str = 'only-local', compaction_threshold: float = 0.25,
+                 remote_cache_ttl: float = 300.0, backup_codec: str = 'gzip'):
         # Main config parameters:
         self.__run_os = run_os
         self.__central_dir = self.path_to_dir_with_app()  # get current directory
@@ -95,6 +129,10 @@ class App_config(metaclass=SingletonMeta):
         self.__is_enable_logs = is_logs  # turn off if you want to disable logs
         self.__is_multithread = is_multithread
         self.__exclude_directories = exclude_dirs
+        self.__history_storage = history_storage
+        self.__compaction_threshold = compaction_threshold
+        self.__remote_cache_ttl = remote_cache_ttl
+        self.__backup_codec = backup_codec
 
     def get_help_config(self) -> None:
         print('App config help.')
@@ -104,6 +142,10 @@ class App_config(metaclass=SingletonMeta):
         print('3. is_enable_logs - turn on of off logs in application,')
         print('4. exclude_directories - which directories to ignore by book search.')
         print('5. home directory - start directory of the app work.')
+        print('6. history_storage - where history is stored, only-local (read file), sqlite or all (with drives).')
+        print('7. compaction_threshold - share of removed books in read file, after which it is rewritten.')
+        print('8. remote_cache_ttl - seconds, during which answers of remote storages are not revalidated.')
+        print('9. backup_codec - compression of books in archive backup, gzip, xz or zstd (with zstandard package).')
         print('How to write config file:')
         print('Write in config file next lines')
 
@@ -111,6 +153,10 @@ class App_config(metaclass=SingletonMeta):
         print('is_auto_mode: <true or false values>')
         print('is_enable_logs: <true or false values>')
         print('exclude_directories: <one_dir_name, second_dir_name, third_dir_name> (list with dirs names)')
+        print('history_storage: <only-local, sqlite or all values>')
+        print('compaction_threshold: <number from 0 to 1>')
+        print('remote_cache_ttl: <number of seconds>')
+        print('backup_codec: <gzip, xz or zstd values>')
         if not os.path.exists(self.__config_name):
             print('Config is not exits')
             while True:
@@ -125,6 +171,21 @@ class App_config(metaclass=SingletonMeta):
     def path_to_read_file(self) -> str:
         return self.__central_dir + self.__read_book_file
 
+    def path_to_history_db(self) -> str:
+        return self.__central_dir + STATIC_HISTORY_DB_NAME
+
+    def path_to_outbox(self) -> str:
+        return self.__central_dir + STATIC_OUTBOX_NAME
+
+    def path_to_remote_cache(self) -> str:
+        return self.__central_dir + STATIC_REMOTE_CACHE_NAME
+
+    def path_to_library_index(self) -> str:
+        return self.__central_dir + STATIC_LIBRARY_INDEX_NAME
+
+    def path_to_favourite_index(self) -> str:
+        return self.__central_dir + STATIC_FAVOURITE_INDEX_NAME
+
     def init_config(self, config_file_path: str) -> None:
         """
         Initialize app by given config.
@@ -151,6 +212,14 @@ class App_config(metaclass=SingletonMeta):
                         elif name == Config_param_names.CENTRAL_DIR.value:
                             if value == 'None':
                                 self.__central_dir = ""
+                        elif name == Config_param_names.HISTORY_STORAGE.value:
+                            self.__history_storage = value
+                        elif name == Config_param_names.COMPACTION_THRESHOLD.value:
+                            self.__compaction_threshold = float(value)
+                        elif name == Config_param_names.REMOTE_CACHE_TTL.value:
+                            self.__remote_cache_ttl = float(value)
+                        elif name == Config_param_names.BACKUP_CODEC.value:
+                            self.__backup_codec = value
                         else:
                             raise Exception(f'Wrong config parameter - {line}')
                     else:
@@ -212,6 +281,30 @@ class App_config(metaclass=SingletonMeta):
         else:
             raise Exception('Multithread mode is None')
 
+    def get_history_storage(self):
+        if self.__history_storage is not None:
+            return self.__history_storage
+        else:
+            raise Exception('History storage mode is None')
+
+    def get_compaction_threshold(self):
+        if self.__compaction_threshold is not None:
+            return self.__compaction_threshold
+        else:
+            raise Exception('Compaction threshold is None')
+
+    def get_remote_cache_ttl(self):
+        if self.__remote_cache_ttl is not None:
+            return self.__remote_cache_ttl
+        else:
+            raise Exception('Remote cache ttl is None')
+
+    def get_backup_codec(self):
+        if self.__backup_codec is not None:
+            return self.__backup_codec
+        else:
+            raise Exception('Backup codec is None')
+
     def get_logger(self):
         return self.__global_logger
 
@@ -234,6 +327,14 @@ class App_config(metaclass=SingletonMeta):
                 tmp_config.write('\n')
                 tmp_config.write(f'{Config_param_names.CENTRAL_DIR.value}: None')
                 tmp_config.write('\n')
+                tmp_config.write(f'{Config_param_names.HISTORY_STORAGE.value}: only-local')
+                tmp_config.write('\n')
+                tmp_config.write(f'{Config_param_names.COMPACTION_THRESHOLD.value}: 0.25')
+                tmp_config.write('\n')
+                tmp_config.write(f'{Config_param_names.REMOTE_CACHE_TTL.value}: 300')
+                tmp_config.write('\n')
+                tmp_config.write(f'{Config_param_names.BACKUP_CODEC.value}: gzip')
+                tmp_config.write('\n')
             print('Config file created successfully with default parameters in it')
         except Exception as e:
             print(f'Exception in create config file - {e}, file not created')
@@ -267,6 +368,10 @@ class App_config_builder:
         self._is_logs: bool = False
         self._is_multithread: bool = False
         self._exclude_dirs: list = None
+        self._history_storage: str = 'only-local'
+        self._compaction_threshold: float = 0.25
+        self._remote_cache_ttl: float = 300.0
+        self._backup_codec: str = 'gzip'
 
     def set_run_os(self, os_name: str) -> 'App_config_builder':
         self._run_os = os_name
@@ -296,6 +401,22 @@ class App_config_builder:
         self._exclude_dirs = dirs
         return self
 
+    def set_history_storage(self, mode: str) -> 'App_config_builder':
+        self._history_storage = mode
+        return self
+
+    def set_compaction_threshold(self, threshold: float) -> 'App_config_builder':
+        self._compaction_threshold = threshold
+        return self
+
+    def set_remote_cache_ttl(self, ttl: float) -> 'App_config_builder':
+        self._remote_cache_ttl = ttl
+        return self
+
+    def set_backup_codec(self, codec: str) -> 'App_config_builder':
+        self._backup_codec = codec
+        return self
+
     def build(self) -> 'App_config':
         return App_config(
             run_os=self._run_os,
@@ -304,5 +425,9 @@ class App_config_builder:
             is_auto=self._is_auto,
             is_logs=self._is_logs,
             is_multithread=self._is_multithread,
-            exclude_dirs=self._exclude_dirs
+            exclude_dirs=self._exclude_dirs,
+            history_storage=self._history_storage,
+            compaction_threshold=self._compaction_threshold,
+            remote_cache_ttl=self._remote_cache_ttl,
+            backup_codec=self._backup_codec
         )
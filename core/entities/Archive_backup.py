@@ -0,0 +1,265 @@
+"""
+Backup of library into one tar archive.
+
+Every book is compressed separately and stored as tar member with suffix of codec, already compressed formats
+are stored as is. Tar itself is not compressed, so one book is read back by seeking over headers of other members
+without decompressing them. Books are read and compressed in thread pool (compressors release GIL),
+written in order by calling thread, compressed data is spooled to temporary files, so memory use is bounded.
+"""
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor
+)
+from typing import (
+    Any,
+    NamedTuple
+)
+
+from core.entities.Library_scanner import Library_scanner
+
+try:
+    import zstandard
+except ImportError:  # zstd codec is available only with zstandard package
+    zstandard = None
+
+_CHUNK_SIZE: int = 1024 * 1024
+
+_TMP_SUFFIX: str = '.tmp'
+
+_SPOOL_SIZE: int = 8 * 1024 * 1024
+"""
+Compressed data bigger than this is spooled from memory to temporary file.
+"""
+
+STORED_EXTENSIONS: frozenset[str] = frozenset({'zip', 'epub', 'cbz', 'cbr', 'djvu', 'rar', '7z', 'gz', 'xz', 'zst',
+                                               'bz2', 'jpg', 'jpeg', 'png', 'mp3', 'm4b'})
+"""
+Formats, which are compressed already, so they are stored in archive as is.
+"""
+
+_XZ_MIN_DICT_SIZE: int = 4096
+
+_XZ_MAX_DICT_SIZE: int = 8 * 1024 * 1024
+"""
+Dictionary size of xz default preset.
+"""
+
+CODEC_SUFFIXES: dict[str, str] = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+_CODEC_HEADER: str = 'BOOKMANAGER.codec'
+"""
+PAX header of member with codec of compressed book, stored books have no such header.
+"""
+
+
+class Archive_report(NamedTuple):
+    files: int
+    stored: int
+    """
+    Count of files stored without compression.
+    """
+    bytes_read: int
+    bytes_written: int
+    seconds: float
+
+    def __str__(self) -> str:
+        ratio = self.bytes_written / self.bytes_read if self.bytes_read > 0 else 1.0
+        return (f'{self.files} files ({self.stored} stored as is), {self.bytes_read / 1024 / 1024:.1f} MB into '
+                f'{self.bytes_written / 1024 / 1024:.1f} MB ({ratio:.0%}) in {self.seconds:.2f} s')
+
+
+def available_codecs() -> list[str]:
+    return [codec for codec in CODEC_SUFFIXES if codec != 'zstd' or zstandard is not None]
+
+
+def _compressor(codec: str, level: int | None, size: int) -> Any:
+    """
+    Make compressor for file of given size
+    """
+    if codec == 'gzip':
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if codec == 'xz':
+        # dictionary bigger than file does not improve ratio, but xz encoder takes ten dictionaries of memory
+        preset = 6 if level is None else level
+        return lzma.LZMACompressor(filters=[{'id': lzma.FILTER_LZMA2, 'preset': preset,
+                                             'dict_size': max(min(size, _XZ_MAX_DICT_SIZE), _XZ_MIN_DICT_SIZE)}])
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+
+
+def _decompressor(codec: str) -> Any:
+    if codec == 'gzip':
+        return zlib.decompressobj(31)
+    if codec == 'xz':
+        return lzma.LZMADecompressor()
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class Archive_backup:
+    """
+    Tar archive of library with books compressed one by one. Hidden directories of library are not archived.
+    """
+
+    def __init__(self, archive_path: str | os.PathLike, logger, codec: str = 'gzip', level: int | None = None,
+                 max_workers: int = 4):
+        """
+        Archive backup constructor
+        :param archive_path: path to tar archive
+        :param logger: logger instance
+        :param codec: *optional, compression of books - gzip, xz or zstd (if zstandard package is installed)
+        :param level: *optional, compression level of codec, default level of codec is used if not given
+        :param max_workers: *optional, count of books read and compressed at the same time
+        """
+        if codec not in available_codecs():
+            raise Exception(f'Codec {codec} is not available, available codecs - {available_codecs()}')
+        self.archive_path = archive_path
+        self.local_logger = logger
+        self.codec = codec
+        self.level = level
+        self.max_workers = max_workers
+
+    @staticmethod
+    def is_stored(name: str) -> bool:
+        return os.path.splitext(name)[1][1:].lower() in STORED_EXTENSIONS
+
+    def __compress(self, path: str, name: str) -> tuple[tarfile.TarInfo, Any, int]:
+        """
+        Read and compress one book into spooled file
+        :return: tar header of member, file with member data and size of source file
+        """
+        stat = os.stat(path)
+        is_stored = self.is_stored(name)
+        info = tarfile.TarInfo(name if is_stored else name + CODEC_SUFFIXES[self.codec])
+        if not is_stored:
+            info.pax_headers = {_CODEC_HEADER: self.codec}
+        info.mtime = stat.st_mtime
+        info.mode = stat.st_mode & 0o777
+        spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+        try:
+            with open(path, 'rb') as book_file:
+                if is_stored:
+                    shutil.copyfileobj(book_file, spool, _CHUNK_SIZE)
+                else:
+                    compressor = _compressor(self.codec, self.level, stat.st_size)
+                    while chunk := book_file.read(_CHUNK_SIZE):
+                        spool.write(compressor.compress(chunk))
+                    spool.write(compressor.flush())
+            info.size = spool.tell()
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+        return info, spool, stat.st_size
+
+    def create(self, source: str | os.PathLike) -> Archive_report:
+        """
+        Write library into archive, archive is replaced, when it is complete
+        :param source: library directory
+        :return: archive report
+        """
+        started = time.perf_counter()
+        source = os.path.abspath(source)
+        if os.path.commonpath([source, os.path.abspath(self.archive_path)]) == source:
+            raise Exception(f'Archive {self.archive_path} cannot be inside library {source}')
+        books = [(os.path.join(directory.path, file.name), os.path.normpath(os.path.join(directory.name, file.name)))
+                 for directory in Library_scanner(source).scan() for file in directory.files]
+        files = stored = bytes_read = 0
+        tmp_path = str(self.archive_path) + _TMP_SUFFIX
+        in_flight: deque[tuple[str, Future]] = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='archive-backup') as executor, \
+                    tarfile.open(tmp_path, 'w', format=tarfile.PAX_FORMAT) as archive:
+                books_iterator = iter(books)
+
+                def submit_next() -> None:
+                    book = next(books_iterator, None)
+                    if book is not None:
+                        in_flight.append((book[1], executor.submit(self.__compress, *book)))
+
+                for _ in range(2 * self.max_workers):  # books compressed ahead of writer
+                    submit_next()
+                while len(in_flight) > 0:
+                    name, future = in_flight.popleft()
+                    submit_next()
+                    try:
+                        info, spool, size = future.result()
+                    except OSError as e:
+                        self.local_logger.log(f'Book {name} cannot be archived - {e}')
+                        continue
+                    with spool:
+                        archive.addfile(info, spool)
+                    files += 1
+                    stored += _CODEC_HEADER not in info.pax_headers
+                    bytes_read += size
+            os.replace(tmp_path, self.archive_path)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        report = Archive_report(files, stored, bytes_read, os.path.getsize(self.archive_path),
+                                time.perf_counter() - started)
+        self.local_logger.log(f'Library {source} archived into {self.archive_path} - {report}')
+        return report
+
+    @staticmethod
+    def __book_name(member: tarfile.TarInfo) -> tuple[str, str | None]:
+        """
+        Get path of book in library and codec of member, None for stored book
+        """
+        codec = member.pax_headers.get(_CODEC_HEADER)
+        if codec is None:
+            return member.name, None
+        return member.name[:len(member.name) - len(CODEC_SUFFIXES[codec])], codec
+
+    def list_books(self) -> list[str]:
+        """
+        List books in archive, only headers of members are read
+        :return: paths of books in library
+        """
+        with tarfile.open(self.archive_path, 'r:') as archive:
+            return [self.__book_name(member)[0] for member in archive]
+
+    def extract_book(self, name: str, target_dir: str | os.PathLike) -> str:
+        """
+        Read one book back from archive, other members are skipped without reading their data
+        :param name: path of book in library
+        :param target_dir: directory for extracted book
+        :return: path to extracted book
+        """
+        with tarfile.open(self.archive_path, 'r:') as archive:
+            name = os.path.normpath(name)
+            for member in archive:
+                book_name, codec = self.__book_name(member)
+                if book_name == name:
+                    break
+            else:
+                raise FileNotFoundError(f'Book {name} is not found in archive {self.archive_path}')
+            if codec is not None and codec not in available_codecs():
+                raise Exception(f'Book {name} is compressed with {codec}, which is not available')
+            data = archive.extractfile(member)
+            target_path = os.path.join(target_dir, os.path.basename(os.path.normpath(name)))
+            tmp_path = target_path + _TMP_SUFFIX
+            try:
+                with open(tmp_path, 'wb') as book_file:
+                    if codec is None:
+                        shutil.copyfileobj(data, book_file, _CHUNK_SIZE)
+                    else:
+                        decompressor = _decompressor(codec)
+                        while chunk := data.read(_CHUNK_SIZE):
+                            book_file.write(decompressor.decompress(chunk))
+                        if hasattr(decompressor, 'flush'):
+                            book_file.write(decompressor.flush())
+                os.utime(tmp_path, (member.mtime, member.mtime))
+                os.replace(tmp_path, target_path)  # existing book is not left half written
+            except BaseException:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return target_path
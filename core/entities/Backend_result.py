@@ -0,0 +1,69 @@
+"""
+Result of one storage backend in Memorize 'all' mode
+"""
+import time
+from concurrent.futures import (
+    Future,
+    TimeoutError as FutureTimeoutError
+)
+from typing import (
+    Any,
+    Literal
+)
+
+type Backend_status = Literal['ok', 'failed', 'timeout', 'pending']
+
+
+class Backend_result:
+    """
+    Result of operation on one backend - status, returned value or error and elapsed time.
+    Pending result belongs to operation still running in background, it can be waited with resolve().
+    """
+    __slots__ = ('backend', 'status', 'value', 'error', 'seconds', 'timeout', '__future', '__started')
+
+    def __init__(self, backend: str, future: Future, timeout: float, started: float):
+        """
+        Backend result constructor, result is pending until resolved
+        :param backend: name of backend, same as storage mode
+        :param future: future of backend call
+        :param timeout: seconds given to backend since start of operation
+        :param started: time of operation start, by time.monotonic()
+        """
+        self.backend = backend
+        self.status: Backend_status = 'pending'
+        self.value: Any = None
+        self.error: str | None = None
+        self.seconds: float | None = None
+        self.timeout = timeout
+        self.__future = future
+        self.__started = started
+
+    def resolve(self) -> 'Backend_result':
+        """
+        Wait for backend call until its timeout and fill result.
+        Timed out call is not interrupted, its value is just not waited anymore.
+        :return: self
+        """
+        if self.status != 'pending':
+            return self
+        try:
+            self.value = self.__future.result(timeout=max(self.__started + self.timeout - time.monotonic(), 0))
+            self.status = 'ok'
+        except FutureTimeoutError:
+            self.status = 'timeout'
+            self.error = f'No answer in {self.timeout} s'
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+        self.seconds = time.monotonic() - self.__started
+        return self
+
+    def is_ok(self) -> bool:
+        return self.status == 'ok' and self.value is not False and self.value is not None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'backend': self.backend, 'status': self.status, 'value': self.value,
+                'error': self.error, 'seconds': self.seconds}
+
+    def __repr__(self) -> str:
+        return f"Backend_result(backend='{self.backend}', status='{self.status}', value={self.value!r})"
@@ -0,0 +1,107 @@
+"""
+BK-tree over normalized book names for fuzzy search with edit distance bound
+"""
+from typing import Iterator
+
+
+class Edit_pattern:
+    """
+    String prepared for computing edit distance to other strings with bit-parallel algorithm
+    of Myers and Hyyrö, every column of distance matrix is processed by few operations over int bits.
+    """
+    __slots__ = ('text', 'masks', 'length')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.masks: dict[str, int] = dict()  # bit i is set if symbol is at position i of text
+        for position, symbol in enumerate(text):
+            self.masks[symbol] = self.masks.get(symbol, 0) | (1 << position)
+
+    def distance(self, other: str) -> int:
+        """
+        Edit distance to other string - count of inserted, deleted and replaced symbols
+        :param other: string to compare with
+        :return: distance
+        """
+        if self.length == 0:
+            return len(other)
+        full = (1 << self.length) - 1
+        last = 1 << (self.length - 1)
+        positive, negative, score = full, 0, self.length
+        for symbol in other:
+            equal = self.masks.get(symbol, 0)
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            horizontal_positive = negative | (~(horizontal | positive) & full)
+            horizontal_negative = positive & horizontal
+            if horizontal_positive & last:
+                score += 1
+            elif horizontal_negative & last:
+                score -= 1
+            horizontal_positive = ((horizontal_positive << 1) | 1) & full
+            horizontal_negative = (horizontal_negative << 1) & full
+            positive = horizontal_negative | (~(vertical | horizontal_positive) & full)
+            negative = horizontal_positive & vertical
+        return score
+
+
+class Bk_tree:
+    """
+    Metric tree, every child of the node is stored by its distance to the node key.
+    Search with distance bound visits only children in [distance - bound, distance + bound],
+    so most of the keys are never compared with query. Values with equal keys share one node.
+    """
+
+    def __init__(self):
+        self.__root: list | None = None  # node is [key, values, children by distance]
+        self.__size: int = 0
+
+    def add(self, key: str, value: int) -> None:
+        """
+        Add value by key
+        :param key: normalized key
+        :param value: value returned by search, for example entry number of record
+        :return: None
+        """
+        self.__size += 1
+        if self.__root is None:
+            self.__root = [key, [value], dict()]
+            return
+        node = self.__root
+        pattern = Edit_pattern(key)
+        while True:
+            distance = pattern.distance(node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], dict()]
+                return
+            node = child
+
+    def search(self, query: str, max_distance: int) -> Iterator[tuple[int, str, int]]:
+        """
+        Find values which keys are within distance bound from query
+        :param query: normalized query
+        :param max_distance: maximal edit distance
+        :return: generator of distance, key and value, in no particular order
+        """
+        if self.__root is None:
+            return
+        nodes = [self.__root]
+        pattern = Edit_pattern(query)
+        while len(nodes) > 0:
+            key, values, children = nodes.pop()
+            distance = pattern.distance(key)
+            if distance <= max_distance:
+                for value in values:
+                    yield distance, key, value
+            for child_distance in range(max(distance - max_distance, 1), distance + max_distance + 1):
+                child = children.get(child_distance)
+                if child is not None:
+                    nodes.append(child)
+
+    def __len__(self) -> int:
+        return self.__size
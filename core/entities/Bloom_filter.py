@@ -0,0 +1,114 @@
+"""
+Bloom filter of history keys, persisted next to read file.
+
+Answers "book is surely not in history" instantly, positive answers must be checked by exact lookup.
+"""
+import hashlib
+import math
+import os
+import struct
+from typing import Final
+
+BLOOM_FILE_SUFFIX: Final[str] = '.bloom'
+"""
+Suffix of the filter file, added to read file path.
+"""
+
+_HEADER: Final[struct.Struct] = struct.Struct('<4sQIQQQqQ')
+"""
+Magic, bits count, hashes count, keys count, source size, source mtime, source inode, capacity.
+"""
+
+_MAGIC: Final[bytes] = b'KHBF'
+
+
+class Bloom_filter:
+    """
+    Bloom filter with double hashing over blake2b digest of the key.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Bloom filter constructor
+        :param capacity: expected count of keys
+        :param error_rate: expected false positive rate, when filter contains capacity keys
+        """
+        self.capacity: int = max(capacity, 1)
+        self.bits_count: int = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes_count: int = max(round(self.bits_count / self.capacity * math.log(2)), 1)
+        self.count: int = 0
+        self.source: tuple[int, int, int] = (0, 0, 0)
+        """
+        Size, mtime and inode of read file, from which filter was built.
+        """
+        self.__bits = bytearray((self.bits_count + 7) // 8)
+
+    def __positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bits_count for i in range(self.hashes_count)]
+
+    def add(self, key: str) -> None:
+        for position in self.__positions(key):
+            self.__bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.__bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(key))
+
+    def is_full(self) -> bool:
+        """
+        Check that filter contains more keys than it was built for, so false positive rate is too high
+        :return: bool value
+        """
+        return self.count > self.capacity
+
+    def false_positive_rate(self) -> float:
+        """
+        Estimated false positive rate for current count of keys
+        :return: value from 0 to 1
+        """
+        return (1 - math.exp(-self.hashes_count * self.count / self.bits_count)) ** self.hashes_count
+
+    def size_in_bytes(self) -> int:
+        return len(self.__bits)
+
+    def save(self, path: str | os.PathLike) -> None:
+        """
+        Save filter into file, file is replaced atomically
+        :param path: path to filter file
+        :return: None
+        """
+        tmp_path = str(path) + '.tmp'
+        with open(tmp_path, 'wb') as filter_file:
+            filter_file.write(_HEADER.pack(_MAGIC, self.bits_count, self.hashes_count, self.count,
+                                           *self.source, self.capacity))
+            filter_file.write(self.__bits)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str | os.PathLike) -> 'Bloom_filter | None':
+        """
+        Load filter from file
+        :param path: path to filter file
+        :return: Bloom_filter object or None if file not exists or damaged
+        """
+        try:
+            with open(path, 'rb') as filter_file:
+                header = filter_file.read(_HEADER.size)
+                bits = filter_file.read()
+        except OSError:
+            return None
+        if len(header) != _HEADER.size:
+            return None
+        magic, bits_count, hashes_count, count, size, mtime, inode, capacity = _HEADER.unpack(header)
+        if magic != _MAGIC or len(bits) != (bits_count + 7) // 8:
+            return None
+        bloom_filter = Bloom_filter.__new__(Bloom_filter)
+        bloom_filter.capacity = capacity
+        bloom_filter.bits_count = bits_count
+        bloom_filter.hashes_count = hashes_count
+        bloom_filter.count = count
+        bloom_filter.source = (size, mtime, inode)
+        bloom_filter.__bits = bytearray(bits)
+        return bloom_filter
@@ -49,6 +49,37 @@ class BootLoader:
             self.local_logger.log(f'Run browser app failed - {e}')
             raise Exception()
 
+    @log
+    def run_bloom_report(self):
+        """
+        Rebuild bloom filter of history and print its report
+        :return: None
+        """
+        self.history_module.post_init(self.app_config)
+        report = self.history_module.rebuild_bloom_filter()
+        print(f'Bloom filter of {self.app_config.path_to_read_file()} rebuilt in {report["rebuild_seconds"]:.3f} s')
+        print(f'Keys: {report["keys"]} of {report["capacity"]} capacity')
+        print(f'Size: {report["size_bytes"]} bytes, {report["bits"]} bits, {report["hashes"]} hashes')
+        print(f'False positive rate: estimated {report["estimated_false_positive_rate"]:.4%}, '
+              f'measured {report["measured_false_positive_rate"]:.4%}')
+
+    @log
+    def run_dedup_report(self, hard_link: bool = False):
+        """
+        Find duplicate books in library and print them
+        :param hard_link: *optional, replace extra copies with hard links
+        :return: None
+        """
+        self.transfer_module.post_init(self.app_config)
+        duplicates = self.transfer_module.book_dir_controller.find_duplicates(hard_link=hard_link)
+        for duplicate in duplicates:
+            print(f'{duplicate.size} bytes, {duplicate.content_hash[:16]}:')
+            for path in duplicate.paths:
+                print(f'  {path}')
+        extra_bytes = sum(duplicate.size * (len(duplicate.paths) - 1) for duplicate in duplicates)
+        print(f'Duplicate sets: {len(duplicates)}, extra copies take {extra_bytes} bytes'
+              + (', replaced with hard links' if hard_link else ''))
+
     @log
     def help_distribution_manager(self):
         print(f'{APP_NAME} utility')
@@ -0,0 +1,137 @@
+"""
+Bounded pool of remote storage clients (yadisk.Client and similar), so HTTP sessions are kept alive between calls
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Iterator
+)
+
+
+class Client_pool:
+    """
+    Pool of clients with keep-alive sessions. Idle client is reused, the most recently used first.
+    Client idle for longer than health interval is checked before reuse and replaced if check fails.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 4,
+                 health_check: Callable[[Any], bool] | None = None, health_interval: float = 30.0):
+        """
+        Client pool constructor, clients are created on demand
+        :param factory: function for creating new client
+        :param max_size: max count of clients, idle and in use
+        :param health_check: *optional, function which returns False (or raises) for broken client
+        :param health_interval: seconds of idle time, after which client is checked before reuse
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.health_check = health_check
+        self.health_interval = health_interval
+        self.__condition = threading.Condition()
+        self.__idle: list[tuple[Any, float]] = list()  # client and time of its release
+        self.__in_use: int = 0
+        self.created: int = 0
+        self.reused: int = 0
+        self.discarded: int = 0
+
+    @staticmethod
+    def __close(client: Any) -> None:
+        close = getattr(client, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def __is_healthy(self, client: Any, released: float) -> bool:
+        if self.health_check is None or time.monotonic() - released < self.health_interval:
+            return True
+        try:
+            return bool(self.health_check(client))
+        except Exception:
+            return False
+
+    def acquire(self, timeout: float | None = None) -> Any:
+        """
+        Take client from pool, wait if all clients are in use
+        :param timeout: *optional, max seconds to wait for free client
+        :return: client
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: len(self.__idle) > 0 or self.__in_use < self.max_size, timeout):
+                raise TimeoutError(f'No free client in pool of {self.max_size} clients')
+            self.__in_use += 1
+            idle = self.__idle.pop() if len(self.__idle) > 0 else None
+        if idle is not None:
+            client, released = idle
+            if self.__is_healthy(client, released):
+                with self.__condition:
+                    self.reused += 1
+                return client
+            self.__close(client)
+            with self.__condition:
+                self.discarded += 1
+        try:
+            client = self.factory()
+        except Exception:
+            with self.__condition:
+                self.__in_use -= 1
+                self.__condition.notify()
+            raise
+        with self.__condition:
+            self.created += 1
+        return client
+
+    def release(self, client: Any, broken: bool = False) -> None:
+        """
+        Return client into pool
+        :param client: client taken by acquire
+        :param broken: client failed, so it is closed instead of reuse
+        :return: None
+        """
+        if broken:
+            self.__close(client)
+        with self.__condition:
+            self.__in_use -= 1
+            if broken:
+                self.discarded += 1
+            else:
+                self.__idle.append((client, time.monotonic()))
+            self.__condition.notify()
+
+    @contextmanager
+    def client(self, timeout: float | None = None) -> Iterator[Any]:
+        """
+        Client for block of operations, client is discarded if block raises exception
+        :param timeout: *optional, max seconds to wait for free client
+        :return: context manager with client
+        """
+        client = self.acquire(timeout)
+        try:
+            yield client
+        except Exception:
+            self.release(client, broken=True)
+            raise
+        self.release(client)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Counters of pool
+        :return: count of created, reused and discarded clients, and current count of idle and used clients
+        """
+        with self.__condition:
+            return {'created': self.created, 'reused': self.reused, 'discarded': self.discarded,
+                    'idle': len(self.__idle), 'in_use': self.__in_use}
+
+    def close(self) -> None:
+        """
+        Close idle clients, clients in use are closed, when they are released as broken
+        :return: None
+        """
+        with self.__condition:
+            idle, self.__idle = self.__idle, list()
+        for client, _ in idle:
+            self.__close(client)
@@ -0,0 +1,290 @@
+"""
+Parallel copying of books and directories.
+
+Data is copied inside kernel where it is possible (os.copy_file_range, then os.sendfile), without passing through
+user space, with plain buffered copying as fallback. Files are copied in bounded thread pool,
+so many small books keep disk busy instead of waiting one after another.
+Moves inside one device are done by rename, without copying data.
+Every file is copied into temporary file next to target and renamed over it, when it is complete,
+so interrupted or short copy never replaces target.
+"""
+import errno
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Callable,
+    NamedTuple
+)
+
+_TMP_SUFFIX: str = '.copy-tmp'
+
+_FALLBACK_ERRNOS: frozenset[int] = frozenset({errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                                              errno.EBADF, errno.ENOTSUP})
+"""
+Errors of zero-copy calls, after which next way of copying is tried.
+"""
+
+type File_progress = Callable[[str, int, int], None]
+"""
+Callback with path of copied file, count of copied bytes and size of file.
+"""
+
+type Total_progress = Callable[[int, int, int, int], None]
+"""
+Callback with count of copied bytes, total bytes, count of copied files and total files.
+"""
+
+
+class Copy_report(NamedTuple):
+    files: int
+    bytes: int
+    seconds: float
+    failed: list[str]
+    """
+    Source paths of files, which were not copied.
+    """
+
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f'{self.files} files, {self.bytes / 1024 / 1024:.1f} MB in {self.seconds:.2f} s '
+                f'({self.megabytes_per_second():.1f} MB/s), {len(self.failed)} failed')
+
+
+class Copy_engine:
+    """
+    Copier of files in thread pool, metadata of files (times, mode) is copied as shutil.copy2 does.
+    """
+
+    def __init__(self, logger, max_workers: int = 4, chunk_size: int = 8 * 1024 * 1024):
+        """
+        Copy engine constructor
+        :param logger: logger instance
+        :param max_workers: *optional, count of files copied at the same time
+        :param chunk_size: *optional, bytes copied by one call, progress is reported after every chunk
+        """
+        self.local_logger = logger
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.__zero_copy: list[str] = [name for name in ('copy_file_range', 'sendfile') if hasattr(os, name)]
+
+    def __copy_zero(self, method: str, source_fd: int, target_fd: int, size: int, report: Callable[[int], None]) \
+            -> int:
+        copied = 0
+        while True:
+            if method == 'copy_file_range':
+                sent = os.copy_file_range(source_fd, target_fd, self.chunk_size)
+            else:
+                sent = os.sendfile(target_fd, source_fd, None, self.chunk_size)
+            if sent == 0:
+                return copied
+            copied += sent
+            report(copied)
+
+    def __copy_buffered(self, source, target, report: Callable[[int], None]) -> int:
+        copied = 0
+        buffer = bytearray(min(self.chunk_size, 1024 * 1024))
+        view = memoryview(buffer)
+        while True:
+            read = source.readinto(buffer)
+            if read == 0:
+                return copied
+            target.write(view[:read])
+            copied += read
+            report(copied)
+
+    def copy_file(self, source: str | os.PathLike, target: str | os.PathLike,
+                  on_file: File_progress | None = None, fsync: bool = True) -> int:
+        """
+        Copy one file with its metadata, target file is replaced atomically, when copy is complete
+        :param source: path to source file
+        :param target: path to target file (not directory)
+        :param on_file: *optional, callback of file progress
+        :param fsync: *optional, flush target file to disk before it replaces old file, on by default
+        :return: count of copied bytes
+        """
+        tmp_path = str(target) + _TMP_SUFFIX
+        try:
+            with open(source, 'rb') as source_file, open(tmp_path, 'wb') as target_file:
+                size = os.fstat(source_file.fileno()).st_size
+
+                def report(copied: int) -> None:
+                    if on_file is not None:
+                        on_file(str(source), copied, size)
+
+                copied = None
+                for method in list(self.__zero_copy):
+                    try:
+                        copied = self.__copy_zero(method, source_file.fileno(), target_file.fileno(), size, report)
+                        break
+                    except OSError as e:
+                        if e.errno not in _FALLBACK_ERRNOS:
+                            raise
+                        if source_file.tell() != 0 or target_file.tell() != 0:
+                            source_file.seek(0)
+                            target_file.seek(0)
+                            target_file.truncate()
+                        if e.errno in (errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP) and method in self.__zero_copy:
+                            self.__zero_copy.remove(method)  # not supported by system, not only by this file pair
+                if copied is None:
+                    copied = self.__copy_buffered(source_file, target_file, report)
+                if copied != size:  # source was truncated or appended while copying
+                    raise OSError(f'{copied} of {size} bytes of {source} are copied')
+                target_file.flush()
+                if fsync:
+                    os.fsync(target_file.fileno())
+            shutil.copystat(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if size == 0:
+            report(0)
+        return copied
+
+    def copy_files(self, pairs: list[tuple[str, str]], on_file: File_progress | None = None,
+                   on_progress: Total_progress | None = None, fsync: bool = True) -> Copy_report:
+        """
+        Copy files in thread pool, directories of targets are created
+        :param pairs: source and target paths of files
+        :param on_file: *optional, callback of every file progress, called from copying threads
+        :param on_progress: *optional, callback of aggregate progress, called from copying threads
+        :param fsync: *optional, flush every target file to disk before it replaces old file, on by default
+        :return: copy report
+        """
+        started = time.perf_counter()
+        sizes: dict[str, int] = dict()
+        for source, _ in pairs:
+            try:
+                sizes[source] = os.stat(source).st_size
+            except OSError:
+                sizes[source] = 0
+        total_bytes = sum(sizes.values())
+        lock = threading.Lock()
+        done = {'bytes': 0, 'files': 0}
+        failed: list[str] = list()
+        for directory in {os.path.dirname(target) for _, target in pairs}:
+            if directory != '':
+                os.makedirs(directory, exist_ok=True)
+
+        def copy(source: str, target: str) -> None:
+            reported = 0
+
+            def on_chunk(path: str, copied: int, size: int) -> None:
+                nonlocal reported
+                if on_file is not None:
+                    on_file(path, copied, size)
+                with lock:
+                    done['bytes'] += copied - reported
+                    snapshot = done['bytes'], done['files']
+                reported = copied
+                if on_progress is not None:
+                    on_progress(snapshot[0], total_bytes, snapshot[1], len(pairs))
+
+            try:
+                self.copy_file(source, target, on_chunk, fsync)
+            except OSError as e:
+                self.local_logger.log(f'File {source} cannot be copied into {target} - {e}')
+                with lock:
+                    done['bytes'] -= reported
+                    failed.append(source)
+                return
+            with lock:
+                done['files'] += 1
+                snapshot = done['bytes'], done['files']
+            if on_progress is not None:
+                on_progress(snapshot[0], total_bytes, snapshot[1], len(pairs))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='copy-engine') as executor:
+            for future in [executor.submit(copy, source, target) for source, target in pairs]:
+                future.result()
+        report = Copy_report(done['files'], done['bytes'], time.perf_counter() - started, failed)
+        self.local_logger.log(f'Copied {report}')
+        return report
+
+    @staticmethod
+    def list_tree(source: str | os.PathLike, target: str | os.PathLike) -> list[tuple[str, str]]:
+        """
+        List files of directory tree with their paths in target tree, symbolic links are followed
+        :param source: source directory
+        :param target: target directory
+        :return: source and target paths of files
+        """
+        pairs = list()
+        for directory, _, files in os.walk(source):
+            relative = os.path.relpath(directory, source)
+            for name in files:
+                pairs.append((os.path.join(directory, name), os.path.normpath(os.path.join(target, relative, name))))
+        return pairs
+
+    def copy_tree(self, source: str | os.PathLike, target: str | os.PathLike, on_file: File_progress | None = None,
+                  on_progress: Total_progress | None = None, fsync: bool = True) -> Copy_report:
+        """
+        Copy directory tree into target directory, existing files are replaced
+        :param source: source directory
+        :param target: target directory, created if absent
+        :param on_file: *optional, callback of every file progress
+        :param on_progress: *optional, callback of aggregate progress
+        :param fsync: *optional, flush every target file to disk before it replaces old file, on by default
+        :return: copy report
+        """
+        for directory, _, _ in os.walk(source):  # empty directories are copied too
+            os.makedirs(os.path.join(target, os.path.relpath(directory, source)), exist_ok=True)
+        return self.copy_files(self.list_tree(source, target), on_file, on_progress, fsync)
+
+    @staticmethod
+    def is_same_device(source: str | os.PathLike, target: str | os.PathLike) -> bool:
+        """
+        Check that source and target are on one device, so target can be made by rename
+        :param source: existing path
+        :param target: path, which may not exist yet, its nearest existing parent is checked
+        :return: bool value
+        """
+        parent = os.path.abspath(target)
+        while not os.path.exists(parent):
+            parent = os.path.dirname(parent)
+        return os.stat(source).st_dev == os.stat(parent).st_dev
+
+    @staticmethod
+    def fsync_directory(path: str | os.PathLike) -> None:
+        """
+        Flush directory entries (created or renamed files) to disk, directories cannot be opened on Windows
+        :param path: path to directory
+        :return: None
+        """
+        if os.name == 'nt':
+            return
+        descriptor = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def rename_or_copy(self, source: str | os.PathLike, target: str | os.PathLike) -> bool:
+        """
+        Move file or directory by one rename if source and target are on one device, otherwise copy it durably.
+        Target file is replaced, target directory is replaced only if it is empty, otherwise source is merged into it
+        :param source: path to file or directory
+        :param target: new path of file or directory
+        :return: True if source was renamed, False if it was copied and still has to be removed
+        """
+        if self.is_same_device(source, target):
+            try:
+                os.replace(source, target)
+                self.fsync_directory(os.path.dirname(os.path.abspath(target)))
+                return True
+            except OSError as e:  # not empty target directory, or replacing of directories is not supported
+                self.local_logger.log(f'{source} cannot be renamed into {target}, it is copied - {e}')
+        if os.path.isdir(source):
+            report = self.copy_tree(source, target, fsync=True)
+            if len(report.failed) > 0:
+                raise OSError(f'{len(report.failed)} files of {source} are not copied into {target}')
+        else:
+            self.copy_file(source, target, fsync=True)
+        self.fsync_directory(os.path.dirname(os.path.abspath(target)))
+        return False
@@ -0,0 +1,241 @@
+"""
+Search of books with the same content across library.
+
+Files are compared in stages, every stage reads more than previous one, so only real candidates are read whole:
+size from library index, hash of first and last chunks, full blake2b hash. Hashes are kept in library index,
+so repeated search reads only new and changed files. Candidates are checked by stat before grouping, and both files
+are checked again right before extra copy is replaced with hard link, so book changed meanwhile is never replaced.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    NamedTuple
+)
+
+from core.entities.Library_index import (
+    Indexed_file,
+    Library_index
+)
+
+_LINK_TMP_SUFFIX: str = '.dedup-tmp'
+
+
+class Duplicate_set(NamedTuple):
+    size: int
+    content_hash: str
+    paths: list[str]
+    """
+    Paths relative to library root, first path is kept on hard linking.
+    """
+
+
+class Deduplicator:
+    """
+    Finder of duplicate books in library index. Hard-linked files are one file, so they are not duplicates.
+    """
+
+    def __init__(self, index: Library_index, logger, max_workers: int = 8, partial_size: int = 64 * 1024):
+        """
+        Deduplicator constructor
+        :param index: refreshed library index
+        :param logger: logger instance
+        :param max_workers: *optional, count of threads reading files (hashing releases GIL)
+        :param partial_size: *optional, size of first and last chunks for partial hash
+        """
+        self.index = index
+        self.local_logger = logger
+        self.max_workers = max_workers
+        self.partial_size = partial_size
+
+    def __path(self, dir_name: str, file: Indexed_file) -> str:
+        return os.path.normpath(os.path.join(dir_name, file.name))
+
+    def __indexed(self, path: str) -> Indexed_file | None:
+        """
+        Get index entry of file by its path relative to library root
+        """
+        directory = self.index.dirs.get(os.path.dirname(path) or os.curdir)
+        if directory is None:
+            return None
+        return next((file for file in directory.files if file.name == os.path.basename(path)), None)
+
+    def __is_unchanged(self, path: str, file: Indexed_file) -> bool:
+        """
+        Check by stat that file on disk is still the indexed one
+        """
+        try:
+            return file.is_same(self.index.scanner.scan_file(os.path.join(self.index.root, path), file.name))
+        except OSError:
+            return False
+
+    def __restat(self, candidates: list[tuple[str, Indexed_file]], changes: dict[tuple[str, str], dict[str, Any]]) \
+            -> dict[tuple[str, str], Indexed_file | None]:
+        """
+        Take stat of candidates, files changed since indexing are indexed again without hashes
+        :return: current files by directory name and file name, None for removed files
+        """
+        def stat(candidate: tuple[str, Indexed_file]) -> Indexed_file | None:
+            dir_name, file = candidate
+            try:
+                return Indexed_file.from_scanned(
+                    self.index.scanner.scan_file(os.path.join(self.index.root, dir_name, file.name), file.name))
+            except OSError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='deduplicator') as executor:
+            scanned = list(executor.map(stat, candidates))
+        result = dict()
+        for (dir_name, file), current in zip(candidates, scanned):
+            if current is not None and not file.is_same(current):
+                changes[(dir_name, file.name)] = current._asdict()
+            result[(dir_name, file.name)] = file if current is not None and file.is_same(current) else current
+        return result
+
+    @staticmethod
+    def __group_by_size(files: list[tuple[str, Indexed_file]]) -> list[list[tuple[str, Indexed_file]]]:
+        """
+        Group not empty files by size, hard links of one file are taken once
+        """
+        by_size: dict[int, dict[int, tuple[str, Indexed_file]]] = dict()
+        for dir_name, file in files:
+            if file.size > 0:
+                same_inode = by_size.setdefault(file.size, dict())
+                if file.inode not in same_inode or file.content_hash is not None:  # hard link with known hash
+                    same_inode[file.inode] = (dir_name, file)
+        return [list(same_inode.values()) for same_inode in by_size.values() if len(same_inode) > 1]
+
+    def __partial_hash(self, path: str) -> str | None:
+        try:
+            with open(os.path.join(self.index.root, path), 'rb') as book_file:
+                head = book_file.read(self.partial_size)
+                book_file.seek(-self.partial_size, os.SEEK_END)
+                tail = book_file.read(self.partial_size)
+        except OSError as e:
+            self.local_logger.log(f'Book {path} cannot be read for deduplication - {e}')
+            return None
+        return hashlib.blake2b(head + tail, digest_size=16).hexdigest()
+
+    def __full_hash(self, path: str) -> str | None:
+        try:
+            with open(os.path.join(self.index.root, path), 'rb') as book_file:
+                return hashlib.file_digest(book_file, lambda: hashlib.blake2b(digest_size=32)).hexdigest()
+        except OSError as e:
+            self.local_logger.log(f'Book {path} cannot be read for deduplication - {e}')
+            return None
+
+    @staticmethod
+    def __regroup(groups: list[list[tuple[str, Indexed_file]]], field: str) -> list[list[tuple[str, Indexed_file]]]:
+        """
+        Split groups by field of file, files without value of field (not read) and single files are dropped
+        """
+        result = list()
+        for group in groups:
+            by_key: dict[str, list[tuple[str, Indexed_file]]] = dict()
+            for dir_name, file in group:
+                key = getattr(file, field)
+                if key is not None:
+                    by_key.setdefault(key, list()).append((dir_name, file))
+            result.extend(subgroup for subgroup in by_key.values() if len(subgroup) > 1)
+        return result
+
+    def __calculate(self, groups: list[list[tuple[str, Indexed_file]]], field: str,
+                    is_needed: Callable[[Indexed_file], bool], calculate: Callable[[str], str | None],
+                    changes: dict[tuple[str, str], dict[str, str]]) -> tuple[list[list[tuple[str, Indexed_file]]], int]:
+        """
+        Calculate field of files in thread pool and set it into files of groups
+        :return: groups with updated files and count of read files
+        """
+        to_read = [(dir_name, file) for group in groups for dir_name, file in group if is_needed(file)]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='deduplicator') as executor:
+            values = dict(zip([(dir_name, file.name) for dir_name, file in to_read],
+                              executor.map(calculate, [self.__path(dir_name, file) for dir_name, file in to_read])))
+        for key, value in values.items():
+            if value is not None:
+                changes.setdefault(key, dict())[field] = value
+        groups = [[(dir_name, file._replace(**{field: values[(dir_name, file.name)]})
+                   if (dir_name, file.name) in values else file) for dir_name, file in group] for group in groups]
+        return groups, len(to_read)
+
+    def find(self) -> list[Duplicate_set]:
+        """
+        Find sets of books with the same content, new hashes are saved into library index
+        :return: duplicate sets, the biggest files first
+        """
+        changes: dict[tuple[str, str], dict[str, Any]] = dict()
+        files = list(self.index.iter_files())
+        # index may be older than files, candidates changed since indexing are grouped by their current size
+        current = self.__restat([candidate for group in self.__group_by_size(files) for candidate in group], changes)
+        files = [(dir_name, current.get((dir_name, file.name), file)) for dir_name, file in files
+                 if current.get((dir_name, file.name), file) is not None]
+        groups = self.__group_by_size(files)
+        # groups with unknown full hashes are split by partial hash first, small files have no partial hash
+        partial_groups = [group for group in groups if any(file.content_hash is None for _, file in group)]
+        partial_groups, partially_read = self.__calculate(
+            partial_groups, 'partial_hash',
+            lambda file: file.partial_hash is None and file.size > 2 * self.partial_size,
+            self.__partial_hash, changes)
+        groups = [group for group in groups if all(file.content_hash is not None for _, file in group)]
+        for group in partial_groups:
+            small = [(dir_name, file) for dir_name, file in group if file.size <= 2 * self.partial_size]
+            groups.extend([small] if len(small) > 1 else [])
+            groups.extend(self.__regroup([group], 'partial_hash'))
+        groups, wholly_read = self.__calculate(groups, 'content_hash', lambda file: file.content_hash is None,
+                                               self.__full_hash, changes)
+        groups = self.__regroup(groups, 'content_hash')
+        self.index.update_files(changes)
+        self.local_logger.log(f'Deduplication - {len(groups)} duplicate sets found, '
+                              f'{partially_read} books read partially, {wholly_read} books read whole')
+        duplicates = [Duplicate_set(group[0][1].size, group[0][1].content_hash,
+                                    sorted(self.__path(dir_name, file) for dir_name, file in group))
+                      for group in groups]
+        return sorted(duplicates, key=lambda duplicate: (-duplicate.size, duplicate.paths))
+
+    def __is_duplicate(self, path: str, duplicate: Duplicate_set) -> bool:
+        """
+        Check that file was not changed since it was hashed by find
+        """
+        file = self.__indexed(path)
+        return file is not None and file.content_hash == duplicate.content_hash and self.__is_unchanged(path, file)
+
+    def link(self, duplicates: list[Duplicate_set]) -> dict[str, int]:
+        """
+        Replace extra copies with hard links to the first book of set, replacement is atomic.
+        Both books are checked by stat right before replacement, books changed since find are skipped
+        :param duplicates: duplicate sets from find
+        :return: report with count of linked, skipped and failed books and count of freed bytes
+        """
+        linked = skipped = failed = freed = 0
+        changes: dict[tuple[str, str], dict[str, Any]] = dict()
+        for duplicate in duplicates:
+            keeper = os.path.join(self.index.root, duplicate.paths[0])
+            for path in duplicate.paths[1:]:
+                extra = os.path.join(self.index.root, path)
+                tmp_path = extra + _LINK_TMP_SUFFIX
+                try:
+                    os.link(keeper, tmp_path)
+                    if not self.__is_duplicate(duplicate.paths[0], duplicate) or \
+                            not self.__is_duplicate(path, duplicate):
+                        self.local_logger.log(f'Book {path} or {duplicate.paths[0]} was changed since search, '
+                                              f'it is not replaced with hard link')
+                        os.remove(tmp_path)
+                        skipped += 1
+                        continue
+                    os.replace(tmp_path, extra)
+                except OSError as e:  # other file system or no permissions
+                    self.local_logger.log(f'Book {path} cannot be replaced with hard link - {e}')
+                    if os.path.lexists(tmp_path):
+                        os.remove(tmp_path)
+                    failed += 1
+                    continue
+                # extra copy is the same file as keeper now, so its hashes stay valid
+                changes[(os.path.dirname(path) or os.curdir, os.path.basename(path))] = \
+                    self.__indexed(duplicate.paths[0])._replace(name=os.path.basename(path))._asdict()
+                linked += 1
+                freed += duplicate.size
+        self.index.update_files(changes)
+        self.local_logger.log(f'Deduplication - {linked} books replaced with hard links, {skipped} changed books '
+                              f'skipped, {freed} bytes freed')
+        return {'linked': linked, 'skipped': skipped, 'failed': failed, 'freed_bytes': freed}
@@ -0,0 +1,212 @@
+"""
+Delta synchronization of read file with remote disk.
+
+Read file is split into chunks of lines, boundaries depend only on content of lines,
+so appended or removed lines change only few chunks. Chunks are stored on disk by their hash,
+manifest lists hashes of chunks in file order. Only chunks absent on the other side are transferred.
+Pushes are serialized between threads and processes, and manifest is not uploaded if it was changed
+on remote disk during push, so older history never replaces newer one.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import zlib
+from typing import (
+    Any,
+    NamedTuple
+)
+
+from core.entities.Client_pool import Client_pool
+from core.entities.History_lock import History_lock
+
+_MANIFEST_NAME: str = 'manifest.json'
+
+_CHUNKS_DIR_NAME: str = 'chunks'
+
+_PUSH_LOCK_NAME: str = 'push'
+
+
+class Sync_report(NamedTuple):
+    chunks_total: int
+    chunks_transferred: int
+    bytes_total: int
+    """
+    Size of synchronized history.
+    """
+    bytes_sent: int
+    bytes_received: int
+
+
+class Delta_sync:
+    """
+    Synchronization of local read file with directory on yandex disk (or any client with the same methods:
+    exists, makedirs, upload, download).
+    Remote directory contains manifest file and chunks directory, chunk file name is blake2b hash of its content.
+    """
+
+    def __init__(self, client_pool: Client_pool, local_path: str | os.PathLike, remote_dir: str,
+                 cache_dir: str | os.PathLike, average_chunk_lines: int = 256):
+        """
+        Delta sync constructor
+        :param client_pool: pool of disk clients, for example yadisk.Client, one client is used for whole sync
+        :param local_path: path to read file
+        :param remote_dir: directory on remote disk
+        :param cache_dir: local directory for chunks downloaded from remote disk
+        :param average_chunk_lines: average count of lines in chunk, chunk is at most four times bigger
+        """
+        self.client_pool = client_pool
+        self.local_path = local_path
+        self.remote_dir = remote_dir.rstrip('/')
+        self.cache_dir = cache_dir
+        self.average_chunk_lines = average_chunk_lines
+        self.push_lock = History_lock(os.path.join(cache_dir, _PUSH_LOCK_NAME))
+        """
+        Lock of pushes from different processes, taken on file in cache directory.
+        """
+        self.__push_lock = threading.Lock()  # file lock does nothing on Windows
+
+    @staticmethod
+    def chunk_hash(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def split(self, data: bytes) -> list[tuple[str, bytes]]:
+        """
+        Split content into chunks, chunk ends after line, which checksum is divisible by average chunk size
+        :param data: content of read file
+        :return: list with hash and content of every chunk
+        """
+        chunks = list()
+        view = memoryview(data)
+        chunk_start = line_start = 0
+        lines = 0
+        while line_start < len(data):
+            line_end = data.find(b'\n', line_start)
+            line_end = len(data) if line_end == -1 else line_end + 1
+            lines += 1
+            if (zlib.crc32(view[line_start:line_end]) % self.average_chunk_lines == 0
+                    or lines >= 4 * self.average_chunk_lines or line_end == len(data)):
+                chunk = data[chunk_start:line_end]
+                chunks.append((self.chunk_hash(chunk), chunk))
+                chunk_start = line_end
+                lines = 0
+            line_start = line_end
+        return chunks
+
+    def __read_local(self) -> bytes:
+        """
+        Read complete lines of read file, line being appended right now is not taken
+        :return: content of read file
+        """
+        if not os.path.exists(self.local_path):
+            return b''
+        with open(self.local_path, 'rb') as read_file:
+            data = read_file.read()
+        return data[:data.rfind(b'\n') + 1]
+
+    @staticmethod
+    def __download(client: Any, remote_path: str) -> bytes | None:
+        if not client.exists(remote_path):
+            return None
+        buffer = io.BytesIO()
+        client.download(remote_path, buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def __upload(client: Any, data: bytes, remote_path: str) -> None:
+        client.upload(io.BytesIO(data), remote_path, overwrite=True)
+
+    def __get_remote_manifest(self, client: Any) -> tuple[list[str], bytes | None]:
+        """
+        Download manifest of remote directory
+        :return: hashes of chunks in file order and content of manifest, None if there is no manifest
+        """
+        data = self.__download(client, f'{self.remote_dir}/{_MANIFEST_NAME}')
+        if data is None:
+            return [], None
+        return json.loads(data)['chunks'], data
+
+    def __chunk_path(self, chunk: str) -> str:
+        return f'{self.remote_dir}/{_CHUNKS_DIR_NAME}/{chunk}'
+
+    def revision(self) -> str | None:
+        """
+        Get revision of remote history - hash of its manifest, so history is not downloaded for comparing
+        :return: revision or None if there is no remote history
+        """
+        with self.client_pool.client() as client:
+            data = self.__download(client, f'{self.remote_dir}/{_MANIFEST_NAME}')
+        return None if data is None else self.chunk_hash(data)
+
+    def push(self) -> Sync_report:
+        """
+        Make remote history equal to local read file, only chunks absent on remote disk are uploaded.
+        Push fails, if manifest on remote disk was changed by other push meanwhile, so it can be repeated
+        :return: sync report
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.__push_lock, self.push_lock.exclusive(), self.client_pool.client() as client:
+            return self.__push(client)
+
+    def __push(self, client: Any) -> Sync_report:
+        chunks = self.split(self.__read_local())
+        remote_chunks, remote_manifest = self.__get_remote_manifest(client)
+        received = len(remote_manifest or b'')
+        hashes = [chunk for chunk, _ in chunks]
+        if hashes == remote_chunks:
+            return Sync_report(len(chunks), 0, sum(len(data) for _, data in chunks), 0, received)
+        if not client.exists(f'{self.remote_dir}/{_CHUNKS_DIR_NAME}'):
+            client.makedirs(f'{self.remote_dir}/{_CHUNKS_DIR_NAME}')
+        known = set(remote_chunks)
+        sent = transferred = 0
+        for chunk, data in chunks:
+            if chunk not in known:
+                self.__upload(client, data, self.__chunk_path(chunk))
+                known.add(chunk)
+                sent += len(data)
+                transferred += 1
+        # revision is compared just before upload, other device can still push between, disk has no conditional upload
+        current_manifest = self.__download(client, f'{self.remote_dir}/{_MANIFEST_NAME}')
+        received += len(current_manifest or b'')
+        if current_manifest != remote_manifest:
+            raise Exception(f'History on remote disk {self.remote_dir} was changed by other push, push is canceled')
+        manifest = json.dumps({'chunks': hashes}).encode('utf-8')
+        # manifest is uploaded after chunks, so it never points to absent chunk
+        self.__upload(client, manifest, f'{self.remote_dir}/{_MANIFEST_NAME}')
+        return Sync_report(len(chunks), transferred, sum(len(data) for _, data in chunks),
+                           sent + len(manifest), received)
+
+    def pull(self) -> tuple[bytes, Sync_report]:
+        """
+        Get remote history, only chunks absent in local read file and in cache are downloaded
+        :return: content of remote history and sync report
+        """
+        with self.client_pool.client() as client:
+            return self.__pull(client)
+
+    def __pull(self, client: Any) -> tuple[bytes, Sync_report]:
+        remote_chunks, remote_manifest = self.__get_remote_manifest(client)
+        received = len(remote_manifest or b'')
+        local = dict(self.split(self.__read_local()))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        parts = list()
+        transferred = 0
+        for chunk in remote_chunks:
+            data = local.get(chunk)
+            cache_path = os.path.join(self.cache_dir, chunk)
+            if data is None and os.path.exists(cache_path):
+                with open(cache_path, 'rb') as cache_file:
+                    data = cache_file.read()
+            if data is None:
+                data = self.__download(client, self.__chunk_path(chunk))
+                if data is None or self.chunk_hash(data) != chunk:
+                    raise OSError(f'Chunk {chunk} of remote history is damaged or absent')
+                with open(cache_path + '.tmp', 'wb') as cache_file:
+                    cache_file.write(data)
+                os.replace(cache_path + '.tmp', cache_path)
+                received += len(data)
+                transferred += 1
+            parts.append(data)
+        content = b''.join(parts)
+        return content, Sync_report(len(remote_chunks), transferred, len(content), 0, received)
@@ -0,0 +1,288 @@
+"""
+SQLite storage of read books history.
+
+Used by Memorize in 'sqlite' mode, instead of rescanning read file on every operation.
+"""
+import datetime
+import os
+import sqlite3
+import threading
+from typing import (
+    Iterable,
+    Iterator
+)
+
+from core.entities.History_reader import History_reader
+from core.entities.History_record import (
+    HISTORY_FIELDS,
+    History_record,
+    normalize_text,
+    parse_history_line,
+    format_history_line
+)
+from core.exceptions.KindleHistoryException import MemorizeException
+
+_SCHEMA: tuple[str, ...] = (
+    'CREATE TABLE IF NOT EXISTS history ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'name TEXT NOT NULL, author TEXT, date TEXT, when_read TEXT, type TEXT, name_key TEXT, author_key TEXT)',
+    'CREATE TABLE IF NOT EXISTS migrations ('
+    'source TEXT PRIMARY KEY, records INTEGER NOT NULL, migrated_at TEXT NOT NULL)'
+)
+
+_INDEXES: tuple[str, ...] = (
+    'DROP INDEX IF EXISTS idx_history_name',  # COLLATE NOCASE folds only ascii letters
+    'DROP INDEX IF EXISTS idx_history_author',
+    'CREATE INDEX IF NOT EXISTS idx_history_name_key ON history (name_key)',
+    'CREATE INDEX IF NOT EXISTS idx_history_author_key ON history (author_key)',
+    'CREATE INDEX IF NOT EXISTS idx_history_year ON history (when_read)',
+    'CREATE INDEX IF NOT EXISTS idx_history_type ON history (type)'
+)
+"""
+Name and author are searched by normalized keys (normalize_text), the same way as in read file.
+"""
+
+_INSERT_RECORD: str = ('INSERT INTO history (name, author, date, when_read, type, name_key, author_key) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+_SELECT_RECORDS: str = 'SELECT name, author, date, when_read, type FROM history'
+
+
+class History_db:
+    """
+    Class for storing history records in SQLite database with indexes on name, author, year and type.
+    """
+
+    def __init__(self, db_path: str | os.PathLike, logger):
+        """
+        History database constructor, connection is opened on first use
+        :param db_path: path to database file
+        :param logger: logger instance
+        """
+        self.db_path = db_path
+        self.local_logger = logger
+        self.__connection: sqlite3.Connection | None = None
+        self.__lock = threading.Lock()  # flask serves requests from different threads
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            try:
+                self.__connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                with self.__connection:
+                    for statement in _SCHEMA:
+                        self.__connection.execute(statement)
+                    self.__add_key_columns(self.__connection)
+                    for statement in _INDEXES:
+                        self.__connection.execute(statement)
+            except sqlite3.Error as e:
+                self.__connection = None
+                raise MemorizeException(f'Cannot open history database {self.db_path} - {e}')
+        return self.__connection
+
+    @staticmethod
+    def __add_key_columns(connection: sqlite3.Connection) -> None:
+        """
+        Add columns with normalized name and author into database created before them, and fill them
+        """
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(history)')}
+        if 'name_key' in columns:
+            return
+        connection.execute('ALTER TABLE history ADD COLUMN name_key TEXT')
+        connection.execute('ALTER TABLE history ADD COLUMN author_key TEXT')
+        connection.create_function('normalize_text', 1, lambda text: normalize_text(text or ''), deterministic=True)
+        connection.execute('UPDATE history SET name_key = normalize_text(name), author_key = normalize_text(author)')
+
+    @staticmethod
+    def __to_row(record: History_record) -> tuple[str, ...]:
+        row = tuple(record.get(field, '-') for field in HISTORY_FIELDS)
+        return row + (normalize_text(row[0]), normalize_text(row[1]))
+
+    @staticmethod
+    def __to_record(row: tuple) -> History_record:
+        return History_record(*row)
+
+    def is_migrated(self, source: str | os.PathLike) -> bool:
+        """
+        Check if read file was already migrated into database
+        :param source: path to read file
+        :return: bool value
+        """
+        with self.__lock:
+            row = self.__connect().execute('SELECT 1 FROM migrations WHERE source = ?',
+                                           (os.path.abspath(source),)).fetchone()
+        return row is not None
+
+    def migrate_from_text(self, source: str | os.PathLike) -> int:
+        """
+        One-shot migration of read file into database.
+        File is read by history reader, so records are parsed one by one and removed records (tombstones) are skipped.
+        :param source: path to read file
+        :return: count of migrated records, 0 if file not exists or already migrated
+        """
+        if not os.path.exists(source) or self.is_migrated(source):
+            return 0
+
+        def parse_line(line: str) -> History_record:
+            record = parse_history_line(line)
+            if record is None:
+                if line.strip() != '':
+                    self.local_logger.log(f'Wrong format string in migration found - {line.strip()}')
+                record = History_record(line.strip())
+            return record
+
+        def records(reader: History_reader) -> Iterator[tuple[str, ...]]:
+            for record in reader.iter_records():
+                if record.name != '':
+                    yield self.__to_row(record)
+
+        with self.__lock:
+            connection = self.__connect()
+            try:
+                with connection:
+                    before = connection.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+                    connection.executemany(_INSERT_RECORD, records(History_reader(source, parse_line)))
+                    migrated = connection.execute('SELECT COUNT(*) FROM history').fetchone()[0] - before
+                    connection.execute('INSERT INTO migrations (source, records, migrated_at) VALUES (?, ?, ?)',
+                                       (os.path.abspath(source), migrated, datetime.datetime.now().isoformat()))
+            except (sqlite3.Error, OSError) as e:
+                raise MemorizeException(f'Migration of {source} failed - {e}')
+        self.local_logger.log(f'Migrated {migrated} records from {source} into history database')
+        return migrated
+
+    def add(self, record: History_record) -> bool:
+        """
+        Add record into database
+        :param record: record to add
+        :return: bool value of success
+        """
+        return self.add_many([record]) == 1
+
+    def add_many(self, records: Iterable[History_record]) -> int:
+        """
+        Add records into database in one transaction
+        :param records: iterable with records
+        :return: count of added records
+        """
+        with self.__lock:
+            connection = self.__connect()
+            try:
+                with connection:
+                    cursor = connection.executemany(_INSERT_RECORD, (self.__to_row(record) for record in records))
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                self.local_logger.log(f'Exception while adding records into history database - {e}')
+                return 0
+
+    def remove(self, record_ids: Iterable[int]) -> int:
+        """
+        Remove records from database in one transaction
+        :param record_ids: ids of records to remove
+        :return: count of removed records
+        """
+        with self.__lock:
+            connection = self.__connect()
+            try:
+                with connection:
+                    cursor = connection.executemany('DELETE FROM history WHERE id = ?',
+                                                    ((record_id,) for record_id in record_ids))
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                self.local_logger.log(f'Exception while removing records from history database - {e}')
+                return 0
+
+    def get(self, name: str) -> list[History_record]:
+        """
+        Get records with given book name, case insensitive (for any alphabet)
+        :param name: book name
+        :return: list with records
+        """
+        with self.__lock:
+            rows = self.__connect().execute(_SELECT_RECORDS + ' WHERE name_key = ? ORDER BY id',
+                                            (normalize_text(name),)).fetchall()
+        return [self.__to_record(row) for row in rows]
+
+    def find(self, part: str) -> list[History_record]:
+        """
+        Find records which name or author contains given part, case insensitive (for any alphabet)
+        :param part: part of the book name or author
+        :return: list with records
+        """
+        part = normalize_text(part)
+        pattern = '%' + part.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self.__lock:
+            rows = self.__connect().execute(
+                _SELECT_RECORDS + " WHERE name_key LIKE ? ESCAPE '\\' OR author_key LIKE ? ESCAPE '\\' ORDER BY id",
+                (pattern, pattern)).fetchall()
+        return [self.__to_record(row) for row in rows]
+
+    def count(self) -> int:
+        with self.__lock:
+            return self.__connect().execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def version(self) -> int:
+        """
+        Get version of records, which changes on every add and remove (ids are never reused)
+        :return: integer value
+        """
+        with self.__lock:
+            last_id, count = self.__connect().execute('SELECT COALESCE(MAX(id), 0), COUNT(*) FROM history').fetchone()
+        return last_id << 32 | count
+
+    def iter_rows(self, after_id: int = 0, batch_size: int = 1000) -> Iterator[tuple[int, History_record]]:
+        """
+        Iterate over records in order of adding, fetching them by batches
+        :param after_id: only records with greater id are taken
+        :param batch_size: count of rows fetched at once
+        :return: generator of record id and record
+        """
+        last_id = after_id
+        while True:
+            with self.__lock:
+                rows = self.__connect().execute('SELECT id, name, author, date, when_read, type FROM history '
+                                                'WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)).fetchall()
+            if len(rows) == 0:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield row[0], self.__to_record(row[1:])
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[History_record]:
+        """
+        Iterate over all records in order of adding
+        :param batch_size: count of rows fetched at once
+        :return: generator of records
+        """
+        for _, record in self.iter_rows(batch_size=batch_size):
+            yield record
+
+    def record_at(self, record_id: int) -> History_record | None:
+        """
+        Get record by its id
+        :param record_id: id of the record
+        :return: record or None if there is no such record
+        """
+        with self.__lock:
+            row = self.__connect().execute(_SELECT_RECORDS + ' WHERE id = ?', (record_id,)).fetchone()
+        return None if row is None else self.__to_record(row)
+
+    def export_to_text(self, target: str | os.PathLike) -> int:
+        """
+        Export database into read file format (format of 'only-local' storage)
+        :param target: path to export file
+        :return: count of exported records
+        """
+        exported = 0
+        tmp_target = str(target) + '.tmp'
+        with open(tmp_target, 'w', encoding='utf-8') as export_file:
+            for record in self.iter_records():
+                export_file.write(format_history_line(record))
+                exported += 1
+        os.replace(tmp_target, target)
+        self.local_logger.log(f'Exported {exported} records into {target}')
+        return exported
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
@@ -0,0 +1,88 @@
+"""
+Advisory file locking for writers of read file from different processes
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows, only single write appends are used
+    fcntl = None
+
+_LOCK_FILE_SUFFIX: str = '.lock'
+
+ATOMIC_APPEND_SIZE: int = 4096
+"""
+Appends up to this size are done with one O_APPEND write, which is not interleaved with other writers.
+"""
+
+
+class History_lock:
+    """
+    Lock of read file, shared between processes (for example browser process and console).
+    Lock is taken on separate lock file, so it stays valid when read file is replaced by compaction.
+
+    Small appends take shared lock - they never wait for each other and rely on atomic O_APPEND write,
+    big appends and rewrites of the file take exclusive lock.
+    Thread holding exclusive lock may lock again (for example append while removing records), nested locks are no-op.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        History lock constructor
+        :param path: path to read file
+        """
+        self.path = path
+        self.lock_path = str(path) + _LOCK_FILE_SUFFIX
+        self.__held = threading.local()  # exclusive lock is held by current thread
+
+    @contextmanager
+    def __locked(self, operation: int) -> Iterator[None]:
+        if fcntl is None or getattr(self.__held, 'exclusive', False):
+            yield
+            return
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            self.__held.exclusive = operation == fcntl.LOCK_EX
+            try:
+                yield
+            finally:
+                self.__held.exclusive = False
+        finally:
+            os.close(fd)  # closing descriptor releases the lock
+
+    def shared(self):
+        """
+        Lock for writers, which can work at the same time
+        :return: context manager
+        """
+        return self.__locked(fcntl.LOCK_SH if fcntl is not None else 0)
+
+    def exclusive(self):
+        """
+        Lock for writer, which must be the only one, for example for rewriting the file
+        :return: context manager
+        """
+        return self.__locked(fcntl.LOCK_EX if fcntl is not None else 0)
+
+    def append(self, data: bytes, fsync: bool = False) -> None:
+        """
+        Append data to read file, file is opened after lock is taken
+        :param data: bytes to append, should contain only complete lines
+        :param fsync: flush data to disk before return
+        :return: None
+        """
+        lock = self.shared() if len(data) <= ATOMIC_APPEND_SIZE else self.exclusive()
+        with lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while len(view) > 0:  # os.write may write only part of data
+                    view = view[os.write(fd, view):]
+                if fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,272 @@
+"""
+Incremental memory-mapped reader of read file.
+
+Remembers byte offset and (size, mtime, inode) of the last parse, so if new books were only appended,
+just the new tail of the file is scanned. Only start offsets of lines are kept in memory,
+records are parsed from mapped file when they are accessed.
+Tombstone lines and records removed by them are skipped by all readers until file is compacted.
+"""
+import mmap
+import os
+import threading
+from array import array
+from typing import (
+    Callable,
+    Iterator,
+    NamedTuple
+)
+
+from core.entities.History_lock import History_lock
+from core.entities.History_record import (
+    TOMBSTONE_MARK,
+    History_record,
+    parse_tombstone
+)
+
+_CHECK_SIZE: int = 64
+"""
+Count of bytes before parsed offset, compared to ensure that file was only appended.
+"""
+
+_TOMBSTONE_BYTES: bytes = TOMBSTONE_MARK.encode('utf-8')
+
+_COMPACT_ATTEMPTS: int = 5
+"""
+How many times compaction is repeated if file was changed while it was rewritten.
+"""
+
+
+class File_signature(NamedTuple):
+    size: int
+    mtime: int
+    inode: int
+
+
+class History_reader:
+    """
+    Class for reading records of read file, one record per line.
+    File is mapped into memory and indexed by line start offsets, records are parsed lazily.
+    """
+
+    def __init__(self, path: str | os.PathLike, parse_line: Callable[[str], History_record],
+                 on_append: Callable[[int, History_record], None] = None, on_reset: Callable[[], None] = None,
+                 on_remove: Callable[[int], None] = None, file_lock: History_lock = None):
+        """
+        History reader constructor
+        :param path: path to read file
+        :param parse_line: function for parsing line into record
+        :param on_append: *optional, invoked for every new record with its line number (starts from 1)
+        :param on_reset: *optional, invoked before full reparse of the file
+        :param on_remove: *optional, invoked with line number of every record removed by new tombstone
+        :param file_lock: *optional, lock shared with writers of the file, taken while file is compacted
+        """
+        self.path = path
+        self.__parse_line = parse_line
+        self.__on_append = on_append
+        self.__on_reset = on_reset
+        self.__on_remove = on_remove
+        self.__file_lock = file_lock if file_lock is not None else History_lock(path)
+        self.__map: mmap.mmap | None = None
+        self.__line_starts: array = array('Q')  # offset of every line start in file
+        self.__offset: int = 0  # bytes scanned, always at the line end
+        self.__tail_check: bytes = b''  # bytes before offset from the last scan
+        self.__signature: File_signature | None = None
+        self.__has_partial: bool = False  # last line of file has no new line symbol
+        self.__removed: set[int] = set()  # lines of records removed by tombstones
+        self.__tombstones: set[int] = set()  # lines of tombstones
+        self.lock = threading.RLock()
+        """
+        Lock of mapped file and lines index, held while append and reset callbacks are invoked.
+        """
+        self.version: int = 0
+        """
+        Increased on every change of lines index.
+        """
+
+    @staticmethod
+    def __get_signature(stat: os.stat_result) -> File_signature:
+        return File_signature(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def __is_appended(self, signature: File_signature) -> bool:
+        """
+        Check that file was only appended since the last scan, new file must be mapped before
+        :return: bool value
+        """
+        old = self.__signature
+        if old is None or self.__has_partial or old.inode != signature.inode or signature.size <= old.size:
+            return False
+        return self.__map[self.__offset - len(self.__tail_check):self.__offset] == self.__tail_check
+
+    def __reset(self) -> None:
+        if self.__on_reset is not None:
+            self.__on_reset()
+        self.__line_starts = array('Q')
+        self.__offset = 0
+        self.__tail_check = b''
+        self.__has_partial = False
+        self.__removed = set()
+        self.__tombstones = set()
+
+    def __close_map(self) -> None:
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+    def refresh(self) -> bool:
+        """
+        Scan changes of read file since the last refresh.
+        If only appends happened - scan new tail, otherwise scan whole file.
+        :return: bool value if lines were changed
+        """
+        with self.lock:
+            if not os.path.exists(self.path):
+                if self.__signature is None:
+                    return False
+                self.__close_map()
+                self.__reset()
+                self.__signature = None
+                self.version += 1
+                return True
+
+            with open(self.path, 'rb') as read_file:
+                signature = self.__get_signature(os.fstat(read_file.fileno()))
+                if signature == self.__signature:
+                    return False
+                self.__close_map()
+                if signature.size > 0:
+                    self.__map = mmap.mmap(read_file.fileno(), signature.size, access=mmap.ACCESS_READ)
+            if signature.size == 0 or not self.__is_appended(signature):
+                self.__reset()
+            self.__signature = signature
+            self.__scan_tail(signature.size)
+            self.version += 1
+            return True
+
+    def __scan_tail(self, size: int) -> None:
+        """
+        Index lines from offset to the end of file and move offset to the end of the last complete line.
+        Last line without new line symbol is indexed too, but then the next change leads to full rescan.
+        :param size: size of mapped file
+        :return: None
+        """
+        position = self.__offset
+        while position < size:
+            self.__line_starts.append(position)
+            end = self.__map.find(b'\n', position)
+            if end == -1:
+                self.__has_partial = True
+                position = size
+            else:
+                position = end + 1
+                self.__offset = position
+            line = len(self.__line_starts)
+            start = self.__line_starts[-1]
+            if self.__map[start:start + len(_TOMBSTONE_BYTES)] == _TOMBSTONE_BYTES:
+                self.__tombstones.add(line)
+                removed_line = parse_tombstone(self.__map[start:position].decode('utf-8', errors='replace'))
+                if removed_line is not None and removed_line < line and self.is_live(removed_line):
+                    self.__removed.add(removed_line)
+                    if self.__on_remove is not None:
+                        self.__on_remove(removed_line)
+            elif self.__on_append is not None:
+                raw = self.__map[start:position]
+                self.__on_append(line, self.__parse_line(raw.decode('utf-8', errors='replace')))
+        if self.__offset > 0:
+            self.__tail_check = self.__map[max(self.__offset - _CHECK_SIZE, 0):self.__offset]
+
+    def source(self) -> tuple[int, int, int]:
+        """
+        Get size of complete lines, mtime and inode of read file at the last refresh,
+        line being appended right now is not counted in size
+        :return: size, mtime and inode, zeros if file not exists
+        """
+        with self.lock:
+            if self.__signature is None:
+                return 0, 0, 0
+            return self.__offset, self.__signature.mtime, self.__signature.inode
+
+    def is_live(self, line: int) -> bool:
+        """
+        Check that line contains record, which is not removed
+        :param line: number of line, starts from 1
+        :return: bool value
+        """
+        return line not in self.__removed and line not in self.__tombstones
+
+    def removed_share(self) -> float:
+        """
+        Share of lines in file, which are tombstones or records removed by them
+        :return: value from 0 to 1
+        """
+        if len(self.__line_starts) == 0:
+            return 0.0
+        return (len(self.__removed) + len(self.__tombstones)) / len(self.__line_starts)
+
+    def compact(self, drop_lines: set[int] = frozenset()) -> int:
+        """
+        Rewrite file without tombstones and removed records, file is replaced atomically.
+        :param drop_lines: *optional, lines to remove in addition to removed records
+        :return: count of dropped lines
+        """
+        with self.lock, self.__file_lock.exclusive():
+            for _ in range(_COMPACT_ATTEMPTS):
+                self.refresh()
+                if self.__signature is None:
+                    return 0
+                signature = self.__signature
+                dropped = 0
+                tmp_path = str(self.path) + '.compact'
+                with open(tmp_path, 'wb') as tmp_file:
+                    for line in range(1, len(self.__line_starts) + 1):
+                        if not self.is_live(line) or line in drop_lines:
+                            dropped += 1
+                            continue
+                        start = self.__line_starts[line - 1]
+                        end = self.__line_starts[line] if line < len(self.__line_starts) else signature.size
+                        tmp_file.write(self.__map[start:end])
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+                if self.__get_signature(os.stat(self.path)) == signature:  # nothing was appended meanwhile
+                    # mapped file can not be replaced on Windows, so map is closed and file is mapped again
+                    self.__close_map()
+                    self.__signature = None
+                    try:
+                        os.replace(tmp_path, self.path)
+                    finally:
+                        self.refresh()
+                    return dropped
+                os.remove(tmp_path)
+        raise OSError(f'{self.path} is changing too often, compaction canceled')
+
+    def record_at(self, line: int) -> History_record:
+        """
+        Parse record of given line from mapped file
+        :param line: number of line, starts from 1
+        :return: parsed record
+        """
+        with self.lock:
+            start = self.__line_starts[line - 1]
+            end = self.__line_starts[line] if line < len(self.__line_starts) else self.__signature.size
+            raw = self.__map[start:end]
+        return self.__parse_line(raw.decode('utf-8', errors='replace'))
+
+    def iter_records(self) -> Iterator[History_record]:
+        """
+        Iterate over records of file, file is refreshed before. Tombstones and removed records are skipped
+        :return: generator of records, one per line of file
+        """
+        self.refresh()
+        for line in range(1, len(self.__line_starts) + 1):
+            if self.is_live(line):
+                yield self.record_at(line)
+
+    def get_records(self) -> list[History_record]:
+        """
+        Get all records of file, file is refreshed before. Tombstones and removed records are skipped
+        :return: list with records, one per line of file
+        """
+        with self.lock:
+            return list(self.iter_records())
+
+    def __len__(self) -> int:
+        return len(self.__line_starts)
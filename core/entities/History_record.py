@@ -0,0 +1,181 @@
+"""
+Entity for history records format.
+
+One record in read file is stored as one line: <book name> | <book author> | <when read> | <book type>
+Extended variant also contains release date: <book name> | <book author> | <release date> | <when read> | <book type>
+Removed record is marked by appended tombstone line: #removed | <line of removed record>
+"""
+import datetime
+import re
+import sys
+from typing import Final
+
+HISTORY_FIELDS: Final[tuple[str, ...]] = ('name', 'author', 'date', 'when_read', 'type')
+"""
+Names of the fields in parsed history record.
+"""
+
+HISTORY_SEPARATOR: Final[str] = ' | '
+"""
+Separator between record fields in read file.
+"""
+
+EMPTY_FIELD: Final[str] = '-'
+"""
+Placeholder for absent record value.
+"""
+
+TOMBSTONE_MARK: Final[str] = '#removed'
+"""
+Start of the line, which marks record in other line as removed.
+"""
+
+
+class History_record:
+    """
+    Compact record of read books history, fields are stored in slots instead of dict.
+    Repeating values (author, dates and type) are interned, so equal strings are stored once.
+    Supports reading by key and get method like dict, so templates and old code work with it.
+    """
+    __slots__ = HISTORY_FIELDS
+
+    def __init__(self, name: str = '', author: str = EMPTY_FIELD, date: str = EMPTY_FIELD,
+                 when_read: str = EMPTY_FIELD, book_type: str = EMPTY_FIELD):
+        self.name: str = name
+        self.author: str = sys.intern(author)
+        self.date: str = sys.intern(date)
+        self.when_read: str = sys.intern(when_read)
+        self.type: str = sys.intern(book_type)
+
+    def get(self, field: str, default=None):
+        return getattr(self, field) if field in HISTORY_FIELDS else default
+
+    def keys(self) -> tuple[str, ...]:
+        return HISTORY_FIELDS
+
+    def to_dict(self) -> dict[str, str]:
+        return {field: getattr(self, field) for field in HISTORY_FIELDS}
+
+    def __getitem__(self, field: str) -> str:
+        if field not in HISTORY_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, History_record):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in HISTORY_FIELDS)
+
+    def __repr__(self) -> str:
+        return (f"History_record(name='{self.name}', author='{self.author}', date='{self.date}', "
+                f"when_read='{self.when_read}', type='{self.type}')")
+
+
+_WHITESPACE_PATTERN: Final[re.Pattern] = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for search and comparing: case folded, 'ё' replaced with 'е', whitespaces collapsed.
+    :param text: text to normalize
+    :return: normalized text
+    """
+    return _WHITESPACE_PATTERN.sub(' ', text.casefold().replace('ё', 'е')).strip()
+
+
+_TRANSLITERATION: Final[dict[int, str]] = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i',
+    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'iu', 'я': 'ia'
+})
+"""
+Transliteration of russian letters, same as in names of files on device.
+"""
+
+_PUNCTUATION_PATTERN: Final[re.Pattern] = re.compile(r'[\W_]+')
+
+
+def normalize_title(text: str) -> str:
+    """
+    Normalize book name for fuzzy comparing with file names: text is normalized,
+    transliterated into latin, underscores and punctuation replaced with spaces.
+    :param text: book name or file name
+    :return: normalized title
+    """
+    return _PUNCTUATION_PATTERN.sub(' ', normalize_text(text).translate(_TRANSLITERATION)).strip()
+
+
+def normalize_key(name: str, author: str) -> str:
+    """
+    Make key of the book for finding same books in history
+    :param name: book name
+    :param author: book author
+    :return: normalized name and author
+    """
+    return normalize_text(name) + HISTORY_SEPARATOR + normalize_text(author)
+
+
+def parse_history_line(line: str) -> History_record | None:
+    """
+    Split line of read file into record.
+    :param line: line of read file
+    :return: record or None if line has no such format
+    """
+    split_line = [part.strip() for part in line.rstrip('\r\n').split('|')]
+    if len(split_line) == 5:
+        name, author, date, when_read, book_type = split_line
+    elif len(split_line) == 4:  # format written by local storage, without release date
+        name, author, when_read, book_type = split_line
+        date = EMPTY_FIELD
+    else:
+        return None
+    return History_record(name, author or EMPTY_FIELD, date or EMPTY_FIELD, when_read or EMPTY_FIELD,
+                          book_type or EMPTY_FIELD)
+
+
+def format_history_line(record: History_record) -> str:
+    """
+    Make line for read file from record.
+    Release date is written only if it is known, so output stays compatible with local storage format.
+    :param record: record to write
+    :return: line with new line symbol at the end
+    """
+    fields = [record.get('name', ''), record.get('author', ''), record.get('when_read', EMPTY_FIELD)]
+    date = record.get('date', EMPTY_FIELD)
+    if date not in (None, '', EMPTY_FIELD):
+        fields.insert(2, date)
+    fields.append(record.get('type', EMPTY_FIELD))
+    return HISTORY_SEPARATOR.join(str(field) for field in fields) + '\n'
+
+
+def record_from_book(book) -> History_record:
+    """
+    Make record from Book_data object, book marked as read in current year.
+    :param book: Book_data object
+    :return: record with book data
+    """
+    return History_record(str(book.get_book_name()), str(book.get_book_author()),
+                          str(book.get_release_data() or EMPTY_FIELD), str(datetime.datetime.now().year),
+                          str(book.get_book_type()))
+
+
+def format_tombstone(line: int) -> str:
+    """
+    Make tombstone line for removed record
+    :param line: line of removed record, starts from 1
+    :return: line with new line symbol at the end
+    """
+    return TOMBSTONE_MARK + HISTORY_SEPARATOR + str(line) + '\n'
+
+
+def parse_tombstone(line: str) -> int | None:
+    """
+    Get line of removed record from tombstone line
+    :param line: line of read file
+    :return: line of removed record or None if line is not tombstone
+    """
+    if not line.startswith(TOMBSTONE_MARK):
+        return None
+    removed_line = line[len(TOMBSTONE_MARK):].strip(' |\r\n')
+    return int(removed_line) if removed_line.isdigit() else None
@@ -0,0 +1,211 @@
+"""
+Incremental backup of library directory.
+
+Backup directory keeps manifest with size, mtime and hash of every backed up file.
+Live library is compared with manifest by stat only, files with other size or mtime are hashed,
+and only new and really changed files are copied. Backup without changes costs one walk of library tree.
+Files are copied through temporary files, manifest gets entries only of files, which copies are complete
+and have the stat seen when they were hashed.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from core.entities.Copy_engine import (
+    Copy_engine,
+    Copy_report,
+    Total_progress
+)
+from core.entities.Library_scanner import Library_scanner
+
+_MANIFEST_NAME: str = '.backup_manifest.json'
+
+_MANIFEST_VERSION: int = 1
+
+
+class Manifest_entry(NamedTuple):
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+
+class Backup_report(NamedTuple):
+    copied: Copy_report
+    unchanged: int
+    """
+    Count of files, which were not copied.
+    """
+    deleted: int
+    """
+    Count of files, removed from backup because they were removed from library.
+    """
+    seconds: float
+
+    def __str__(self) -> str:
+        return (f'copied {self.copied}, {self.unchanged} files unchanged, {self.deleted} files deleted, '
+                f'{self.seconds:.2f} s in total')
+
+
+class Incremental_backup:
+    """
+    Backup of library into directory with manifest. Hidden directories of library are not backed up.
+    """
+
+    def __init__(self, source: str | os.PathLike, target: str | os.PathLike, copy_engine: Copy_engine, logger,
+                 max_workers: int = 4):
+        """
+        Incremental backup constructor
+        :param source: library directory
+        :param target: backup directory, created if absent
+        :param copy_engine: engine for copying files
+        :param logger: logger instance
+        :param max_workers: *optional, count of threads hashing files
+        """
+        self.source = os.path.abspath(source)
+        self.target = os.path.abspath(target)
+        if os.path.commonpath([self.source, self.target]) == self.source:
+            raise Exception(f'Backup directory {self.target} cannot be inside library {self.source}')
+        self.copy_engine = copy_engine
+        self.local_logger = logger
+        self.max_workers = max_workers
+
+    def manifest_path(self) -> str:
+        return os.path.join(self.target, _MANIFEST_NAME)
+
+    def load_manifest(self) -> dict[str, Manifest_entry]:
+        """
+        Read manifest of backup directory
+        :return: entries by path relative to backup directory, empty if there is no backup yet
+        """
+        try:
+            with open(self.manifest_path(), encoding='utf-8') as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return dict()
+        if data.get('version') != _MANIFEST_VERSION:
+            return dict()
+        return {path: Manifest_entry(*entry) for path, entry in data['files'].items()}
+
+    def save_manifest(self, manifest: dict[str, Manifest_entry]) -> None:
+        tmp_path = self.manifest_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump({'version': _MANIFEST_VERSION, 'files': {path: list(entry) for path, entry in manifest.items()}},
+                      manifest_file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.manifest_path())
+
+    def scan_source(self) -> dict[str, tuple[int, int]]:
+        """
+        Take stat of every library file
+        :return: size and mtime by path relative to library
+        """
+        live = dict()
+        for directory in Library_scanner(self.source).scan():
+            prefix = '' if directory.name == os.curdir else directory.name + os.sep
+            for file in directory.files:
+                live[prefix + file.name] = file.size, file.mtime_ns
+        return live
+
+    def hash_file(self, path: str) -> str | None:
+        try:
+            with open(os.path.join(self.source, path), 'rb') as source_file:
+                return hashlib.file_digest(source_file, lambda: hashlib.blake2b(digest_size=32)).hexdigest()
+        except OSError as e:
+            self.local_logger.log(f'File {path} cannot be read for backup - {e}')
+            return None
+
+    def diff(self, live: dict[str, tuple[int, int]], manifest: dict[str, Manifest_entry]) \
+            -> tuple[dict[str, Manifest_entry], dict[str, Manifest_entry], list[str]]:
+        """
+        Compare live library with manifest, files with other stat are hashed to skip touched but equal files
+        :param live: stat of library files
+        :param manifest: manifest of backup
+        :return: entries of files to copy, entries of unchanged files, paths of files removed from library
+        """
+        suspected = [path for path, stat in live.items()
+                     if path not in manifest or (manifest[path].size, manifest[path].mtime_ns) != stat]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backup-hash') as executor:
+            hashes = dict(zip(suspected, executor.map(self.hash_file, suspected)))
+        to_copy: dict[str, Manifest_entry] = dict()
+        unchanged: dict[str, Manifest_entry] = dict()
+        for path, (size, mtime_ns) in live.items():
+            if path not in hashes:
+                unchanged[path] = manifest[path]
+            elif hashes[path] is None:
+                continue  # not readable, old copy stays in backup
+            elif path in manifest and manifest[path].content_hash == hashes[path]:
+                unchanged[path] = Manifest_entry(size, mtime_ns, hashes[path])
+            else:
+                to_copy[path] = Manifest_entry(size, mtime_ns, hashes[path])
+        removed = [path for path in manifest if path not in live]
+        return to_copy, unchanged, removed
+
+    def copied_entries(self, to_copy: dict[str, Manifest_entry], copied: Copy_report) -> dict[str, Manifest_entry]:
+        """
+        Select entries of files, which were really copied. Failed files and files changed after hashing
+        are left out of manifest, so they are hashed and copied again by next backup
+        :param to_copy: entries of files to copy from diff
+        :param copied: report of copying
+        :return: entries by path relative to backup directory
+        """
+        failed = {os.path.relpath(path, self.source) for path in copied.failed}
+        entries = dict()
+        for path, entry in to_copy.items():
+            if path in failed:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.target, path))  # copy has size and mtime of source, which was copied
+            except OSError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) == (entry.size, entry.mtime_ns):
+                entries[path] = entry
+        return entries
+
+    def __delete(self, removed: list[str]) -> int:
+        """
+        Remove files from backup and directories left empty
+        :return: count of removed files
+        """
+        deleted = 0
+        for path in removed:
+            try:
+                os.remove(os.path.join(self.target, path))
+                deleted += 1
+            except FileNotFoundError:
+                deleted += 1
+            except OSError as e:
+                self.local_logger.log(f'File {path} cannot be removed from backup - {e}')
+                continue
+            directory = os.path.dirname(os.path.join(self.target, path))
+            while directory != self.target and os.path.isdir(directory) and len(os.listdir(directory)) == 0:
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+        return deleted
+
+    def run(self, mirror_deletions: bool = False, on_progress: Total_progress | None = None) -> Backup_report:
+        """
+        Make backup up to date with library
+        :param mirror_deletions: *optional, remove files, which were removed from library, from backup too
+        :param on_progress: *optional, callback of aggregate copying progress
+        :return: backup report
+        """
+        started = time.perf_counter()
+        os.makedirs(self.target, exist_ok=True)
+        manifest = self.load_manifest()
+        to_copy, unchanged, removed = self.diff(self.scan_source(), manifest)
+        copied = self.copy_engine.copy_files([(os.path.join(self.source, path), os.path.join(self.target, path))
+                                              for path in to_copy], on_progress=on_progress)
+        new_manifest = dict(unchanged)
+        new_manifest.update(self.copied_entries(to_copy, copied))
+        deleted = 0
+        if mirror_deletions:
+            deleted = self.__delete(removed)
+        else:
+            new_manifest.update((path, manifest[path]) for path in removed)
+        if new_manifest != manifest:
+            self.save_manifest(new_manifest)
+        report = Backup_report(copied, len(unchanged), deleted, time.perf_counter() - started)
+        self.local_logger.log(f'Incremental backup of {self.source} into {self.target} - {report}')
+        return report
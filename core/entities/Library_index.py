@@ -0,0 +1,219 @@
+"""
+Persistent index of books library.
+
+Index keeps every directory of library with its mtime, subdirectories and selected files.
+Rescan takes stat of known directories only, and lists again only directories which mtime was changed
+(file added, removed or renamed in it), new directories are scanned with their whole subtree.
+File edited in place does not change mtime of directory, so it is found only by deep rescan, which takes stat
+of every file too.
+"""
+import json
+import os
+import time
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple
+)
+
+from core.entities.Library_scanner import (
+    Library_scanner,
+    Scanned_dir,
+    Scanned_file
+)
+
+_INDEX_VERSION: int = 1
+
+
+class Indexed_file(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    inode: int
+    extension: str
+    content_hash: str | None = None
+    """
+    Hash of file content, calculated on demand.
+    """
+    partial_hash: str | None = None
+    """
+    Hash of first and last chunks of file, calculated on demand.
+    """
+
+    @staticmethod
+    def from_scanned(file: Scanned_file) -> 'Indexed_file':
+        return Indexed_file(file.name, file.size, file.mtime_ns, file.inode,
+                            os.path.splitext(file.name)[1][1:].lower())
+
+    def is_same(self, file: Scanned_file) -> bool:
+        """
+        Check that scanned file was not changed since indexing
+        :param file: scanned file with the same name
+        :return: bool value
+        """
+        return (self.size, self.mtime_ns, self.inode) == (file.size, file.mtime_ns, file.inode)
+
+
+class Indexed_dir(NamedTuple):
+    mtime_ns: int
+    subdirs: list[str]
+    files: list[Indexed_file]
+
+
+class Library_index:
+    """
+    Index of library tree, stored in JSON file. Paths of directories are relative to library root, root is '.'.
+    """
+
+    def __init__(self, path: str | os.PathLike, root: str | os.PathLike, exclude_dirs: Iterable[str] = (),
+                 is_selected: Callable[[str], bool] = lambda name: True, max_workers: int = 8):
+        """
+        Library index constructor, index is loaded from file if it was built for the same root and settings
+        :param path: path to index file
+        :param root: root directory of library
+        :param exclude_dirs: *optional, names of directories to skip
+        :param is_selected: *optional, filter of files by name, for example only books
+        :param max_workers: *optional, count of threads for scanning new directories
+        """
+        self.path = path
+        self.root = os.path.abspath(root)
+        self.exclude_dirs = sorted(set(exclude_dirs))
+        self.scanner = Library_scanner(self.root, self.exclude_dirs, is_selected, max_workers)
+        self.dirs: dict[str, Indexed_dir] = dict()
+        self.__load()
+
+    def __load(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != _INDEX_VERSION or data.get('root') != self.root \
+                or data.get('exclude_dirs') != self.exclude_dirs:
+            return
+        self.dirs = {name: Indexed_dir(mtime_ns, subdirs, [Indexed_file(*file) for file in files])
+                     for name, (mtime_ns, subdirs, files) in data['dirs'].items()}
+
+    def save(self) -> None:
+        """
+        Write index into file, file is replaced atomically
+        :return: None
+        """
+        data = {'version': _INDEX_VERSION, 'root': self.root, 'exclude_dirs': self.exclude_dirs,
+                'dirs': {name: [directory.mtime_ns, directory.subdirs, [list(file) for file in directory.files]]
+                         for name, directory in self.dirs.items()}}
+        tmp_path = str(self.path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as index_file:
+            json.dump(data, index_file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def __to_indexed(scanned: Scanned_dir, old: Indexed_dir | None) -> Indexed_dir:
+        """
+        Make indexed directory, hashes of files, which were not changed, are kept
+        """
+        old_files = {file.name: file for file in old.files} if old is not None else dict()
+        files = list()
+        for file in scanned.files:
+            old_file = old_files.get(file.name)
+            is_same = old_file is not None and old_file.is_same(file)
+            files.append(old_file if is_same else Indexed_file.from_scanned(file))
+        return Indexed_dir(scanned.mtime_ns, scanned.subdirs, files)
+
+    def __restat(self, path: str, directory: Indexed_dir) -> tuple[Indexed_dir, int]:
+        """
+        Take stat of every file of directory, which was not listed again. Files changed in place are indexed again,
+        so their hashes are dropped
+        :return: directory and count of changed files
+        """
+        files = list()
+        changed = 0
+        for file in directory.files:
+            try:
+                scanned = self.scanner.scan_file(os.path.join(path, file.name), file.name)
+            except OSError:  # removed right now, directory is listed again on next refresh
+                changed += 1
+                continue
+            if file.is_same(scanned):
+                files.append(file)
+            else:
+                files.append(Indexed_file.from_scanned(scanned))
+                changed += 1
+        return (directory._replace(files=files) if changed > 0 else directory), changed
+
+    def refresh(self, deep: bool = False) -> dict[str, int | float]:
+        """
+        Bring index up to date with library and save it, if something was changed
+        :param deep: *optional, take stat of every file of not changed directories too, so files edited in place
+        are found, costs one stat call per file
+        :return: report with count of checked and rescanned directories, count of files changed in place
+        and spent seconds
+        """
+        started = time.perf_counter()
+        checked = rescanned = changed_files = 0
+        dirs: dict[str, Indexed_dir] = dict()
+        if len(self.dirs) == 0:
+            for scanned in self.scanner.scan():
+                dirs[scanned.name] = self.__to_indexed(scanned, None)
+            checked = rescanned = len(dirs)
+        else:
+            stack = [os.curdir]
+            while len(stack) > 0:
+                name = stack.pop()
+                path = os.path.join(self.root, name)
+                checked += 1
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:  # directory was removed with its subtree
+                    rescanned += 1
+                    continue
+                known = self.dirs.get(name)
+                if known is None:  # new directory, whole subtree is new
+                    for scanned in self.scanner.scan(path):
+                        dirs[scanned.name] = self.__to_indexed(scanned, None)
+                        rescanned += 1
+                    continue
+                if known.mtime_ns != mtime_ns:
+                    known = self.__to_indexed(self.scanner.scan_dir(path)[0], known)
+                    rescanned += 1
+                elif deep:
+                    known, changed = self.__restat(path, known)
+                    changed_files += changed
+                dirs[name] = known
+                stack.extend(os.path.normpath(os.path.join(name, subdir)) for subdir in known.subdirs)
+        changed = rescanned > 0 or changed_files > 0 or dirs.keys() != self.dirs.keys()
+        self.dirs = dirs
+        if changed:
+            self.save()
+        return {'checked': checked, 'rescanned': rescanned, 'changed_files': changed_files,
+                'seconds': time.perf_counter() - started}
+
+    def iter_files(self) -> Iterator[tuple[str, Indexed_file]]:
+        """
+        Iterate over all indexed files
+        :return: generator of directory name and file
+        """
+        for name, directory in self.dirs.items():
+            for file in directory.files:
+                yield name, file
+
+    def update_files(self, changes: dict[tuple[str, str], dict[str, str]]) -> None:
+        """
+        Remember calculated fields of files (hashes) and save index, fields are kept until file is changed
+        :param changes: new values of fields by directory name and file name
+        :return: None
+        """
+        if len(changes) == 0:
+            return
+        for name in {dir_name for dir_name, _ in changes}:
+            directory = self.dirs.get(name)
+            if directory is None:
+                continue
+            files = [file._replace(**changes[(name, file.name)]) if (name, file.name) in changes else file
+                     for file in directory.files]
+            self.dirs[name] = directory._replace(files=files)
+        self.save()
+
+    def count_files(self) -> int:
+        return sum(len(directory.files) for directory in self.dirs.values())
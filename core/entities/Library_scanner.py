@@ -0,0 +1,124 @@
+"""
+Scanner of books library tree, built on os.scandir.
+
+Every directory is listed once, stat of files is taken from directory entries,
+subdirectories are scanned in thread pool (listing of directory releases GIL while waiting for disk).
+"""
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from queue import SimpleQueue
+from typing import (
+    Callable,
+    Iterable,
+    NamedTuple
+)
+
+
+class Scanned_file(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+class Scanned_dir(NamedTuple):
+    name: str
+    """
+    Path relative to the root of library.
+    """
+    path: str
+    mtime_ns: int
+    files: list[Scanned_file]
+    """
+    Files, selected by filter of scanner.
+    """
+    subdirs: list[str]
+    """
+    Names of subdirectories, which are not skipped.
+    """
+
+
+class Library_scanner:
+    """
+    Parallel walker of library tree. Hidden and excluded directories are skipped with all their content,
+    symbolic links to directories are not followed.
+    """
+
+    def __init__(self, root: str | os.PathLike, exclude_dirs: Iterable[str] = (),
+                 is_selected: Callable[[str], bool] = lambda name: True, max_workers: int = 8):
+        """
+        Library scanner constructor
+        :param root: root directory of library
+        :param exclude_dirs: *optional, names of directories to skip
+        :param is_selected: *optional, filter of files by name, for example only books
+        :param max_workers: *optional, count of threads listing directories
+        """
+        self.root = os.path.abspath(root)
+        self.exclude_dirs = frozenset(exclude_dirs)
+        self.is_selected = is_selected
+        self.max_workers = max_workers
+
+    def scan_dir(self, path: str) -> tuple[Scanned_dir, list[str]]:
+        """
+        List one directory
+        :param path: path to directory inside root
+        :return: scanned directory and paths to its subdirectories
+        """
+        files = list()
+        subdirs = list()
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.') and entry.name not in self.exclude_dirs:
+                                subdirs.append(entry.path)
+                        elif self.is_selected(entry.name) and entry.is_file():
+                            stat = entry.stat()
+                            files.append(Scanned_file(entry.name, stat.st_size, stat.st_mtime_ns, entry.inode()))
+                    except OSError:  # file was removed while directory is listed
+                        continue
+        except OSError:
+            mtime_ns = 0
+        name = os.path.relpath(path, self.root)
+        subdir_names = sorted(os.path.basename(subdir) for subdir in subdirs)
+        return Scanned_dir(name, path, mtime_ns, sorted(files), subdir_names), subdirs
+
+    @staticmethod
+    def scan_file(path: str, name: str) -> Scanned_file:
+        """
+        Take stat of one file the same way as directory listing does: symbolic link is followed,
+        but inode is inode of link itself
+        :param path: path to file
+        :param name: name of file
+        :return: scanned file, OSError is raised if file is absent
+        """
+        file_stat = os.stat(path, follow_symlinks=False)
+        inode = file_stat.st_ino
+        if stat.S_ISLNK(file_stat.st_mode):
+            file_stat = os.stat(path)
+        return Scanned_file(name, file_stat.st_size, file_stat.st_mtime_ns, inode)
+
+    def scan(self, start: str | os.PathLike | None = None) -> list[Scanned_dir]:
+        """
+        Walk library tree once
+        :param start: *optional, path to subtree of library, whole library by default
+        :return: list with every directory of tree in order of paths, names are relative to root, root is '.'
+        """
+        root, subdirs = self.scan_dir(self.root if start is None else os.path.abspath(start))
+        scanned: list[Scanned_dir] = [root]
+        done = SimpleQueue()  # futures of scanned directories, in order of completion
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='library-scanner') as executor:
+            pending = 0
+            while True:
+                for subdir in subdirs:
+                    executor.submit(self.scan_dir, subdir).add_done_callback(done.put)
+                pending += len(subdirs)
+                if pending == 0:
+                    break
+                directory, subdirs = done.get().result()
+                pending -= 1
+                scanned.append(directory)
+        return sorted(scanned, key=lambda directory: directory.name)
@@ -0,0 +1,220 @@
+"""
+Durable queue of history mutations for remote backends.
+
+Mutations are appended into journal file and sent by background worker, so adding book never waits for network.
+Sent mutations are recorded in acks file, both files survive restarts. Journal may be shared by several processes,
+so it is locked, and when queue of process is empty, only mutations acknowledged for all their backends are dropped.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any
+
+from core.entities.History_lock import History_lock
+from core.entities.Remote_backend import Remote_backend
+
+_ACKS_FILE_SUFFIX: str = '.acks'
+
+
+class Outbound_queue:
+    """
+    Write-ahead queue with one worker thread. Every backend gets mutations in order of adding, by batches.
+    Failed backend is retried with exponential backoff, other backends are not delayed by it.
+    """
+
+    def __init__(self, path: str | os.PathLike, backends: list[Remote_backend], logger, batch_size: int = 100,
+                 base_delay: float = 1.0, max_delay: float = 300.0, fsync: bool = True):
+        """
+        Outbound queue constructor, pending mutations are loaded from journal
+        :param path: path to journal file
+        :param backends: remote backends, names must be unique
+        :param logger: logger instance
+        :param batch_size: max count of mutations sent in one push
+        :param base_delay: seconds before the first retry of failed backend, doubled on every next failure
+        :param max_delay: max seconds between retries
+        :param fsync: flush journal to disk on every put
+        """
+        self.path = str(path)
+        self.acks_path = self.path + _ACKS_FILE_SUFFIX
+        self.journal_lock = History_lock(self.path)
+        """
+        Lock of journal and acks files, appends take shared lock, rewrite takes exclusive lock.
+        """
+        self.backends: dict[str, Remote_backend] = {backend.name: backend for backend in backends}
+        self.local_logger = logger
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.__condition = threading.Condition()  # guards pending mutations, notified when they are sent
+        self.__wake = threading.Event()
+        self.__stopped = threading.Event()
+        self.__worker: threading.Thread | None = None
+        self.__pending: dict[str, list[dict]] = {name: list() for name in self.backends}
+        self.__failures: dict[str, int] = {name: 0 for name in self.backends}
+        self.__next_attempt: dict[str, float] = {name: 0.0 for name in self.backends}
+        self.__load()
+
+    @staticmethod
+    def __read_lines(path: str) -> list[dict]:
+        if not os.path.exists(path):
+            return []
+        entries = list()
+        with open(path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:  # line torn by crash, mutation was not confirmed to caller
+                    continue
+        return entries
+
+    def __load(self) -> None:
+        acked = {(ack['id'], ack['backend']) for ack in self.__read_lines(self.acks_path)}
+        for mutation in self.__read_lines(self.path):
+            for name in mutation['backends']:
+                if name in self.__pending and (mutation['id'], name) not in acked:
+                    self.__pending[name].append(mutation)
+        if self.pending_count() > 0:
+            self.local_logger.log(f'Outbound queue loaded with {self.pending_count()} pending mutations')
+
+    def __append(self, path: str, entries: list[dict], fsync: bool) -> None:
+        data = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries).encode('utf-8')
+        with self.journal_lock.shared():
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while len(view) > 0:
+                    view = view[os.write(fd, view):]
+                if fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def __rewrite(self, path: str, entries: list[dict]) -> None:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
+            tmp_file.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+            if self.fsync:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+
+    def __compact(self) -> None:
+        """
+        Drop mutations acknowledged by all their backends from journal, and their acks from acks file.
+        Mutations of other processes using the same journal are kept until they are acknowledged too
+        """
+        with self.journal_lock.exclusive():
+            acks = self.__read_lines(self.acks_path)
+            acked = {(ack['id'], ack['backend']) for ack in acks}
+            mutations = [mutation for mutation in self.__read_lines(self.path)
+                         if any((mutation['id'], name) not in acked for name in mutation['backends'])]
+            kept_ids = {mutation['id'] for mutation in mutations}
+            self.__rewrite(self.path, mutations)
+            self.__rewrite(self.acks_path, [ack for ack in acks if ack['id'] in kept_ids])
+
+    def put(self, operation: str, record: dict[str, Any], backends: tuple[str, ...] | None = None) -> str:
+        """
+        Add mutation into queue, mutation is stored in journal before return
+        :param operation: name of operation, for example 'add'
+        :param record: history record as dict
+        :param backends: *optional, names of backends to send mutation, all backends by default
+        :return: id of mutation
+        """
+        targets = [name for name in (backends or self.backends) if name in self.backends]
+        mutation = {'id': uuid.uuid4().hex, 'operation': operation, 'record': record,
+                    'backends': targets, 'created': time.time()}
+        with self.__condition:
+            self.__append(self.path, [mutation], self.fsync)
+            for name in targets:
+                self.__pending[name].append(mutation)
+        self.start()
+        self.__wake.set()
+        return mutation['id']
+
+    def start(self) -> None:
+        """
+        Start worker thread, if it is not started yet
+        :return: None
+        """
+        with self.__condition:
+            if self.__worker is None or not self.__worker.is_alive():
+                self.__stopped.clear()
+                self.__worker = threading.Thread(target=self.__run, name='outbound-queue', daemon=True)
+                self.__worker.start()
+
+    def close(self, timeout: float | None = None) -> None:
+        """
+        Stop worker thread, pending mutations stay in journal
+        :param timeout: seconds to wait for worker
+        :return: None
+        """
+        self.__stopped.set()
+        self.__wake.set()
+        if self.__worker is not None:
+            self.__worker.join(timeout)
+
+    def __run(self) -> None:
+        while not self.__stopped.is_set():
+            delay = self.__send_ready()
+            self.__wake.wait(delay)
+            self.__wake.clear()
+
+    def __send_ready(self) -> float | None:
+        """
+        Send one batch to every backend, which has pending mutations and is not waiting for retry
+        :return: seconds to wait before next sending, None if nothing is pending
+        """
+        delays = list()
+        for name, backend in self.backends.items():
+            with self.__condition:
+                batch = self.__pending[name][:self.batch_size]
+            if len(batch) == 0:
+                continue
+            now = time.monotonic()
+            if now < self.__next_attempt[name]:
+                delays.append(self.__next_attempt[name] - now)
+                continue
+            try:
+                backend.push(batch)
+            except Exception as e:
+                self.__failures[name] += 1
+                delay = min(self.base_delay * 2 ** (self.__failures[name] - 1), self.max_delay)
+                delay *= random.uniform(0.5, 1.0)  # jitter, so retries of different backends are not synchronous
+                self.__next_attempt[name] = now + delay
+                delays.append(delay)
+                self.local_logger.log(f'Sending {len(batch)} mutations to {name} failed '
+                                      f'({self.__failures[name]} time) - {e}, retry in {delay:.1f} s')
+                continue
+            self.__failures[name] = 0
+            self.__acknowledge(name, batch)
+            delays.append(0.0)
+        return min(delays) if len(delays) > 0 else None
+
+    def __acknowledge(self, name: str, batch: list[dict]) -> None:
+        with self.__condition:
+            self.__append(self.acks_path, [{'id': mutation['id'], 'backend': name} for mutation in batch], False)
+            del self.__pending[name][:len(batch)]
+            if self.pending_count() == 0:  # everything of this process is sent, its mutations are not needed anymore
+                self.__compact()
+            self.__condition.notify_all()
+
+    def pending_count(self) -> int:
+        """
+        Count of mutations not sent to some backend, mutation for two backends is counted twice
+        :return: count of mutations
+        """
+        with self.__condition:
+            return sum(len(pending) for pending in self.__pending.values())
+
+    def wait_empty(self, timeout: float | None = None) -> bool:
+        """
+        Wait until all mutations are sent
+        :param timeout: max seconds to wait
+        :return: bool value if queue is empty
+        """
+        with self.__condition:
+            return self.__condition.wait_for(lambda: self.pending_count() == 0, timeout)
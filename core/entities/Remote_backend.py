@@ -0,0 +1,97 @@
+"""
+Remote storages of history, used by outbound queue of Memorize module.
+
+Every mutation has unique id, backend must apply mutation with the same id only once,
+so queue can safely repeat batches after failures.
+"""
+import json
+import os
+from abc import (
+    ABC,
+    abstractmethod
+)
+
+from core.entities.Delta_sync import (
+    Delta_sync,
+    Sync_report
+)
+
+
+class Remote_backend(ABC):
+    """
+    Storage of history, which can be unavailable for some time
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abstractmethod
+    def push(self, mutations: list[dict]) -> None:
+        """
+        Apply batch of mutations, raise exception if batch is not applied.
+        Batch can be repeated, mutations with known ids must be skipped.
+        :param mutations: list with mutations, each with id, operation and record
+        :return: None
+        """
+        pass
+
+
+class Directory_backend(Remote_backend):
+    """
+    Local stand-in of remote storage - mutations are stored in directory, one file per mutation.
+    Used for checking queue without network, or for storing history copy on other disk.
+    """
+
+    def __init__(self, path: str | os.PathLike, name: str = 'directory'):
+        """
+        Directory backend constructor
+        :param path: path to directory, created if not exists
+        :param name: name of backend in queue
+        """
+        super().__init__(name)
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def push(self, mutations: list[dict]) -> None:
+        for mutation in mutations:
+            target = os.path.join(self.path, mutation['id'] + '.json')
+            if os.path.exists(target):  # already applied
+                continue
+            with open(target + '.tmp', 'w', encoding='utf-8') as mutation_file:
+                json.dump(mutation, mutation_file, ensure_ascii=False)
+            os.replace(target + '.tmp', target)
+
+    def list_mutations(self) -> list[dict]:
+        """
+        Get all stored mutations in order of their creation
+        :return: list with mutations
+        """
+        mutations = list()
+        for file_name in os.listdir(self.path):
+            if file_name.endswith('.json'):
+                with open(os.path.join(self.path, file_name), encoding='utf-8') as mutation_file:
+                    mutations.append(json.load(mutation_file))
+        return sorted(mutations, key=lambda mutation: (mutation['created'], mutation['id']))
+
+
+class Yandex_backend(Remote_backend):
+    """
+    Yandex disk storage. Mutations are already in read file, so push makes delta sync of read file -
+    only changed chunks are uploaded, repeated push of the same batch uploads nothing.
+    """
+
+    def __init__(self, delta_sync: Delta_sync, logger, name: str = 'yandex'):
+        """
+        Yandex backend constructor
+        :param delta_sync: synchronization of read file with directory on yandex disk
+        :param logger: logger instance
+        :param name: name of backend in queue
+        """
+        super().__init__(name)
+        self.delta_sync = delta_sync
+        self.local_logger = logger
+        self.last_report: Sync_report | None = None
+
+    def push(self, mutations: list[dict]) -> None:
+        self.last_report = self.delta_sync.push()
+        self.local_logger.log(f'History pushed to {self.name} for {len(mutations)} mutations - {self.last_report}')
@@ -0,0 +1,132 @@
+"""
+Read-through cache of remote storages answers.
+
+First layer is in-memory LRU, second is SQLite file, so answers survive restarts.
+Entry younger than TTL is used as is, older entry is revalidated by revision of remote data
+and loaded again only if revision was changed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable
+)
+
+_SCHEMA: str = ('CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, revision TEXT, checked_at REAL NOT NULL)')
+
+
+class Remote_cache:
+    """
+    Two-layer cache with hit and miss counters. Values must be serializable into JSON.
+    """
+
+    def __init__(self, path: str | os.PathLike, logger, ttl: float = 300.0, max_entries: int = 1024):
+        """
+        Remote cache constructor, database is opened on first use
+        :param path: path to cache database
+        :param logger: logger instance
+        :param ttl: seconds, during which entry is used without revalidation
+        :param max_entries: max count of entries in memory
+        """
+        self.path = path
+        self.local_logger = logger
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.__memory: OrderedDict[str, tuple[Any, str | None, float]] = OrderedDict()  # value, revision, checked
+        self.__connection: sqlite3.Connection | None = None
+        self.__lock = threading.Lock()
+        self.stats: dict[str, int] = {'memory_hits': 0, 'disk_hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+            with self.__connection:
+                self.__connection.execute(_SCHEMA)
+        return self.__connection
+
+    def __remember(self, key: str, value: Any, revision: str | None, checked_at: float) -> None:
+        self.__memory[key] = (value, revision, checked_at)
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.max_entries:
+            self.__memory.popitem(last=False)
+
+    def __lookup(self, key: str) -> tuple[Any, str | None, float] | None:
+        entry = self.__memory.get(key)
+        if entry is not None:
+            self.__memory.move_to_end(key)
+            return entry
+        try:
+            row = self.__connect().execute('SELECT value, revision, checked_at FROM cache WHERE key = ?',
+                                           (key,)).fetchone()
+        except sqlite3.Error as e:
+            self.local_logger.log(f'Remote cache database is not available - {e}')
+            return None
+        if row is None:
+            return None
+        entry = json.loads(row[0]), row[1], row[2]
+        self.__remember(key, *entry)
+        return entry
+
+    def __store(self, key: str, value: Any, revision: str | None, checked_at: float) -> None:
+        self.__remember(key, value, revision, checked_at)
+        try:
+            with self.__connect() as connection:
+                connection.execute('INSERT OR REPLACE INTO cache (key, value, revision, checked_at) '
+                                   'VALUES (?, ?, ?, ?)', (key, json.dumps(value, ensure_ascii=False),
+                                                           revision, checked_at))
+        except sqlite3.Error as e:
+            self.local_logger.log(f'Remote cache database is not available - {e}')
+
+    def get(self, key: str, load: Callable[[], Any], get_revision: Callable[[], str | None] = None) -> Any:
+        """
+        Get value from cache or load it from remote storage
+        :param key: key of value
+        :param load: function for loading value from remote storage
+        :param get_revision: *optional, function for getting revision of remote data, cheaper than load
+        :return: value
+        """
+        now = time.time()
+        with self.__lock:
+            in_memory = key in self.__memory
+            entry = self.__lookup(key)
+        if entry is not None and now - entry[2] < self.ttl:
+            self.__count('memory_hits' if in_memory else 'disk_hits')
+            return entry[0]
+        revision = get_revision() if get_revision is not None else None  # taken before load, so never newer
+        if entry is not None and revision is not None and revision == entry[1]:
+            with self.__lock:
+                self.__store(key, entry[0], revision, now)
+            self.__count('revalidated')
+            return entry[0]
+        value = load()
+        with self.__lock:
+            self.__store(key, value, revision, now)
+        self.__count('misses')
+        return value
+
+    def __count(self, counter: str) -> None:
+        with self.__lock:
+            self.stats[counter] += 1
+            total = sum(self.stats.values())
+        if total % 100 == 0 or counter == 'misses':
+            self.local_logger.log(f'Remote cache stats - {self.stats}')
+
+    def invalidate(self, prefix: str = '') -> None:
+        """
+        Remove entries, which keys start with prefix
+        :param prefix: *optional, prefix of keys, all entries by default
+        :return: None
+        """
+        with self.__lock:
+            for key in [key for key in self.__memory if key.startswith(prefix)]:
+                del self.__memory[key]
+            try:
+                with self.__connect() as connection:
+                    connection.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+            except sqlite3.Error as e:
+                self.local_logger.log(f'Remote cache database is not available - {e}')
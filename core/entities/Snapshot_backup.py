@@ -0,0 +1,245 @@
+"""
+Dated snapshots of library with hard links.
+
+Every snapshot is complete copy of library, but files not changed since previous snapshot are hard links
+to its files, so new snapshot takes space and time of changed files only. Snapshot is built in partial directory
+and renamed, when it is complete, so interrupted snapshot is never taken as previous one.
+"""
+import datetime
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from core.entities.Copy_engine import (
+    Copy_engine,
+    Copy_report,
+    Total_progress
+)
+from core.entities.Incremental_backup import Incremental_backup
+
+_SNAPSHOT_NAME_FORMAT: str = '%Y-%m-%d_%H%M%S'
+
+_PARTIAL_SUFFIX: str = '.partial'
+
+_PRUNED_SUFFIX: str = '.pruned'
+
+
+class Retention_policy(NamedTuple):
+    daily: int = 30
+    """
+    Count of last days, for which the newest snapshot of day is kept.
+    """
+    weekly: int = 8
+    """
+    Count of last weeks, for which the newest snapshot of week is kept.
+    """
+
+
+class Snapshot_report(NamedTuple):
+    name: str
+    copied: Copy_report
+    linked: int
+    """
+    Count of files linked to previous snapshot.
+    """
+    pruned: list[str]
+    """
+    Names of snapshots removed by retention policy.
+    """
+    seconds: float
+
+    def __str__(self) -> str:
+        return (f'snapshot {self.name}, copied {self.copied}, {self.linked} files linked, '
+                f'{len(self.pruned)} snapshots pruned, {self.seconds:.2f} s in total')
+
+
+class Snapshot_backup:
+    """
+    Directory with dated snapshots of library, every snapshot has manifest of incremental backup.
+    """
+
+    def __init__(self, source: str | os.PathLike, target: str | os.PathLike, copy_engine: Copy_engine, logger,
+                 max_workers: int = 8):
+        """
+        Snapshot backup constructor
+        :param source: library directory
+        :param target: directory with snapshots, created if absent
+        :param copy_engine: engine for copying changed files
+        :param logger: logger instance
+        :param max_workers: *optional, count of threads linking and removing files
+        """
+        self.source = os.path.abspath(source)
+        self.target = os.path.abspath(target)
+        self.copy_engine = copy_engine
+        self.local_logger = logger
+        self.max_workers = max_workers
+
+    @staticmethod
+    def parse_name(name: str) -> datetime.datetime | None:
+        try:
+            return datetime.datetime.strptime(name, _SNAPSHOT_NAME_FORMAT)
+        except ValueError:
+            return None
+
+    def list_snapshots(self) -> list[str]:
+        """
+        List complete snapshots
+        :return: names of snapshots from the oldest to the newest
+        """
+        if not os.path.isdir(self.target):
+            return list()
+        return sorted(name for name in os.listdir(self.target)
+                      if self.parse_name(name) is not None and os.path.isdir(os.path.join(self.target, name)))
+
+    def __backup(self, path: str) -> Incremental_backup:
+        return Incremental_backup(self.source, path, self.copy_engine, self.local_logger)
+
+    def __link(self, previous: str, current: str, path: str) -> bool:
+        """
+        Link file of previous snapshot into current one
+        :return: False if file cannot be linked (removed from snapshot or too many links)
+        """
+        try:
+            os.link(os.path.join(previous, path), os.path.join(current, path))
+            return True
+        except OSError:
+            return False
+
+    def create(self, on_progress: Total_progress | None = None) -> tuple[str, Copy_report, int]:
+        """
+        Make new snapshot of library
+        :param on_progress: *optional, callback of aggregate copying progress
+        :return: name of snapshot, report of copied files and count of linked files
+        """
+        name = datetime.datetime.now().strftime(_SNAPSHOT_NAME_FORMAT)
+        current = os.path.join(self.target, name)
+        if os.path.exists(current):
+            raise Exception(f'Snapshot {name} already exists')
+        snapshots = self.list_snapshots()
+        previous = os.path.join(self.target, snapshots[-1]) if len(snapshots) > 0 else None
+        partial = current + _PARTIAL_SUFFIX
+        if os.path.exists(partial):  # left by interrupted snapshot
+            shutil.rmtree(partial)
+        os.makedirs(partial)
+        backup = self.__backup(partial)
+        manifest = self.__backup(previous).load_manifest() if previous is not None else dict()
+        to_copy, unchanged, _ = backup.diff(backup.scan_source(), manifest)
+
+        for directory in {os.path.dirname(path) for path in unchanged}:
+            os.makedirs(os.path.join(partial, directory), exist_ok=True)
+        paths = list(unchanged)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='snapshot-link') as executor:
+            is_linked = list(executor.map(lambda path: self.__link(previous, partial, path), paths))
+        linked = sum(is_linked)
+        for path, is_path_linked in zip(paths, is_linked):
+            if not is_path_linked:
+                to_copy[path] = unchanged.pop(path)
+
+        copied = self.copy_engine.copy_files([(os.path.join(self.source, path), os.path.join(partial, path))
+                                              for path in to_copy], on_progress=on_progress)
+        new_manifest = dict(unchanged)
+        new_manifest.update(backup.copied_entries(to_copy, copied))
+        backup.save_manifest(new_manifest)
+        os.rename(partial, current)
+        return name, copied, linked
+
+    def select_expired(self, policy: Retention_policy) -> list[str]:
+        """
+        Select snapshots, which are not kept by retention policy, the newest snapshot is always kept
+        :param policy: retention policy
+        :return: names of expired snapshots
+        """
+        snapshots = self.list_snapshots()
+        kept: set[str] = set(snapshots[-1:])
+        days: list[datetime.date] = list()
+        weeks: list[tuple[int, int]] = list()
+        for name in reversed(snapshots):  # the newest snapshot of day and week is met first
+            moment = self.parse_name(name)
+            day, week = moment.date(), moment.isocalendar()[:2]
+            if day not in days and len(days) < policy.daily:
+                days.append(day)
+                kept.add(name)
+            if week not in weeks and len(weeks) < policy.weekly:
+                weeks.append(week)
+                kept.add(name)
+        return [name for name in snapshots if name not in kept]
+
+    def __list_leftovers(self) -> list[str]:
+        """
+        List directories left by interrupted prune, and by interrupted snapshots older than the newest snapshot
+        (snapshot being created right now is newer)
+        :return: names of directories
+        """
+        snapshots = self.list_snapshots()
+        if len(snapshots) == 0:
+            return list()
+        newest = snapshots[-1]
+        leftovers = list()
+        with os.scandir(self.target) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                if entry.name.endswith(_PRUNED_SUFFIX):
+                    leftovers.append(entry.name)
+                elif entry.name.endswith(_PARTIAL_SUFFIX) \
+                        and self.parse_name(entry.name[:-len(_PARTIAL_SUFFIX)]) is not None \
+                        and entry.name[:-len(_PARTIAL_SUFFIX)] < newest:
+                    leftovers.append(entry.name)
+        return sorted(leftovers)
+
+    def prune(self, policy: Retention_policy) -> list[str]:
+        """
+        Remove expired snapshots and directories left by interrupted snapshots and prunes.
+        Snapshots are renamed first, then their directories are removed in parallel
+        :param policy: retention policy
+        :return: names of removed snapshots
+        """
+        expired = self.select_expired(policy)
+        leftovers = [os.path.join(self.target, name) for name in self.__list_leftovers()]
+        pruned_paths = list()
+        for name in expired:
+            pruned_path = os.path.join(self.target, name + _PRUNED_SUFFIX)
+            os.rename(os.path.join(self.target, name), pruned_path)
+            pruned_paths.append(pruned_path)
+        pruned_paths.extend(leftovers)
+        subtrees = list()
+        for path in pruned_paths:
+            with os.scandir(path) as entries:
+                subtrees.extend(entry.path for entry in entries)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='snapshot-prune') as executor:
+            for path, error in zip(subtrees, executor.map(self.__remove, subtrees)):
+                if error is not None:
+                    self.local_logger.log(f'Snapshot entry {path} cannot be removed - {error}')
+        for path in pruned_paths:
+            shutil.rmtree(path, ignore_errors=True)
+        if len(leftovers) > 0:
+            self.local_logger.log(f'Removed {len(leftovers)} directories of interrupted snapshots and prunes')
+        return expired
+
+    @staticmethod
+    def __remove(path: str) -> OSError | None:
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            return e
+        return None
+
+    def run(self, policy: Retention_policy = Retention_policy(), on_progress: Total_progress | None = None) \
+            -> Snapshot_report:
+        """
+        Make new snapshot and prune expired ones
+        :param policy: *optional, retention policy
+        :param on_progress: *optional, callback of aggregate copying progress
+        :return: snapshot report
+        """
+        started = time.perf_counter()
+        name, copied, linked = self.create(on_progress)
+        pruned = self.prune(policy)
+        report = Snapshot_report(name, copied, linked, pruned, time.perf_counter() - started)
+        self.local_logger.log(f'Snapshot backup of {self.source} into {self.target} - {report}')
+        return report
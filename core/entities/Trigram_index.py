@@ -0,0 +1,177 @@
+"""
+In-memory trigram inverted index for substring search in history
+"""
+from array import array
+from bisect import bisect_left
+from typing import (
+    Callable,
+    Iterable
+)
+
+from core.entities.History_record import (
+    History_record,
+    normalize_text
+)
+
+_KEY_SEPARATOR: str = '\x00'
+"""
+Separator between name and author in search key, so trigrams do not cross fields.
+"""
+
+
+class Trigram_index:
+    """
+    Inverted index from every trigram of normalized book name and author to positions of records.
+    Search takes posting list of the rarest query trigram and checks only records from it.
+    Records itself are not stored in index, they are taken by line number when needed.
+    """
+
+    def __init__(self, get_record: Callable[[int], History_record]):
+        """
+        Trigram index constructor
+        :param get_record: function for getting record by its line number
+        """
+        self.__get_record = get_record
+        self.__postings: dict[str, array] = dict()
+        self.__keys: list[str] = list()  # normalized search key of every entry
+        self.__lines: array = array('I')  # line in read file of every entry
+        self.__removed: set[int] = set()  # entries of removed records
+        self.__orders: dict[str, list[int]] = dict()  # cached entries order by record field
+        self.__live: list[int] | None = None  # cached entries without removed
+
+    @staticmethod
+    def __trigrams(text: str) -> set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def make_key(record: History_record) -> str:
+        """
+        Make search key for record
+        :param record: history record
+        :return: normalized name and author
+        """
+        return normalize_text(record.get('name', '')) + _KEY_SEPARATOR + normalize_text(record.get('author', ''))
+
+    def add(self, line: int, record: History_record) -> None:
+        """
+        Add record into index
+        :param line: number of line in read file
+        :param record: history record
+        :return: None
+        """
+        entry = len(self.__keys)
+        key = self.make_key(record)
+        self.__keys.append(key)
+        self.__lines.append(line)
+        self.__orders.clear()
+        self.__live = None
+        for trigram in self.__trigrams(key):
+            posting = self.__postings.get(trigram)
+            if posting is None:
+                posting = self.__postings[trigram] = array('I')
+            posting.append(entry)
+
+    def add_many(self, records: Iterable[tuple[int, History_record]]) -> None:
+        for line, record in records:
+            self.add(line, record)
+
+    def clear(self) -> None:
+        self.__postings.clear()
+        self.__keys.clear()
+        self.__lines = array('I')
+        self.__removed.clear()
+        self.__orders.clear()
+        self.__live = None
+
+    def remove(self, line: int) -> None:
+        """
+        Remove record from index
+        :param line: number of line of removed record
+        :return: None
+        """
+        entry = bisect_left(self.__lines, line)  # entries are added in order of lines
+        if entry < len(self.__lines) and self.__lines[entry] == line and entry not in self.__removed:
+            self.__removed.add(entry)
+            self.__orders.clear()
+            self.__live = None
+
+    def search(self, text: str) -> list[tuple[int, History_record]]:
+        """
+        Find all records which name or author contains given text
+        :param text: part of the book name or author
+        :return: list with line number and record for every match, in order of lines
+        """
+        return [self.entry(entry) for entry in self.search_entries(text)]
+
+    def search_entries(self, text: str) -> list[int]:
+        """
+        Find entries which name or author contains given text
+        :param text: part of the book name or author
+        :return: list with entries numbers, in order of lines
+        """
+        query = normalize_text(text)
+        if query == '':
+            return []
+        if len(query) < 3:  # too short for trigrams, check every key
+            candidates: Iterable[int] = range(len(self.__keys))
+        else:
+            postings = [self.__postings.get(trigram) for trigram in self.__trigrams(query)]
+            if any(posting is None for posting in postings):
+                return []
+            candidates = min(postings, key=len)
+        return [entry for entry in candidates if query in self.__keys[entry] and entry not in self.__removed]
+
+    def name_key(self, entry: int) -> str:
+        """
+        Get normalized book name of entry, record is not taken
+        :param entry: number of entry in index
+        :return: normalized name
+        """
+        return self.__keys[entry].partition(_KEY_SEPARATOR)[0]
+
+    def is_live(self, entry: int) -> bool:
+        return entry not in self.__removed
+
+    def entries_count(self) -> int:
+        """
+        Count of entries including removed, every new entry gets this number
+        :return: count of entries
+        """
+        return len(self.__keys)
+
+    def entry(self, entry: int) -> tuple[int, History_record]:
+        """
+        Get indexed record by its entry number, entries go in order of lines
+        :param entry: number of entry in index
+        :return: line number and record
+        """
+        line = self.__lines[entry]
+        return line, self.__get_record(line)
+
+    def ordered(self, field: str) -> list[int]:
+        """
+        Get entries numbers sorted by normalized record field, order is cached until index is changed.
+        To make order every record is taken once.
+        :param field: name of record field
+        :return: list with entries numbers
+        """
+        order = self.__orders.get(field)
+        if order is None:
+            entries = self.entries()
+            keys = {entry: normalize_text(self.__get_record(self.__lines[entry]).get(field, '')) for entry in entries}
+            order = self.__orders[field] = sorted(entries, key=keys.__getitem__)
+        return order
+
+    def entries(self) -> list[int] | range:
+        """
+        Get numbers of entries, which are not removed, in order of lines
+        :return: list or range with entries numbers
+        """
+        if len(self.__removed) == 0:
+            return range(len(self.__keys))
+        if self.__live is None:
+            self.__live = [entry for entry in range(len(self.__keys)) if entry not in self.__removed]
+        return self.__live
+
+    def __len__(self) -> int:
+        return len(self.__keys) - len(self.__removed)
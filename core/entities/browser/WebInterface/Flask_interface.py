@@ -15,11 +15,20 @@ from flask import (
 )
 
 from core.entities.Book_data import Book_data
+from core.entities.History_record import History_record
+from core.exceptions.KindleHistoryException import KindleHistoryException
 from core.other import Utils
 from data.Wrappers import safe_log
 
 __web_app: Flask = Flask(__name__, static_url_path='/static')
 
+DEFAULT_PER_PAGE: int = 50
+"""
+Count of books on one page of history
+"""
+
+MAX_PER_PAGE: int = 500
+
 
 class Dp:
     """
@@ -33,11 +42,24 @@ class Dp:
 
 
 class Cache:
-    all_books: list[dict] = None
-    fav_books: list[dict] = None
+    all_books: list[History_record] = None
+    fav_books: list[History_record] = None
     all_book_count: int = 0
     fav_book_count: int = 0
-    found_books: list[str]
+    history_version: int = -1
+
+
+def __drop_stale_cache() -> None:
+    """
+    Drop cached history if read file was changed since it was cached
+    :return: None
+    """
+    version = Dp.history_mod.get_history_version()
+    if version != Cache.history_version:
+        Dp.local_logger.log('History changed, cache is dropped')
+        Cache.all_books = None
+        Cache.all_book_count = 0
+        Cache.history_version = version
 
 
 @safe_log
@@ -93,12 +115,17 @@ def remove_book_page():
     Page for removing book
     :return: page
     """
-    if Dp.transfer_mod is None:
-        flash("Error, transfer module is not initialized")
+    if Dp.history_mod is None:
+        flash("Error, history module is not initialized")
         return redirect(url_for('root_page'))
 
     if request.method == 'POST':
         title = request.form['title']  # required parameter
+        removed = Dp.history_mod.remove_book_from_history(title)
+        if removed == 0:
+            flash(f'Book {title} not found in history')
+            return redirect(url_for('remove_book_page'))
+        Dp.local_logger.log(f'Removed book data - {title}')
 
         sleep(1)  # sleep
         return redirect(url_for('root_page'))
@@ -112,16 +139,14 @@ def find_book_data():
     """
     data = request.get_json()
     text = data.get('text') if data else None
-    search_res = Dp.history_mod.find_book(text)
-    if Cache.found_books.__contains__(search_res):
-        Dp.local_logger.log('Found result in cache')
-        return jsonify({'status': 'found', 'message': 'Book found in history'})
+    fuzzy = bool(data.get('fuzzy', False)) if data else False
+    search_res = Dp.history_mod.find_book(text, fuzzy=fuzzy)  # served by search index, no need for cache
+    if search_res:
+        return jsonify({'status': 'found',
+                        'message': f'Found {len(search_res)} books in history',
+                        'books': [dict(book.to_dict(), line=line) for line, book in search_res]})
     else:
-        if search_res:
-            Cache.found_books.append(search_res)  # appends only short variant
-            return jsonify({'status': 'found', 'message': 'Book found in history'})
-        else:
-            return jsonify({'status': 'not_found', 'message': 'Book not found in history'})
+        return jsonify({'status': 'not_found', 'message': 'Book not found in history'})
 
 
 @__web_app.route('/about', methods=['GET'])
@@ -139,11 +164,7 @@ def about_book_page():
     Page with information about selected book
     :return: page
     """
-    if Cache.all_books is None:
-        books = Dp.history_mod.list_all_read_book()
-        Cache.all_books = books
-    else:
-        books = Cache.all_books
+    books = Dp.history_mod.iter_read_books(sort='name')  # rendered one by one, without list of all books
     return render_template('about_book.html', books=books)
 
 
@@ -159,13 +180,7 @@ def get_book_info():
     if not book_name:
         return jsonify({'found': False})
 
-    # Find book in cache
-    book_data: dict | None = None
-    for book in Cache.all_books:
-        if book.get('name') == book_name:
-            book_data = book
-            break
-
+    book_data: History_record | None = Dp.history_mod.get_read_book(book_name)
     if not book_data:
         return jsonify({'found': False})
 
@@ -202,7 +217,15 @@ def actions_page():
 
 @__web_app.route('/history', methods=['GET'])
 def history_page():
+    """
+    Page with history of read books, all books are shown by pages
+    :return: page
+    """
     view = request.args.get('view', 'all')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    sort = request.args.get('sort') or None
+    search = request.args.get('q') or None
 
     if view == 'favourites':
         if Cache.fav_books is None:
@@ -214,21 +237,22 @@ def history_page():
             Dp.local_logger.log('Using cache value for favourite')
             books = Cache.fav_books
             book_count = len(books)
+        return render_template('history.html', books=books, book_count=book_count, view=view)
 
     elif view == 'all':
-        if Cache.all_books is None:
-            books = Dp.history_mod.list_all_read_book()
-            book_count = len(books)
-            Cache.all_books = books
-            Cache.all_book_count = book_count
-        else:
-            Dp.local_logger.log('Using cache value for all books')
-            books = Cache.all_books
-            book_count = len(books)
+        try:
+            book_count = Dp.history_mod.count_read_books(filter=search)
+            books = list(Dp.history_mod.iter_read_books(offset=(page - 1) * per_page, limit=per_page,
+                                                        sort=sort, filter=search))
+        except KindleHistoryException as e:
+            flash(e.message)
+            return redirect(url_for('history_page'))
     else:
         flash("Error in history module")
         return redirect(url_for('root_page'))
-    return render_template('history.html', books=books, book_count=book_count)
+    return render_template('history.html', books=books, book_count=book_count, view=view,
+                           page=page, per_page=per_page, sort=sort, q=search,
+                           pages=max((book_count + per_page - 1) // per_page, 1))
 
 
 @__web_app.route('/stats', methods=['GET'])
@@ -248,6 +272,7 @@ def statistics_page():
     categories: dict = {}
     recent_books: list[str] = []
 
+    __drop_stale_cache()
     if Cache.all_book_count == 0 and Cache.fav_book_count == 0:
         data = Dp.history_mod.count_all_books()  # all book list, fav list, count
         total_books_count = data[2]
@@ -255,6 +280,8 @@ def statistics_page():
         Dp.local_logger.log('Update all books and favourite book data')
         Cache.all_books = data[0]
         Cache.fav_books = data[1]
+        Cache.all_book_count = len(data[0])
+        Cache.fav_book_count = len(data[1])
     else:
         Dp.local_logger.log('Using cache total books count')
         total_books_count = Cache.fav_book_count + Cache.all_book_count
@@ -3,22 +3,105 @@ Kindle history module
 
 Responsible for local storage of history (on e-book device) and on remote targets
 """
-import datetime
+import contextlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import (
     Literal,
-    Any
+    Any,
+    Callable,
+    Iterable,
+    Iterator
 )
 
 import yadisk
 
 from core.entities.AbstractModule import Module
+from core.entities.Backend_result import Backend_result
+from core.entities.Bk_tree import Bk_tree
+from core.entities.Bloom_filter import (
+    BLOOM_FILE_SUFFIX,
+    Bloom_filter
+)
 from core.entities.Book_data import Book_data
+from core.entities.Client_pool import Client_pool
+from core.entities.Delta_sync import (
+    Delta_sync,
+    Sync_report
+)
+from core.entities.History_db import History_db
+from core.entities.History_lock import History_lock
+from core.entities.History_reader import History_reader
+from core.entities.History_record import (
+    HISTORY_FIELDS,
+    History_record,
+    format_history_line,
+    format_tombstone,
+    parse_tombstone,
+    normalize_key,
+    normalize_title,
+    normalize_text,
+    parse_history_line,
+    record_from_book
+)
+from core.entities.Library_index import Library_index
+from core.entities.Outbound_queue import Outbound_queue
+from core.entities.Remote_backend import (
+    Remote_backend,
+    Yandex_backend
+)
+from core.entities.Remote_cache import Remote_cache
+from core.entities.Trigram_index import Trigram_index
+from core.exceptions.KindleHistoryException import KindleHistoryException
+from data.Constants import REMOTE_HISTORY_DIR
 from data.Tokens import TOKEN_YANDEX
 from data.Wrappers import log
 
 
+_ITER_CHUNK_SIZE: int = 100
+"""
+Count of books taken from history at once by iter_read_books
+"""
+
+
+_FUZZY_TOP_K: int = 10
+
+_FUZZY_DISTANCE_SHARE: int = 4
+"""
+Default edit distance bound of fuzzy search is length of the name divided by this value.
+"""
+
+_CHUNKS_CACHE_SUFFIX: str = '.chunks'
+"""
+Suffix of directory with chunks of remote history, added to read file path.
+"""
+
+_CLIENT_POOL_SIZE: int = 4
+"""
+Max count of yandex disk clients, used at the same time.
+"""
+
+BACKEND_TIMEOUTS: dict[str, float] = {
+    'only-local': 5.0,
+    'remote': 5.0,
+    'google': 30.0,
+    'yandex': 30.0
+}
+"""
+Default seconds given to every backend in 'all' mode.
+"""
+
+_BLOOM_ERROR_RATE: float = 0.01
+
+_BLOOM_PROBES: int = 10000
+"""
+Count of keys surely absent in history, used for measuring false positive rate of filter.
+"""
+
+
 class Memorize:
     """
     This module is responsible for storing history in different data storages.
@@ -29,16 +112,155 @@ class Memorize:
     You can say that this functionality might be in Kindle history module, but I say No
     """
 
-    def __init__(self, app_config, logger):
+    def __init__(self, app_config, logger, remote_backends: list[Remote_backend] = None,
+                 disk_client_factory: Callable[[], Any] = None):
+        """
+        Memorize constructor, if outbound queue has mutations from previous run, it is started
+        :param app_config: config of application
+        :param logger: logger instance
+        :param remote_backends: *optional, storages for outbound queue, yandex disk by default
+        :param disk_client_factory: *optional, function creating client of yandex disk (or object with same methods)
+        """
         self.config = app_config
         self.local_logger = logger
+        self.history_db: History_db | None = None
+        self.history_lock = History_lock(app_config.path_to_read_file())
+        self.backend_timeouts: dict[str, float] = dict(BACKEND_TIMEOUTS)
+        self.__executor: ThreadPoolExecutor | None = None
+        self.__executor_lock = threading.Lock()
+        if disk_client_factory is None:
+            disk_client_factory = self.__new_disk_client
+        self.client_pool = Client_pool(disk_client_factory, max_size=_CLIENT_POOL_SIZE,
+                                       health_check=lambda client: client.check_token())
+        self.delta_sync = Delta_sync(self.client_pool, app_config.path_to_read_file(), REMOTE_HISTORY_DIR,
+                                     app_config.path_to_read_file() + _CHUNKS_CACHE_SUFFIX)
+        self.remote_backends: list[Remote_backend] = remote_backends if remote_backends is not None else [
+            Yandex_backend(self.delta_sync, logger)]
+        self.remote_cache = Remote_cache(app_config.path_to_remote_cache(), logger,
+                                         ttl=app_config.get_remote_cache_ttl())
+        self.outbound_queue: Outbound_queue | None = None
+        outbox = app_config.path_to_outbox()
+        if os.path.exists(outbox) and os.path.getsize(outbox) > 0:
+            self.get_outbound_queue().start()
+
+    @staticmethod
+    def __new_disk_client() -> yadisk.Client:
+        return yadisk.Client(token=TOKEN_YANDEX)
+
+    def get_outbound_queue(self) -> Outbound_queue:
+        """
+        Get queue of history changes for remote storages, queue is created on first call
+        :return: Outbound_queue object
+        """
+        with self.__executor_lock:
+            if self.outbound_queue is None:
+                self.outbound_queue = Outbound_queue(self.config.path_to_outbox(), self.remote_backends,
+                                                     self.local_logger)
+            return self.outbound_queue
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        """
+        Get pool for calls of backends in 'all' mode, pool is created on first use
+        :return: ThreadPoolExecutor object
+        """
+        with self.__executor_lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=2 * len(self.backend_timeouts),
+                                                     thread_name_prefix='memorize')
+            return self.__executor
+
+    def __fan_out(self, operation: str, calls: dict[str, Callable], argument) -> dict[str, Backend_result]:
+        """
+        Call every backend at the same time in thread pool, each result is waited until its own timeout
+        :param operation: name of operation for log
+        :param calls: backend name and its method
+        :param argument: argument of every method
+        :return: result of every backend
+        """
+        started = time.monotonic()
+        executor = self.__get_executor()
+        results: dict[str, Backend_result] = dict()
+        for backend, call in calls.items():
+            future = executor.submit(call, argument)
+            results[backend] = Backend_result(backend, future, self.backend_timeouts.get(backend, 30.0), started)
+        for result in results.values():
+            result.resolve()
+        self.local_logger.log(f'{operation} in all storages - {[result.to_dict() for result in results.values()]}')
+        return results
+
+    @staticmethod
+    def is_stored(result: bool | dict[str, Backend_result]) -> bool:
+        """
+        Check result of add, for 'all' mode book is stored when local write succeeded
+        :param result: result of add method
+        :return: bool value
+        """
+        if isinstance(result, dict):
+            return result['only-local'].is_ok()
+        return bool(result)
+
+    def get_history_db(self) -> History_db:
+        """
+        Get history database, on first call read file is migrated into it
+        :return: History_db object
+        """
+        if self.history_db is None:
+            self.history_db = History_db(self.config.path_to_history_db(), self.local_logger)
+            self.history_db.migrate_from_text(self.config.path_to_read_file())
+        return self.history_db
+
+    @log
+    def export_history(self, target: str = None) -> int:
+        """
+        Export history from database into read file format ('only-local' storage)
+        :param target: path to export file, read file by default
+        :return: count of exported records
+        """
+        if target is None:
+            target = self.config.path_to_read_file()
+        if os.path.abspath(target) != os.path.abspath(self.config.path_to_read_file()):
+            return self.get_history_db().export_to_text(target)
+        with self.history_lock.exclusive():  # appends wait until read file is replaced
+            return self.get_history_db().export_to_text(target)
+
+    @log
+    def push_history(self) -> Sync_report:
+        """
+        Upload changed chunks of read file to yandex disk
+        :return: sync report with count of transferred bytes
+        """
+        report = self.delta_sync.push()
+        self.local_logger.log(f'History pushed to yandex disk - {report}, clients - {self.client_pool.stats()}')
+        return report
+
+    def __pull_yandex_records(self, is_match: Callable[[History_record], bool]) -> list[dict[str, str]]:
+        """
+        Get changed chunks of history from yandex disk and select live records
+        :param is_match: function for selecting records
+        :return: list with selected records as dicts
+        """
+        content, report = self.delta_sync.pull()
+        self.local_logger.log(f'History pulled from yandex disk - {report}, clients - {self.client_pool.stats()}')
+        lines = content.decode('utf-8', errors='replace').split('\n')
+        removed = {parse_tombstone(line) for line in lines} - {None}
+        records = list()
+        for line_number, line in enumerate(lines, 1):
+            if line_number in removed or line.strip() == '' or parse_tombstone(line) is not None:
+                continue
+            record = parse_history_line(line)
+            if record is not None and is_match(record):
+                records.append(record.to_dict())
+        return records
 
     # Data getters
     @log
-    def __get_with_yandex(self, book):
-        client = yadisk.Client(token=TOKEN_YANDEX)
-        with client:
-            pass
+    def __get_with_yandex(self, book) -> list[History_record]:
+        name = normalize_text(book.get_book_name())
+        records = self.remote_cache.get(f'yandex:get:{name}',
+                                        lambda: self.__pull_yandex_records(
+                                            lambda record: normalize_text(record['name']) == name),
+                                        self.delta_sync.revision)
+        return [History_record(*(record[field] for field in HISTORY_FIELDS)) for record in records]
 
     @log
     def __get_with_google(self, book):
@@ -48,36 +270,71 @@ class Memorize:
     def __get_local(self, book):
         pass
 
+    @log
+    def __get_sqlite(self, book) -> list[History_record]:
+        return self.get_history_db().get(book.get_book_name())
+
     # Data setters
     @log
     def __add_with_yandex(self, book) -> bool:
-        client = yadisk.Client(token=TOKEN_YANDEX)
-        with client:
-            return True
+        """
+        Add book into read file, changed chunks of file are uploaded to yandex disk by outbound queue
+        """
+        if not self.__add_local(book):
+            return False
+        self.get_outbound_queue().put('add', record_from_book(book).to_dict(), backends=('yandex',))
+        self.remote_cache.invalidate('yandex:')  # remote history will contain the book after sync
+        return True
+
+    @log
+    def __add_remote(self, book) -> bool:
+        """
+        Add book into all remote storages through outbound queue, network is not waited
+        """
+        self.get_outbound_queue().put('add', record_from_book(book).to_dict())
+        self.remote_cache.invalidate('yandex:')
+        return True
 
     @log
     def __add_with_google(self, book) -> bool:
         pass
 
+    def __append_local(self, data: bytes, fsync: bool = False) -> None:
+        """
+        Append data to read file with one write call, safe for writers from different processes
+        :param data: serialized records
+        :param fsync: flush data to disk before return
+        :return: None
+        """
+        self.history_lock.append(data, fsync=fsync)
+
     @log
     def __add_local(self, book) -> bool:
         try:
-            with open(self.config.path_to_read_file(), 'a+') as file_to_write:
-                file_to_write.write(str(book.get_book_name()) + ' | ')
-                file_to_write.write(str(book.get_book_author()) + ' | ')
-                file_to_write.write(str(datetime.datetime.now().year) + ' | ')
-                file_to_write.write(str(book.get_book_type()))
-                file_to_write.write('\n')
-                return True
+            self.__append_local(format_history_line(record_from_book(book)).encode('utf-8'))
+            return True
         except Exception as e:
             self.local_logger.log(f'Exception while adding new book - {e}')
             return False
 
+    @log
+    def __add_sqlite(self, book) -> bool:
+        return self.get_history_db().add(record_from_book(book))
+
     # Find methods
 
     @log
-    def __find_yandex(self, book_to_find) -> bool | None:
-        pass
+    def __find_yandex(self, book_to_find) -> list[History_record] | None:
+        if book_to_find == '' or book_to_find is None:
+            self.local_logger.log('Error occurred, book maybe equals to None')
+            return None
+        part = normalize_text(book_to_find)
+        records = self.remote_cache.get(f'yandex:find:{part}',
+                                        lambda: self.__pull_yandex_records(
+                                            lambda record: part in normalize_text(record['name'])
+                                            or part in normalize_text(record['author'])),
+                                        self.delta_sync.revision)
+        return [History_record(*(record[field] for field in HISTORY_FIELDS)) for record in records]
 
     @log
     def __find_google(self, book_to_find) -> bool | None:
@@ -85,67 +342,174 @@ class Memorize:
 
     @log
     def __find_local(self, book_to_find) -> bool | None:
-        while True:
-            if book_to_find != '' and book_to_find is not None:
-                with open(self.config.path_to_read_file()) as read_file:
-                    for book in read_file:  # linear search
-                        if book.find(book_to_find):
-                            self.local_logger.log('Book found')
-                            return True
-                        else:
-                            self.local_logger.log('Book not found')
-                            return False
-            self.local_logger.log('Error occurred, book maybe equals to None')
-            break  # exit loop if book found or not
+        if book_to_find != '' and book_to_find is not None:
+            if not os.path.exists(self.config.path_to_read_file()):
+                return False
+            with open(self.config.path_to_read_file(), encoding='utf-8') as read_file:
+                for book in read_file:  # linear search
+                    if book_to_find in book:
+                        self.local_logger.log('Book found')
+                        return True
+            self.local_logger.log('Book not found')
+            return False
+        self.local_logger.log('Error occurred, book maybe equals to None')
+
+    @log
+    def __find_sqlite(self, book_to_find) -> list[History_record] | None:
+        if book_to_find != '' and book_to_find is not None:
+            return self.get_history_db().find(book_to_find)
+        self.local_logger.log('Error occurred, book maybe equals to None')
 
     # Main entry points
 
     @log
-    def get(self, book: Book_data, mode: Literal['all', 'google', 'yandex', 'only-local']):
+    def get(self, book: Book_data, mode: Literal['all', 'google', 'yandex', 'only-local', 'sqlite']):
+        """
+        Get book from storage. In 'all' mode every storage is asked at the same time
+        :return: value of storage, in 'all' mode - result of every storage
+        """
         getter: Any = None
         match mode:
             case 'all':
-                getter = self.__get_local, self.__add_with_google, self.__add_with_yandex
+                return self.__fan_out('get', {'only-local': self.__get_local, 'google': self.__get_with_google,
+                                              'yandex': self.__get_with_yandex}, book)
             case 'google':
                 getter = self.__get_with_google
             case 'yandex':
                 getter = self.__get_with_yandex
             case 'only-local':
                 getter = self.__get_local
+            case 'sqlite':
+                getter = self.__get_sqlite
             case _:
                 self.local_logger.log(f'Got unknown parameter - {mode}')
                 raise Exception('Unknown mode')
-        getter(book)
+        return getter(book)
 
     @log
-    def add(self, book: Book_data, mode: Literal['all', 'google', 'yandex', 'only-local']) -> bool:
+    def add(self, book: Book_data,
+            mode: Literal['all', 'google', 'yandex', 'only-local', 'sqlite']) -> bool | dict[str, Backend_result]:
+        """
+        Add book into storage. Remote storages get book through outbound queue,
+        so method returns as soon as local write is done and remote writes finish in background
+        :return: bool value of success, in 'all' mode - result of local storage and outbound queue
+        """
         storage: Any = None
         match mode:
             case 'all':
-                storage = self.__add_local, self.__add_with_google, self.__add_with_yandex
+                return self.__fan_out('add', {'only-local': self.__add_local, 'remote': self.__add_remote}, book)
             case 'google':
                 storage = self.__add_with_google
             case 'yandex':
                 storage = self.__add_with_yandex
             case 'only-local':
                 storage = self.__add_local
+            case 'sqlite':
+                storage = self.__add_sqlite
             case _:
                 self.local_logger.log(f'Got unknown parameter - {mode}')
                 raise Exception('Unknown mode')
         return storage(book)
 
     @log
-    def find(self, book: Book_data, mode: Literal['all', 'google', 'yandex', 'only-local']):
+    def add_many(self, books: Iterable[Book_data], mode: Literal['all', 'google', 'yandex', 'only-local', 'sqlite'],
+                 batch_size: int = 1000, fsync: bool = False) -> list[bool]:
+        """
+        Add many books into storage. Books are serialized into one buffer per batch,
+        and every batch is written by one append to read file (or one transaction in database).
+        :param books: iterable with books to add
+        :param mode: storage mode
+        :param batch_size: count of books in one batch
+        :param fsync: flush every batch to disk, only for local storage
+        :return: list with result for every book, in order of books
+        """
+        results: list[bool] = list()
+        batch: list[Book_data] = list()
+        for book in books:
+            batch.append(book)
+            if len(batch) >= batch_size:
+                results.extend(self.__add_batch(batch, mode, fsync))
+                batch = list()
+        if len(batch) != 0:
+            results.extend(self.__add_batch(batch, mode, fsync))
+        return results
+
+    def __add_batch(self, batch: list[Book_data], mode: str, fsync: bool) -> list[bool]:
+        is_valid = [book is not None and book.get_book_name() not in (None, '') for book in batch]
+        valid_books = [book for book, valid in zip(batch, is_valid) if valid]
+        if len(valid_books) < len(batch):
+            self.local_logger.log(f'Skipped {len(batch) - len(valid_books)} books without name in batch')
+        match mode:
+            case 'only-local':
+                data = ''.join(format_history_line(record_from_book(book)) for book in valid_books)
+                try:
+                    self.__append_local(data.encode('utf-8'), fsync=fsync)
+                except OSError as e:
+                    self.local_logger.log(f'Exception while adding batch of books - {e}')
+                    return [False] * len(batch)
+                return is_valid
+            case 'sqlite':
+                records = [record_from_book(book) for book in valid_books]
+                if self.get_history_db().add_many(records) != len(records):
+                    return [False] * len(batch)
+                return is_valid
+            case _:
+                return [self.is_stored(self.add(book, mode)) if valid else False
+                        for book, valid in zip(batch, is_valid)]
+
+    @log
+    def remove(self, lines: list[int], mode: Literal['all', 'only-local', 'sqlite'],
+               is_current: Callable[[int], bool] = None) -> int:
+        """
+        Remove records from history. In local storage tombstones are appended to read file,
+        so the file is not rewritten on every removal.
+        Tombstones are written under exclusive lock of read file, so compaction cannot move lines meanwhile,
+        lines should be resolved under the same lock.
+        :param lines: lines of records in read file (records ids in database)
+        :param mode: storage mode, in 'all' mode records are removed only from read file
+        :param is_current: *optional, check that line still holds record to remove, called under lock,
+        other lines are skipped
+        :return: count of removed records
+        """
+        if len(lines) == 0:
+            return 0
+        match mode:
+            case 'only-local' | 'all':  # remote storages keep their copies
+                try:
+                    with self.history_lock.exclusive():
+                        if is_current is not None:
+                            lines = [line for line in lines if is_current(line)]
+                        if len(lines) > 0:
+                            self.__append_local(''.join(format_tombstone(line) for line in lines).encode('utf-8'))
+                    return len(lines)
+                except OSError as e:
+                    self.local_logger.log(f'Exception while removing books - {e}')
+                    return 0
+            case 'sqlite':
+                return self.get_history_db().remove(lines)
+            case _:
+                self.local_logger.log(f'Got unknown parameter - {mode}')
+                raise Exception('Unknown mode')
+
+    @log
+    def find(self, book: Book_data, mode: Literal['all', 'google', 'yandex', 'only-local', 'sqlite']):
+        """
+        Find book in storage. In 'all' mode every storage is asked at the same time
+        :return: value of storage, in 'all' mode - result of every storage
+        """
         finder: Any = None
         match mode:
             case 'all':
-                finder = self.__find_local, self.__find_google, self.__find_yandex
+                return self.__fan_out('find', {'only-local': self.__find_local, 'google': self.__find_google,
+                                               'yandex': self.__find_yandex}, book)
             case 'google':
                 finder = self.__find_google
             case 'yandex':
                 finder = self.__find_yandex
             case 'only-local':
                 finder = self.__find_local
+            case 'sqlite':
+                finder = self.__find_sqlite
             case _:
                 raise Exception('Unknown mode')
         return finder(book)
@@ -164,6 +528,16 @@ class Kindle_history(Module):
         self.memorize_module = None
         self.readFile = None
         self.parameters = cli_parameters
+        self.history_reader: History_reader | None = None
+        self.search_index: Trigram_index | None = None
+        self.__last_indexed_id: int = 0  # last record id of history database, added into search index
+        self.__index_lock = threading.RLock()
+        self.bloom_filter: Bloom_filter | None = None
+        self.__bloom_lock = threading.Lock()
+        self.fuzzy_index: Bk_tree | None = None
+        self.favourite_index: Library_index | None = None
+        self.__fuzzy_source: Trigram_index | None = None  # search index, which entries are in fuzzy index
+        self.__fuzzy_entries: int = 0  # count of search index entries added into fuzzy index
 
     @log
     def post_init(self, app_config):
@@ -171,56 +545,340 @@ class Kindle_history(Module):
         self.local_logger = app_config.get_logger()
         self.readFile = app_config.get_read_file_name()
         self.memorize_module = Memorize(app_config=app_config, logger=self.local_logger)
+        self.history_reader = History_reader(app_config.path_to_read_file(), self.__parse_line,
+                                             on_append=self.__on_history_append,
+                                             on_reset=self.__on_history_reset,
+                                             on_remove=self.__on_history_remove,
+                                             file_lock=self.memorize_module.history_lock)
+        self.__index_lock = self.history_reader.lock  # index is changed from reader callbacks
 
-    def __parse_line(self, line: str) -> dict[str, str]:
+    def __parse_line(self, line: str) -> History_record:
         """
         Split line into map, ex. <book name>|<book author>|<book release year>
         :param line: line of book text
-        :return: dict with data
-        """
-        split_line = line.split('|')
-        to_return: dict[str, str] = dict()
-        if len(split_line) < 5 and len(split_line) == 1:  # case of no such format
-            to_return['name'] = str(split_line)
-            to_return['author'] = '-'
-            to_return['date'] = '-'
-            to_return['when_read'] = '-'
-            to_return['type'] = '-'
+        :return: record with data
+        """
+        to_return: History_record | None = parse_history_line(line)
+        if to_return is None:  # case of no such format
+            to_return = History_record(name=line.strip())
             self.local_logger.log('Wrong format string in parsing found')
-            return to_return
-        else:
-            to_return['name'] = split_line[0]
-            to_return['author'] = split_line[1]
-            to_return['date'] = split_line[2]
-            to_return['when_read'] = split_line[3]
-            to_return['type'] = split_line[4]
-            return to_return
+        return to_return
+
+    def __is_sqlite_storage(self) -> bool:
+        return self.config.get_history_storage() == 'sqlite'
+
+    def __on_history_append(self, line: int, record: History_record) -> None:
+        """
+        Keep search index in sync with new lines parsed by history reader
+        """
+        with self.__index_lock:
+            if self.search_index is not None and record['name'] != '':
+                self.search_index.add(line, record)
+
+    def __on_history_remove(self, line: int) -> None:
+        """
+        Remove record from search index, when tombstone for it is found by history reader
+        """
+        with self.__index_lock:
+            if self.search_index is not None:
+                self.search_index.remove(line)
+
+    def __on_history_reset(self) -> None:
+        """
+        Read file was rewritten, search index will be built again on next search
+        """
+        with self.__index_lock:
+            self.search_index = None
+
+    def __get_record(self, line: int) -> History_record:
+        """
+        Get record of history by its line number (record id in database), record is parsed only now
+        :param line: number of line, starts from 1
+        :return: history record
+        """
+        if self.__is_sqlite_storage():
+            return self.memorize_module.get_history_db().record_at(line)
+        return self.history_reader.record_at(line)
+
+    def __sync_sqlite_index(self) -> None:
+        """
+        Add records of history database which are not in search index yet. If records were removed
+        by other process, index is built again, so it never points to absent record
+        :return: None
+        """
+        history_db = self.memorize_module.get_history_db()
+        for _ in range(2):
+            for record_id, record in history_db.iter_rows(after_id=self.__last_indexed_id):
+                self.__last_indexed_id = record_id
+                self.search_index.add(record_id, record)
+            if len(self.search_index) == history_db.count():
+                return
+            self.local_logger.log('Records were removed from history database by other process, index is rebuilt')
+            self.search_index = Trigram_index(self.__get_record)
+            self.__last_indexed_id = 0
+
+    def __get_search_index(self) -> Trigram_index:
+        """
+        Get search index of history, index is built once on first call and then only updated
+        :return: Trigram_index object
+        """
+        with self.__index_lock:
+            if self.__is_sqlite_storage():
+                if self.search_index is None:
+                    self.search_index = Trigram_index(self.__get_record)
+                    self.__last_indexed_id = 0
+                self.__sync_sqlite_index()
+                return self.search_index
+
+            self.history_reader.refresh()  # appended lines are added into existing index
+            if self.search_index is None:
+                search_index = Trigram_index(self.__get_record)
+                for line in range(1, len(self.history_reader) + 1):
+                    if not self.history_reader.is_live(line):  # tombstone or removed record
+                        continue
+                    record = self.history_reader.record_at(line)
+                    if record['name'] != '':
+                        search_index.add(line, record)
+                self.search_index = search_index
+                self.local_logger.log(f'Search index built for {len(search_index)} books')
+            return self.search_index
+
+    @log
+    def get_history_version(self) -> int:
+        """
+        Get version of history, which changes every time history is changed.
+        Used by web interface to know when its cache is stale.
+        :return: integer value
+        """
+        if self.__is_sqlite_storage():
+            return self.memorize_module.get_history_db().version()
+        self.history_reader.refresh()
+        return self.history_reader.version
+
+    def __fill_bloom_filter(self, bloom_filter: Bloom_filter, start: int, end: int) -> None:
+        """
+        Add names of books from given part of read file into filter
+        :param start: offset of the first line
+        :param end: offset of the end of the last line
+        :return: None
+        """
+        with open(self.config.path_to_read_file(), 'rb') as read_file:
+            read_file.seek(start)
+            for raw_line in read_file.read(end - start).decode('utf-8', errors='replace').split('\n'):
+                if raw_line.strip() == '' or parse_tombstone(raw_line) is not None:
+                    continue
+                bloom_filter.add(normalize_text(self.__parse_line(raw_line)['name']))
+
+    def __get_bloom_filter(self) -> Bloom_filter:
+        """
+        Get filter of books names in read file. Filter is loaded from disk, updated with appended lines
+        or built again if read file was rewritten, and then saved.
+        :return: Bloom_filter object
+        """
+        with self.__bloom_lock:
+            with self.__index_lock:
+                self.history_reader.refresh()
+                source = self.history_reader.source()  # filter is filled only up to the last complete line
+                lines = len(self.history_reader)
+            if self.bloom_filter is None:
+                self.bloom_filter = Bloom_filter.load(self.config.path_to_read_file() + BLOOM_FILE_SUFFIX)
+            bloom_filter = self.bloom_filter
+            if bloom_filter is not None and bloom_filter.source == source:
+                return bloom_filter
+            if (bloom_filter is not None and not bloom_filter.is_full()
+                    and bloom_filter.source[2] == source[2] and bloom_filter.source[0] <= source[0]):
+                self.__fill_bloom_filter(bloom_filter, bloom_filter.source[0], source[0])  # only appends happened
+            else:
+                # capacity is enough for twice more books than file has
+                bloom_filter = Bloom_filter(capacity=max(2 * lines, 1024), error_rate=_BLOOM_ERROR_RATE)
+                self.__fill_bloom_filter(bloom_filter, 0, source[0])
+            bloom_filter.source = source
+            bloom_filter.save(self.config.path_to_read_file() + BLOOM_FILE_SUFFIX)
+            self.bloom_filter = bloom_filter
+            return bloom_filter
+
+    def __get_fuzzy_index(self) -> tuple[Trigram_index, Bk_tree]:
+        """
+        Get BK-tree over normalized titles of search index entries, new entries are added on every call
+        and tree is built again only when search index is built again
+        :return: search index and fuzzy index, must be used under index lock
+        """
+        search_index = self.__get_search_index()
+        if self.fuzzy_index is None or self.__fuzzy_source is not search_index:
+            self.fuzzy_index = Bk_tree()
+            self.__fuzzy_source = search_index
+            self.__fuzzy_entries = 0
+        for entry in range(self.__fuzzy_entries, search_index.entries_count()):
+            self.fuzzy_index.add(normalize_title(search_index.name_key(entry)), entry)
+        self.__fuzzy_entries = search_index.entries_count()
+        return search_index, self.fuzzy_index
+
+    def __find_fuzzy(self, book_to_find: str, top_k: int,
+                     max_distance: int | None) -> list[tuple[int, History_record]]:
+        """
+        Find records with names closest to given text by edit distance, names containing text are
+        the closest ones (file names of device are often truncated)
+        :return: list with line number and record, sorted by distance
+        """
+        query = normalize_title(book_to_find)
+        if query == '':
+            return []
+        if max_distance is None:
+            max_distance = max(len(query) // _FUZZY_DISTANCE_SHARE, 1)
+        with self.__index_lock:
+            search_index, fuzzy_index = self.__get_fuzzy_index()
+            distances: dict[int, int] = {entry: 0 for entry in
+                                         search_index.search_entries(book_to_find.replace('_', ' '))}
+            for distance, _, entry in fuzzy_index.search(query, max_distance):
+                if search_index.is_live(entry) and distance < distances.get(entry, max_distance + 1):
+                    distances[entry] = distance
+            closest = sorted(distances, key=lambda entry: (distances[entry], entry))[:top_k]
+            return [search_index.entry(entry) for entry in closest]
+
+    @log
+    def rebuild_bloom_filter(self) -> dict:
+        """
+        Build filter of books names in read file from scratch and measure it
+        :return: report with keys count, size, hashes count, estimated and measured false positive rate
+        """
+        started = time.perf_counter()
+        with self.__bloom_lock:
+            self.bloom_filter = None
+            try:
+                os.remove(self.config.path_to_read_file() + BLOOM_FILE_SUFFIX)
+            except FileNotFoundError:
+                pass
+        bloom_filter = self.__get_bloom_filter()
+        elapsed = time.perf_counter() - started
+        false_positives = sum(f'\x00probe {i}' in bloom_filter for i in range(_BLOOM_PROBES))
+        report = {
+            'keys': bloom_filter.count,
+            'capacity': bloom_filter.capacity,
+            'bits': bloom_filter.bits_count,
+            'hashes': bloom_filter.hashes_count,
+            'size_bytes': bloom_filter.size_in_bytes(),
+            'estimated_false_positive_rate': bloom_filter.false_positive_rate(),
+            'measured_false_positive_rate': false_positives / _BLOOM_PROBES,
+            'rebuild_seconds': elapsed
+        }
+        self.local_logger.log(f'Bloom filter rebuilt - {report}')
+        return report
+
+    @log
+    def is_in_history(self, book_name: str) -> bool:
+        """
+        Check if book is already in history, used by auto mode for every book on device.
+        Negative answer of bloom filter is returned instantly, positive is checked by exact lookup.
+        :param book_name: name of the book
+        :return: bool value
+        """
+        if book_name is None or book_name == '':
+            return False
+        if not self.__is_sqlite_storage() and normalize_text(book_name) not in self.__get_bloom_filter():
+            return False
+        return self.get_read_book(book_name) is not None
 
     @log
     def get_config(self):
         return self.config
 
     @log
-    def list_all_read_book(self) -> list[dict]:
+    def list_all_read_book(self) -> list[History_record]:
         """
         Function for output all books that have been red.
-        outputs only files with books extensions.
-        :return: None
+        Read file is parsed incrementally, only lines appended since the last call are parsed.
+        :return: list with books data, one per line of read file
         """
-        list_with_history: list[dict] = []
-        with open(self.config.path_to_read_file()) as file_with_history:
-            for line in file_with_history:
-                list_with_history.append(self.__parse_line(line))
-        return list_with_history
+        if self.__is_sqlite_storage():
+            return list(self.memorize_module.get_history_db().iter_records())
+        return self.history_reader.get_records()
+
+    @staticmethod
+    def __select_entries(search_index: Trigram_index, sort: str | None, filter: str | None) -> list[int] | range:
+        """
+        Select entries of search index in requested order
+        :return: list or range with entries numbers
+        """
+        if filter is not None and filter != '':
+            entries = search_index.search_entries(filter)
+            if sort is not None:
+                field = sort.lstrip('-')
+                entries.sort(key=lambda entry: normalize_text(search_index.entry(entry)[1].get(field, '')))
+            return entries
+        if sort is not None:
+            return search_index.ordered(sort.lstrip('-'))
+        return search_index.entries()
 
     @log
-    def list_favourite_books(self) -> list[dict]:
+    def iter_read_books(self, offset: int = 0, limit: int | None = None, sort: str | None = None,
+                        filter: str | None = None) -> Iterator[History_record]:
         """
-        Function for listing favourite books (books that saved in home directory)
+        Generator over books that have been red, only books of requested slice are taken from history.
+        :param offset: count of books to skip
+        :param limit: max count of books, all books by default
+        :param sort: name of book field to sort by, with '-' prefix for descending order, order of reading by default
+        :param filter: part of book name or author, books without it are skipped
+        :return: generator of books data
+        """
+        if sort is not None and sort.lstrip('-') not in HISTORY_FIELDS:
+            raise KindleHistoryException(f'Cannot sort history by unknown field - {sort}')
+        with self.__index_lock:
+            search_index = self.__get_search_index()
+            entries = self.__select_entries(search_index, sort, filter)
+            total = len(entries)
+            stop = total if limit is None else min(total, offset + limit)
+            positions = range(offset, stop)
+            if sort is not None and sort.startswith('-'):
+                positions = range(total - 1 - offset, total - 1 - stop, -1)
+        for chunk_start in range(0, len(positions), _ITER_CHUNK_SIZE):
+            with self.__index_lock:
+                if search_index is not self.search_index:  # read file was rewritten, positions are not valid
+                    return
+                chunk = [search_index.entry(entries[position])[1]
+                         for position in positions[chunk_start:chunk_start + _ITER_CHUNK_SIZE]]
+            yield from chunk
+
+    @log
+    def count_read_books(self, filter: str | None = None) -> int:
+        """
+        Count books that have been red, count is taken from search index
+        :param filter: part of book name or author, books without it are not counted
+        :return: count of books
+        """
+        search_index = self.__get_search_index()
+        if filter is not None and filter != '':
+            return len(search_index.search_entries(filter))
+        return len(search_index)
+
+    @log
+    def get_read_book(self, book_name: str) -> History_record | None:
+        """
+        Get book from history by its name, only records with such name part are parsed
+        :param book_name: name of the book
+        :return: book data or None if there is no such book in history
+        """
+        if book_name is None or book_name == '':
+            return None
+        name = normalize_text(book_name)
+        for _, record in self.find_book(book_name):
+            if normalize_text(record['name']) == name:
+                return record
+        return None
+
+    @log
+    def list_favourite_books(self) -> list[History_record]:
+        """
+        Function for listing favourite books (books that saved in home directory).
+        Books are taken from persistent index of directory, which is rescanned only if directory was changed
         :return: None
         """
-        fav_books: list[dict] = list()
-        stored_fav_books = os.listdir(self.config.path_to_stored_books())
+        fav_books: list[History_record] = list()
+        if self.favourite_index is None:
+            self.favourite_index = Library_index(self.config.path_to_favourite_index(),
+                                                 self.config.path_to_stored_books())
+        self.favourite_index.refresh()
+        stored_dir = self.favourite_index.dirs.get(os.curdir)
+        stored_fav_books = [] if stored_dir is None else stored_dir.subdirs + [file.name for file in stored_dir.files]
         if len(stored_fav_books) == 0:
             return []
         else:
@@ -238,45 +896,167 @@ class Kindle_history(Module):
         :return: None
         """
         if book is not None:
-            return self.memorize_module.add(book, 'only-local')
+            return self.memorize_module.is_stored(self.memorize_module.add(book, self.config.get_history_storage()))
         else:
             self.local_logger.log('Failed to add book into history')
             return False
 
     @log
-    def count_all_books(self) -> tuple[list[dict], list[dict], int]:
+    def add_books(self, books: Iterable[Book_data], fsync: bool = False) -> list[bool]:
+        """
+        Add many books into history at once, for example all read books from device.
+        :param books: iterable with books to add
+        :param fsync: flush history to disk after every batch
+        :return: list with result for every book, in order of books
+        """
+        results = self.memorize_module.add_many(books, self.config.get_history_storage(), fsync=fsync)
+        self.local_logger.log(f'Added {results.count(True)} of {len(results)} books into history')
+        return results
+
+    @log
+    def remove_book_from_history(self, book_name: str) -> int:
+        """
+        Remove all records of the book with given name from history.
+        Read file is compacted in background, when share of removed lines is greater than configured threshold.
+        :param book_name: name of the book
+        :return: count of removed records
+        """
+        if book_name is None or book_name == '':
+            self.local_logger.log('Failed to remove book from history, name is empty')
+            return 0
+        name = normalize_text(book_name)
+
+        def is_current(line: int) -> bool:
+            return self.history_reader.is_live(line) and \
+                normalize_text(self.history_reader.record_at(line)['name']) == name
+
+        if self.__is_sqlite_storage():
+            lines = [line for line, record in self.find_book(book_name) if normalize_text(record['name']) == name]
+            removed = self.memorize_module.remove(lines, self.config.get_history_storage())
+            with self.__index_lock:
+                if self.search_index is not None:
+                    for line in lines:
+                        self.search_index.remove(line)
+        else:
+            # lines are resolved and tombstoned under the same locks as compaction, so they cannot move meanwhile
+            with self.history_reader.lock, self.memorize_module.history_lock.exclusive():
+                self.history_reader.refresh()
+                lines = [line for line, record in self.find_book(book_name) if normalize_text(record['name']) == name]
+                removed = self.memorize_module.remove(lines, self.config.get_history_storage(), is_current)
+        self.local_logger.log(f'Removed {removed} records of book {book_name} from history')
+        if removed > 0 and not self.__is_sqlite_storage():
+            self.history_reader.refresh()
+            if self.history_reader.removed_share() >= self.config.get_compaction_threshold():
+                threading.Thread(target=self.compact_history, name='history-compaction', daemon=True).start()
+        return removed
+
+    @log
+    def compact_history(self) -> int:
+        """
+        Rewrite read file without tombstones and removed records
+        :return: count of dropped lines
+        """
+        try:
+            dropped = self.history_reader.compact()
+            self.local_logger.log(f'History compacted, {dropped} lines dropped')
+            return dropped
+        except OSError as e:
+            self.local_logger.log(f'Exception while compacting history - {e}')
+            return 0
+
+    @log
+    def count_all_books(self) -> tuple[list[History_record], list[History_record], int]:
         """
         Function for count books in read file if exists
         :return: book count
         """
-        all_books: list[dict] = self.list_all_read_book()
-        fav_books: list[dict] = self.list_favourite_books()
+        all_books: list[History_record] = self.list_all_read_book()
+        fav_books: list[History_record] = self.list_favourite_books()
         count = len(all_books) + len(fav_books)
         return tuple((all_books, fav_books, count))
 
     @log
-    def find_book(self, book_to_find: str) -> bool | None:
+    def find_book(self, book_to_find: str, fuzzy: bool = False, top_k: int = _FUZZY_TOP_K,
+                  max_distance: int | None = None) -> list[tuple[int, History_record]]:
         """
         Function for finding book in read file, by providing book name or name part.
-        :return: None
+        Search is done by trigram index over book names and authors.
+        In fuzzy mode names are transliterated and compared by edit distance with BK-tree.
+        :param book_to_find: book name or name part
+        :param fuzzy: *optional, find closest names instead of exact name part
+        :param top_k: *optional, count of closest books in fuzzy mode
+        :param max_distance: *optional, edit distance bound in fuzzy mode, by default quarter of name length
+        :return: list with line number in history and book data for every found book
+        """
+        if book_to_find is None or book_to_find == '':
+            self.local_logger.log('Error occurred, book maybe equals to None')
+            return []
+        if fuzzy:
+            return self.__find_fuzzy(book_to_find, top_k, max_distance)
+        return self.__get_search_index().search(book_to_find)
+
+    def __iter_history(self) -> Iterator[tuple[int, History_record]]:
         """
-        return self.memorize_module.find(book_to_find, 'only-local')
+        Iterate over live records of active storage
+        :return: generator of line number in read file (record id in database) and record
+        """
+        if self.__is_sqlite_storage():
+            yield from self.memorize_module.get_history_db().iter_rows()
+            return
+        self.history_reader.refresh()
+        for line_number in range(1, len(self.history_reader) + 1):
+            if self.history_reader.is_live(line_number):
+                yield line_number, self.history_reader.record_at(line_number)
+
+    def __group_duplicates(self) -> list[dict]:
+        """
+        Group live records of history by normalized name and author in one pass over the storage
+        :return: duplicate groups, each with key, name, author, lines and count
+        """
+        groups: dict[str, list[int]] = dict()
+        first_records: dict[str, History_record] = dict()
+        for line_number, record in self.__iter_history():
+            if record['name'] == '':
+                continue
+            key = normalize_key(record['name'], record['author'])
+            lines = groups.get(key)
+            if lines is None:
+                groups[key] = [line_number]
+                first_records[key] = record
+            else:
+                lines.append(line_number)
+        return [{'key': key, 'name': first_records[key]['name'], 'author': first_records[key]['author'],
+                 'lines': lines, 'count': len(lines)} for key, lines in groups.items() if len(lines) >= 2]
 
     @log
-    def check_for_duplicates(self) -> None:
+    def check_for_duplicates(self, rewrite: bool = False) -> list[dict]:
         """
-        Check for duplicates in read file and output useful message about
-        :return: None
+        Check for duplicates in history and output useful message about.
+        Books are compared by normalized name and author in one pass over the storage, removed books are skipped.
+        :param rewrite: remove duplicates from history, only first record of every book is kept
+        :return: report - list with duplicate groups, each with key, name, author, lines (record ids) and count
         """
-        all_data = self.readFile.readlines()
-        is_found: bool = False
-        for book_name in all_data:
-            count = all_data.count(book_name)
-            if count >= 2:
-                is_found = True
-                self.local_logger.log(f'Duplicate found with name {book_name} for {count} times')
-        if not is_found:
-            self.local_logger.log('No duplicates found')
+        # on rewrite lines are held by exclusive lock until compaction, so they cannot move meanwhile
+        is_locked = rewrite and not self.__is_sqlite_storage()
+        file_lock = self.memorize_module.history_lock.exclusive() if is_locked else contextlib.nullcontext()
+        with self.__index_lock, file_lock:
+            report = self.__group_duplicates()
+            for group in report:
+                self.local_logger.log(f'Duplicate found with name {group["name"]} for {group["count"]} times '
+                                      f'in lines {group["lines"]}')
+            if len(report) == 0:
+                self.local_logger.log('No duplicates found')
+            elif rewrite:
+                extra_lines = {line for group in report for line in group['lines'][1:]}
+                if self.__is_sqlite_storage():
+                    dropped = self.memorize_module.remove(sorted(extra_lines), 'sqlite')
+                    if self.search_index is not None:
+                        for line in extra_lines:
+                            self.search_index.remove(line)
+                else:
+                    dropped = self.history_reader.compact(drop_lines=extra_lines)
+                self.local_logger.log(f'Removed {dropped} duplicate records from history')
+        return report
 
     @log
     def is_need_for_new_line(self) -> bool:
@@ -4,12 +4,36 @@ import os
 import platform
 import re
 import shutil
+import time
 from enum import Enum
 from pathlib import Path
 
 from core.entities.AbstractModule import Module
+from core.entities.Archive_backup import (
+    Archive_backup,
+    Archive_report
+)
 from core.entities.Book_data import Book_data
+from core.entities.Copy_engine import Copy_engine
+from core.entities.Deduplicator import (
+    Deduplicator,
+    Duplicate_set
+)
 from core.entities.Formatter import Format
+from core.entities.Incremental_backup import (
+    Backup_report,
+    Incremental_backup
+)
+from core.entities.Library_index import (
+    Indexed_file,
+    Library_index
+)
+from core.entities.Library_scanner import Library_scanner
+from core.entities.Snapshot_backup import (
+    Retention_policy,
+    Snapshot_backup,
+    Snapshot_report
+)
 from data.Constants import (
     NON_BOOK_EXTENSIONS,
     INPUT_SYM
@@ -27,16 +51,18 @@ class OSType(Enum):
 
 
 class Book_dir_node:
-    def __init__(self, dir_name: str):
+    def __init__(self, dir_name: str, book_files: list[Indexed_file] = None):
         """
         Class for directore with books
         :param dir_name: directory name to store in node
+        :param book_files: *optional, books of directory from library index, directory is listed if not given
         """
         self.dir_name: str = dir_name
-        self.book_names: list[str] = list()
-        for book in os.listdir():
-            if Book_dir_controller.is_book(book):
-                self.book_names.append(book)
+        if book_files is None:
+            scanned, _ = Library_scanner(dir_name, is_selected=Book_dir_controller.is_book).scan_dir(dir_name)
+            book_files = [Indexed_file.from_scanned(file) for file in scanned.files]
+        self.book_files: list[Indexed_file] = book_files
+        self.book_names: list[str] = [book.name for book in book_files]
 
     def list_books_in_node(self):
         print('Directory contains such books:')
@@ -71,9 +97,30 @@ class Book_dir_controller:
         self.dirs: list[Book_dir_node] = list()
         self.local_logger = config.get_logger()
         self.config = config
-        for dir_name in os.listdir():
-            if dir_name.endswith('') and not dir_name.startswith('.'):
-                self.dirs.append(Book_dir_node(dir_name=dir_name))
+        self.copy_engine = Copy_engine(self.local_logger)
+        self.__progress_printed: float = 0.0
+        self.library_index = Library_index(config.path_to_library_index(), os.getcwd(),
+                                           exclude_dirs=self.__get_exclude_dirs(), is_selected=self.is_book)
+        self.scan_library()
+
+    def __get_exclude_dirs(self) -> list[str]:
+        try:
+            return self.config.get_exclude_dirs()
+        except Exception:  # not set in config
+            return list()
+
+    def scan_library(self, deep: bool = False) -> None:
+        """
+        Bring library index up to date (only changed directories are listed) and make node for every directory
+        :param deep: *optional, take stat of every book too, so books edited in place are found
+        :return: None
+        """
+        report = self.library_index.refresh(deep)
+        self.dirs = [Book_dir_node(dir_name=name, book_files=directory.files)
+                     for name, directory in sorted(self.library_index.dirs.items()) if name != os.curdir]
+        self.local_logger.log(f'Library scanned - {len(self.dirs)} directories, {self.count_books()} books, '
+                              f'{report["rescanned"]} of {report["checked"]} directories rescanned, '
+                              f'{report["changed_files"]} books changed in place, in {report["seconds"]:.3f} s')
 
     def list_nodes(self):
         print('Utility contains such directories with books:')
@@ -88,25 +135,101 @@ class Book_dir_controller:
             print(f'{dir_counter}: {node}')
             node.list_books_in_node()
 
-    def do_backup_copy(self) -> None:
+    def __print_progress(self, done_bytes: int, total_bytes: int, done_files: int, total_files: int) -> None:
         """
-        Function for backup your books in given directory (Download dir).
-        :return: None
+        Print aggregate progress of copying, at most twice per second
         """
-        self.local_logger.log('Backup books invoked')
-        save_path: str | os.PathLike
-        if platform.system() == OSType.windows_os:
-            save_path = Path.home().as_uri() + os.sep + 'Downloads'
+        now = time.monotonic()
+        if now - self.__progress_printed < 0.5 and done_files != total_files:
+            return
+        self.__progress_printed = now
+        percent = done_bytes * 100 // total_bytes if total_bytes > 0 else 100
+        print(f'\rCopied {done_files}/{total_files} files, {percent}%', end='' if done_files != total_files else '\n')
+
+    def __get_backup_dir(self, save_path: str | os.PathLike | None) -> str | os.PathLike:
+        """
+        Get directory for backups, Downloads directory of user by default
+        """
+        if save_path is not None:
+            return save_path
+        if platform.system() in OSType.windows_os.value:
             self.local_logger.log('Windows user path to Downloads directory')
-        elif platform.system() == OSType.linux_os:
-            save_path = Path.home().as_uri() + os.sep + 'Downloads'
+        elif platform.system() in OSType.linux_os.value:
             self.local_logger.log('Linux user path to Downloads directory')
         else:
             raise Exception('Unknown operating system, not implemented yet.')
+        return os.path.join(Path.home(), 'Downloads')
 
-        for dir in os.listdir():
-            self.copy_fs_entity(dir, save_path)
-            self.local_logger.log(f'File - {dir} backed up in {save_path}')
+    def do_backup_copy(self, save_path: str | os.PathLike | None = None, mirror_deletions: bool = False) \
+            -> Backup_report:
+        """
+        Function for backup your books in given directory (Download dir).
+        Backup is incremental, only new and changed books are copied (in parallel).
+        :param save_path: *optional, directory for backup, Downloads directory of user by default
+        :param mirror_deletions: *optional, remove books removed from library from backup too
+        :return: backup report
+        """
+        self.local_logger.log('Backup books invoked')
+        library = os.getcwd()
+        backup_path = os.path.join(self.__get_backup_dir(save_path), os.path.basename(library))
+        backup = Incremental_backup(library, backup_path, self.copy_engine, self.local_logger)
+        report = backup.run(mirror_deletions=mirror_deletions, on_progress=self.__print_progress)
+        Format.prGreen(f'Library backed up in {backup_path} - {report}')
+        self.local_logger.log(f'Library {library} backed up in {backup_path} - {report}')
+        return report
+
+    def do_snapshot_backup(self, save_path: str | os.PathLike | None = None,
+                           policy: Retention_policy = Retention_policy()) -> Snapshot_report:
+        """
+        Function for dated snapshot of your books in given directory (Download dir).
+        Books not changed since previous snapshot are hard links to it, expired snapshots are removed.
+        :param save_path: *optional, directory for snapshots, Downloads directory of user by default
+        :param policy: *optional, how many daily and weekly snapshots to keep
+        :return: snapshot report
+        """
+        self.local_logger.log('Snapshot backup invoked')
+        library = os.getcwd()
+        snapshots_path = os.path.join(self.__get_backup_dir(save_path), os.path.basename(library) + '-snapshots')
+        report = Snapshot_backup(library, snapshots_path, self.copy_engine, self.local_logger).run(
+            policy, on_progress=self.__print_progress)
+        Format.prGreen(f'Library snapshot made in {snapshots_path} - {report}')
+        return report
+
+    def __archive_path(self, save_path: str | os.PathLike | None) -> str:
+        return os.path.join(self.__get_backup_dir(save_path), os.path.basename(os.getcwd()) + '.books.tar')
+
+    def __get_backup_codec(self) -> str:
+        try:
+            return self.config.get_backup_codec()
+        except Exception:  # not set in config
+            return 'gzip'
+
+    def do_archive_backup(self, save_path: str | os.PathLike | None = None) -> Archive_report:
+        """
+        Function for backup your books into one tar archive in given directory (Download dir).
+        Books are compressed with codec from config, already compressed formats are stored as is.
+        :param save_path: *optional, directory for archive, Downloads directory of user by default
+        :return: archive report
+        """
+        self.local_logger.log('Archive backup invoked')
+        archive_path = self.__archive_path(save_path)
+        report = Archive_backup(archive_path, self.local_logger, codec=self.__get_backup_codec()).create(os.getcwd())
+        Format.prGreen(f'Library archived into {archive_path} - {report}')
+        return report
+
+    def restore_from_archive(self, book_path: str, save_path: str | os.PathLike | None = None,
+                             target_dir: str | os.PathLike | None = None) -> str:
+        """
+        Function for reading one book back from archive backup, other books are not extracted
+        :param book_path: path of book relative to library directory
+        :param save_path: *optional, directory with archive, Downloads directory of user by default
+        :param target_dir: *optional, directory for restored book, current directory by default
+        :return: path to restored book
+        """
+        archive = Archive_backup(self.__archive_path(save_path), self.local_logger)
+        restored = archive.extract_book(book_path, os.getcwd() if target_dir is None else target_dir)
+        self.local_logger.log(f'Book {book_path} restored from archive into {restored}')
+        return restored
 
     def reset_data(self) -> None:
         """
@@ -159,7 +282,7 @@ class Book_dir_controller:
 
     def copy_fs_entity(self, path: str | os.PathLike, dir_name: str = '') -> None:
         """
-        Save your book in central directory (app installation home).
+        Save your book in central directory (app installation home), book is moved.
         :param path: path from where you want to copy read book.
         :param dir_name: *optional parameter, special for directory copying. Use for creating new directory and copy all into
         :return: None
@@ -168,28 +291,32 @@ class Book_dir_controller:
         central_dir = self.config.get_central_dir_name()
         if path is not None:
 
+            # on the same device book is moved by rename, otherwise it is copied (with fsync) and deleted
             # file branch
             if os.path.isfile(path):
                 try:
-                    shutil.copy2(path, central_dir)  # {src} {dest}
+                    is_renamed = self.copy_engine.rename_or_copy(
+                        path, os.path.join(central_dir, os.path.basename(path)))  # {src} {dest}
                     Format.prGreen('Book save in central directory')
                 except Exception as e:
                     self.local_logger.log(f'Error occurred while saving book in central dir - {e}')
+                    return
 
             # directory branch
             elif os.path.isdir(path):
                 try:
                     new_save_point_path = central_dir + os.sep + dir_name
-                    os.mkdir(new_save_point_path)  # create new directory, instead of deleting old
-                    shutil.copytree(path, new_save_point_path, dirs_exist_ok=True)  # {src} {dest}
+                    is_renamed = self.copy_engine.rename_or_copy(path, new_save_point_path)  # {src} {dest}
                     Format.prGreen('Directory save in central directory')
                 except Exception as e:
                     self.local_logger.log(f'Error occurred while saving directory in central dir - {e}')
+                    return
 
             else:
                 Format.prRed('Object type nor file or directory')
                 raise Exception(f'Cannot determine object type of {path}')
-            self.delete_fs_entity(path)
+            if not is_renamed:
+                self.delete_fs_entity(path)
         else:
             self.local_logger.log('Path cannot be None')
 
@@ -253,6 +380,21 @@ class Book_dir_controller:
         for dir in self.dirs:
             for _ in dir.get_book_names():
                 counter += 1
+        return counter
+
+    def find_duplicates(self, hard_link: bool = False) -> list[Duplicate_set]:
+        """
+        Find books with the same content in library directories
+        :param hard_link: *optional, replace extra copies with hard links to the first copy
+        :return: sets of duplicate books, paths are relative to library root
+        """
+        self.scan_library(deep=True)  # cached hashes of books edited in place are dropped
+        deduplicator = Deduplicator(self.library_index, self.local_logger)
+        duplicates = deduplicator.find()
+        if hard_link and len(duplicates) > 0:
+            deduplicator.link(duplicates)
+            self.scan_library()
+        return duplicates
 
 
 class Connect_device(abc.ABC):
@@ -41,6 +41,33 @@ STATIC_CONFIG_NAME: Final[str] = 'config.txt'
 
 STATIC_READ_FILE_NAME: Final[str] = 'read.txt'
 
+STATIC_HISTORY_DB_NAME: Final[str] = 'read.db'
+
+STATIC_OUTBOX_NAME: Final[str] = 'outbox.jsonl'
+"""
+Journal of history changes, which are not sent to remote storages yet.
+"""
+
+STATIC_REMOTE_CACHE_NAME: Final[str] = 'remote_cache.db'
+"""
+Cache of answers of remote storages.
+"""
+
+STATIC_LIBRARY_INDEX_NAME: Final[str] = 'library_index.json'
+"""
+Index of books library, used for rescanning only changed directories.
+"""
+
+STATIC_FAVOURITE_INDEX_NAME: Final[str] = 'favourite_index.json'
+"""
+Index of directory with favourite (stored) books.
+"""
+
+REMOTE_HISTORY_DIR: Final[str] = '/BookManager/history'
+"""
+Directory for history on remote disks.
+"""
+
 STATIC_DIR_NAME_FOR_FAV: Final[str] = 'прочитанные'
 
 APP_VERSION: Final[str] = '5.2.0'
@@ -0,0 +1,78 @@
+"""
+Common fixtures of tests. Tests are run from repository root: python -m pytest
+"""
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import data.Tokens  # noqa: F401
+except ImportError:  # tokens are not stored in repository, remote storages are not used by tests
+    tokens = types.ModuleType('data.Tokens')
+    tokens.TOKEN_YANDEX = ''
+    sys.modules['data.Tokens'] = tokens
+
+
+class Memory_logger:
+    """
+    Logger, which keeps messages instead of printing them
+    """
+
+    def __init__(self):
+        self.messages: list[str] = list()
+
+    def log(self, message, *args, **kwargs) -> None:
+        self.messages.append(str(message))
+
+
+@pytest.fixture
+def logger() -> Memory_logger:
+    return Memory_logger()
+
+
+class Temporary_config:
+    """
+    Config of application with all files in one temporary directory
+    """
+
+    def __init__(self, directory, history_storage: str = 'only-local', compaction_threshold: float = 1.0):
+        self.directory = str(directory)
+        self.history_storage = history_storage
+        self.compaction_threshold = compaction_threshold
+        self.logger = Memory_logger()
+
+    def path_to_read_file(self) -> str:
+        return os.path.join(self.directory, 'read.txt')
+
+    def path_to_history_db(self) -> str:
+        return os.path.join(self.directory, 'read.db')
+
+    def path_to_outbox(self) -> str:
+        return os.path.join(self.directory, 'outbox.jsonl')
+
+    def path_to_remote_cache(self) -> str:
+        return os.path.join(self.directory, 'remote_cache.json')
+
+    def get_read_file_name(self) -> str:
+        return 'read.txt'
+
+    def get_history_storage(self) -> str:
+        return self.history_storage
+
+    def get_compaction_threshold(self) -> float:
+        return self.compaction_threshold
+
+    def get_remote_cache_ttl(self) -> float:
+        return 60.0
+
+    def get_logger(self) -> Memory_logger:
+        return self.logger
+
+
+@pytest.fixture
+def config(tmp_path) -> Temporary_config:
+    return Temporary_config(tmp_path)
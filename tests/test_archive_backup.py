@@ -0,0 +1,93 @@
+import os
+import tarfile
+
+import pytest
+
+from core.entities.Archive_backup import (
+    Archive_backup,
+    available_codecs
+)
+
+_BOOKS = {'dune.fb2': b'<FictionBook>' + b'Arrakis. ' * 5000 + b'</FictionBook>',
+          os.path.join('lem', 'solaris.txt'): 'Солярис. '.encode('utf-8') * 3000,
+          os.path.join('lem', 'cover.jpg'): bytes(range(256)) * 20,
+          'anathem.epub': b'PK\x03\x04' + os.urandom(4096),
+          'empty.fb2': b''}
+
+
+def _make_library(root) -> None:
+    for name, data in _BOOKS.items():
+        os.makedirs(os.path.dirname(root / name), exist_ok=True)
+        (root / name).write_bytes(data)
+    os.makedirs(root / '.hidden')
+    (root / '.hidden' / 'secret.fb2').write_bytes(b'secret')
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+def test_books_are_extracted_from_archive(tmp_path, logger, codec):
+    _make_library(tmp_path / 'library')
+    os.makedirs(tmp_path / 'out')
+    backup = Archive_backup(tmp_path / 'library.tar', logger, codec=codec, max_workers=2)
+
+    report = backup.create(tmp_path / 'library')
+
+    assert sorted(backup.list_books()) == sorted(_BOOKS)
+    assert (report.files, report.stored) == (len(_BOOKS), 2)
+    assert report.bytes_read == sum(len(data) for data in _BOOKS.values())
+    for name, data in _BOOKS.items():
+        path = backup.extract_book(name, tmp_path / 'out')
+        assert path == os.path.join(tmp_path / 'out', os.path.basename(name))
+        assert open(path, 'rb').read() == data
+        assert int(os.path.getmtime(path)) == int(os.path.getmtime(tmp_path / 'library' / name))
+    assert not os.path.exists(str(tmp_path / 'library.tar') + '.tmp')
+    assert sorted(os.listdir(tmp_path / 'out')) == sorted(os.path.basename(name) for name in _BOOKS)
+
+
+def test_compressed_formats_are_stored_as_is(tmp_path, logger):
+    _make_library(tmp_path / 'library')
+    Archive_backup(tmp_path / 'library.tar', logger, codec='xz').create(tmp_path / 'library')
+
+    with tarfile.open(tmp_path / 'library.tar', 'r:') as archive:
+        members = {member.name: member for member in archive}
+
+    assert members['anathem.epub'].size == len(_BOOKS['anathem.epub'])
+    assert members[os.path.join('lem', 'cover.jpg')].size == len(_BOOKS[os.path.join('lem', 'cover.jpg')])
+    assert 'dune.fb2.xz' in members
+    assert members['dune.fb2.xz'].size < len(_BOOKS['dune.fb2']) // 10
+
+
+def test_failed_archive_is_not_left_behind(tmp_path, logger, monkeypatch):
+    _make_library(tmp_path / 'library')
+    backup = Archive_backup(tmp_path / 'library.tar', logger)
+    backup.create(tmp_path / 'library')
+
+    def broken_addfile(self, info, data=None):
+        raise ValueError('Archive is broken')
+
+    monkeypatch.setattr(tarfile.TarFile, 'addfile', broken_addfile)
+    with pytest.raises(ValueError):
+        backup.create(tmp_path / 'library')
+
+    assert not os.path.exists(str(tmp_path / 'library.tar') + '.tmp')
+    monkeypatch.undo()
+    assert sorted(backup.list_books()) == sorted(_BOOKS)  # previous archive is kept
+
+
+def test_archive_inside_library_is_rejected(tmp_path, logger):
+    _make_library(tmp_path)
+
+    with pytest.raises(Exception, match='cannot be inside library'):
+        Archive_backup(tmp_path / 'library.tar', logger).create(tmp_path)
+
+    assert not os.path.exists(tmp_path / 'library.tar')
+
+
+def test_absent_book_is_not_extracted(tmp_path, logger):
+    _make_library(tmp_path / 'library')
+    backup = Archive_backup(tmp_path / 'library.tar', logger)
+    backup.create(tmp_path / 'library')
+
+    with pytest.raises(FileNotFoundError):
+        backup.extract_book('missing.fb2', tmp_path)
+    with pytest.raises(Exception, match='not available'):
+        Archive_backup(tmp_path / 'other.tar', logger, codec='brotli')
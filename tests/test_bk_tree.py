@@ -0,0 +1,78 @@
+import random
+
+from core.entities.Bk_tree import (
+    Bk_tree,
+    Edit_pattern
+)
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.modules.Kindle_history import Kindle_history
+
+_ALPHABET = 'abcd ая'
+
+
+def _levenshtein(first: str, second: str) -> int:
+    previous = list(range(len(second) + 1))
+    for i, first_symbol in enumerate(first, start=1):
+        current = [i]
+        for j, second_symbol in enumerate(second, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (first_symbol != second_symbol)))
+        previous = current
+    return previous[-1]
+
+
+def _random_text(generator: random.Random, max_length: int) -> str:
+    return ''.join(generator.choice(_ALPHABET) for _ in range(generator.randint(0, max_length)))
+
+
+def test_edit_distance_matches_dynamic_programming():
+    generator = random.Random(12)
+    for _ in range(500):
+        # texts longer than 64 symbols check carries between machine words
+        first, second = _random_text(generator, 80), _random_text(generator, 80)
+        assert Edit_pattern(first).distance(second) == _levenshtein(first, second), (first, second)
+
+
+def test_edit_distance_of_known_pairs():
+    assert Edit_pattern('kitten').distance('sitting') == 3
+    assert Edit_pattern('').distance('dune') == 4
+    assert Edit_pattern('dune').distance('') == 4
+    assert Edit_pattern('dune').distance('dune') == 0
+    assert Edit_pattern('solaris').distance('slaris') == 1
+
+
+def test_search_finds_same_keys_as_brute_force():
+    generator = random.Random(7)
+    keys = [_random_text(generator, 12) for _ in range(500)]
+    tree = Bk_tree()
+    for value, key in enumerate(keys):
+        tree.add(key, value)
+    assert len(tree) == len(keys)
+
+    for _ in range(50):
+        query = _random_text(generator, 12)
+        distances = [(_levenshtein(query, key), key, value) for value, key in enumerate(keys)]
+        for max_distance in range(4):
+            expected = sorted(match for match in distances if match[0] <= max_distance)
+            assert sorted(tree.search(query, max_distance)) == expected
+
+
+def test_fuzzy_books_are_ordered_by_distance(config):
+    names = ['Solaris', 'Dune', 'Dune Messiah', 'Dine', 'Dunes', 'Anathem', 'Пикник на обочине']
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.writelines(format_history_line(History_record(name, 'Author', '-', '2024', 'epub'))
+                             for name in names)
+    history = Kindle_history([])
+    history.post_init(config)
+
+    # names containing the query go first, then names by edit distance, equal distances in order of lines
+    assert [record.name for _, record in history.find_book('dune', fuzzy=True)] == \
+           ['Dune', 'Dune Messiah', 'Dunes', 'Dine']
+    assert [line for line, _ in history.find_book('Slaris', fuzzy=True)] == [1]
+    assert [record.name for _, record in history.find_book('piknik na obochine', fuzzy=True)] == \
+           ['Пикник на обочине']
+    assert [record.name for _, record in history.find_book('dune', fuzzy=True, top_k=1)] == ['Dune']
+    assert history.find_book('xyz', fuzzy=True) == []
@@ -0,0 +1,81 @@
+from core.entities.Bloom_filter import (
+    BLOOM_FILE_SUFFIX,
+    Bloom_filter
+)
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.modules.Kindle_history import Kindle_history
+
+
+def _line(name: str) -> str:
+    return format_history_line(History_record(name, 'Author', '-', '2024', 'epub'))
+
+
+def _append(config, text: str) -> None:
+    with open(config.path_to_read_file(), 'a', encoding='utf-8') as read_file:
+        read_file.write(text)
+
+
+def _history(config) -> Kindle_history:
+    history = Kindle_history([])
+    history.post_init(config)
+    return history
+
+
+def test_filter_is_saved_and_loaded(tmp_path):
+    bloom_filter = Bloom_filter(capacity=100)
+    for number in range(100):
+        bloom_filter.add(f'book {number}')
+    bloom_filter.source = (1000, 123456789, 42)
+    bloom_filter.save(tmp_path / 'read.txt.bloom')
+
+    loaded = Bloom_filter.load(tmp_path / 'read.txt.bloom')
+
+    assert all(f'book {number}' in loaded for number in range(100))
+    assert (loaded.count, loaded.capacity, loaded.source) == (100, 100, (1000, 123456789, 42))
+    assert (loaded.bits_count, loaded.hashes_count) == (bloom_filter.bits_count, bloom_filter.hashes_count)
+
+
+def test_damaged_filter_is_not_loaded(tmp_path):
+    bloom_filter = Bloom_filter(capacity=100)
+    bloom_filter.save(tmp_path / 'read.txt.bloom')
+    with open(tmp_path / 'read.txt.bloom', 'r+b') as filter_file:
+        filter_file.truncate(50)
+
+    assert Bloom_filter.load(tmp_path / 'read.txt.bloom') is None
+    assert Bloom_filter.load(tmp_path / 'missing.bloom') is None
+
+
+def test_filter_is_reloaded_and_extended_by_appends(config):
+    names = [f'Book {number}' for number in range(50)]
+    _append(config, ''.join(_line(name) for name in names))
+    assert _history(config).is_in_history('Book 7')
+    built = Bloom_filter.load(config.path_to_read_file() + BLOOM_FILE_SUFFIX)
+    assert built.count == 50
+
+    history = _history(config)  # new process takes filter from disk
+    assert not history.is_in_history('Book 50')
+
+    _append(config, _line('Book 50') + _line('Book 51')[:-5])  # second line is being written
+    assert history.is_in_history('Book 50')
+    _append(config, _line('Book 51')[-5:] + _line('Book 52'))
+
+    assert all(history.is_in_history(name) for name in names + ['Book 50', 'Book 51', 'Book 52'])
+    extended = Bloom_filter.load(config.path_to_read_file() + BLOOM_FILE_SUFFIX)
+    assert extended.count == 53  # filter was extended, not built again
+    assert extended.capacity == built.capacity
+
+
+def test_filter_is_built_again_when_file_is_rewritten(config):
+    _append(config, _line('Dune') + _line('Solaris'))
+    history = _history(config)
+    assert history.is_in_history('Dune')
+
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.write(_line('Anathem'))
+
+    assert history.is_in_history('Anathem')
+    assert not history.is_in_history('Dune')
+    assert Bloom_filter.load(config.path_to_read_file() + BLOOM_FILE_SUFFIX).count == 1
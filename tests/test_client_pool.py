@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from core.entities.Client_pool import Client_pool
+
+
+class Fake_client:
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+
+    def check_token(self) -> bool:
+        return self.healthy
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _pool(max_size: int = 2, health_interval: float = 30.0) -> tuple[Client_pool, list[Fake_client]]:
+    clients: list[Fake_client] = list()
+
+    def factory() -> Fake_client:
+        clients.append(Fake_client(len(clients)))
+        return clients[-1]
+
+    return Client_pool(factory, max_size=max_size, health_check=Fake_client.check_token,
+                       health_interval=health_interval), clients
+
+
+def test_idle_client_is_reused():
+    pool, clients = _pool()
+
+    for _ in range(5):
+        with pool.client() as client:
+            assert client is clients[0]
+
+    assert len(clients) == 1
+    assert pool.stats() == {'created': 1, 'reused': 4, 'discarded': 0, 'idle': 1, 'in_use': 0}
+
+
+def test_client_of_failed_block_is_discarded():
+    pool, clients = _pool()
+
+    with pytest.raises(ConnectionError):
+        with pool.client():
+            raise ConnectionError('Connection reset')
+    with pool.client() as client:
+        assert client is clients[1]
+
+    assert clients[0].closed
+    assert pool.stats() == {'created': 2, 'reused': 0, 'discarded': 1, 'idle': 1, 'in_use': 0}
+
+
+def test_unhealthy_idle_client_is_replaced():
+    pool, clients = _pool(health_interval=0.0)
+    with pool.client():
+        pass
+    clients[0].healthy = False
+
+    with pool.client() as client:
+        assert client is clients[1]
+
+    assert clients[0].closed
+    assert pool.stats()['discarded'] == 1
+
+
+def test_pool_is_bounded():
+    pool, clients = _pool(max_size=2)
+    first, second = pool.acquire(), pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+    taken: list[Fake_client] = list()
+    waiter = threading.Thread(target=lambda: taken.append(pool.acquire(timeout=5)))
+    waiter.start()
+    pool.release(first)
+    waiter.join()
+
+    assert taken == [first]
+    assert len(clients) == 2
+    assert pool.stats() == {'created': 2, 'reused': 1, 'discarded': 0, 'idle': 0, 'in_use': 2}
+    pool.release(second)
+    pool.release(first)
+
+
+def test_failed_factory_does_not_take_place_in_pool():
+    def factory():
+        raise ConnectionError('No network')
+
+    pool = Client_pool(factory, max_size=1)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            pool.acquire(timeout=0.05)
+
+    assert pool.stats()['in_use'] == 0
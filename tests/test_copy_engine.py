@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from core.entities.Copy_engine import Copy_engine
+
+
+def test_copy_replaces_target_with_metadata(tmp_path, logger):
+    source = tmp_path / 'book.fb2'
+    source.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    os.utime(source, ns=(10 ** 18, 10 ** 18))
+    target = tmp_path / 'copy.fb2'
+    target.write_bytes(b'old copy')
+
+    copied = Copy_engine(logger, chunk_size=1024 * 1024).copy_file(source, target)
+
+    assert copied == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+    assert target.stat().st_mtime_ns == source.stat().st_mtime_ns
+    assert sorted(os.listdir(tmp_path)) == ['book.fb2', 'copy.fb2']
+
+
+@pytest.mark.parametrize('method', ['copy_file_range', 'sendfile'])
+def test_short_copy_keeps_old_target(tmp_path, logger, monkeypatch, method):
+    source = tmp_path / 'book.fb2'
+    source.write_bytes(b'new book' * 1000)
+    target = tmp_path / 'copy.fb2'
+    target.write_bytes(b'old copy')
+    for name in ('copy_file_range', 'sendfile'):
+        monkeypatch.delattr(os, name, raising=False)
+    monkeypatch.setattr(os, method, lambda *args: 0, raising=False)  # source looks truncated while copying
+
+    with pytest.raises(OSError, match='0 of 8000 bytes'):
+        Copy_engine(logger).copy_file(source, target)
+    assert target.read_bytes() == b'old copy'
+    assert sorted(os.listdir(tmp_path)) == ['book.fb2', 'copy.fb2']
+
+
+def test_file_on_same_device_is_renamed(tmp_path, logger):
+    source = tmp_path / 'book.fb2'
+    source.write_bytes(b'book')
+    inode = source.stat().st_ino
+    os.makedirs(tmp_path / 'library')
+    target = tmp_path / 'library' / 'book.fb2'
+
+    assert Copy_engine(logger).rename_or_copy(source, target)
+    assert not source.exists()
+    assert target.read_bytes() == b'book'
+    assert target.stat().st_ino == inode
+
+
+def test_file_on_other_device_is_copied(tmp_path, logger, monkeypatch):
+    source = tmp_path / 'book.fb2'
+    source.write_bytes(b'book' * 1000)
+    target = tmp_path / 'library' / 'book.fb2'
+    os.makedirs(target.parent)
+    target.write_bytes(b'old copy')
+    monkeypatch.setattr(Copy_engine, 'is_same_device', staticmethod(lambda source, target: False))
+
+    assert not Copy_engine(logger).rename_or_copy(source, target)
+    assert source.read_bytes() == b'book' * 1000  # removed by caller after copy
+    assert target.read_bytes() == b'book' * 1000
+    assert target.stat().st_ino != source.stat().st_ino
+    assert sorted(os.listdir(target.parent)) == ['book.fb2']
+
+
+def test_directory_on_other_device_is_copied(tmp_path, logger, monkeypatch):
+    source = tmp_path / 'sci-fi'
+    os.makedirs(source / 'lem')
+    (source / 'dune.fb2').write_bytes(b'dune')
+    (source / 'lem' / 'solaris.fb2').write_bytes(b'solaris')
+    monkeypatch.setattr(Copy_engine, 'is_same_device', staticmethod(lambda source, target: False))
+
+    assert not Copy_engine(logger).rename_or_copy(source, tmp_path / 'library')
+    assert (tmp_path / 'library' / 'dune.fb2').read_bytes() == b'dune'
+    assert (tmp_path / 'library' / 'lem' / 'solaris.fb2').read_bytes() == b'solaris'
+    assert (source / 'dune.fb2').exists()
+
+
+def test_directory_is_merged_into_not_empty_target(tmp_path, logger):
+    source = tmp_path / 'sci-fi'
+    os.makedirs(source)
+    (source / 'dune.fb2').write_bytes(b'dune')
+    os.makedirs(tmp_path / 'library')
+    (tmp_path / 'library' / 'solaris.fb2').write_bytes(b'solaris')
+
+    assert not Copy_engine(logger).rename_or_copy(source, tmp_path / 'library')
+    assert sorted(os.listdir(tmp_path / 'library')) == ['dune.fb2', 'solaris.fb2']
+    assert any('cannot be renamed' in message for message in logger.messages)
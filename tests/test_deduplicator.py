@@ -0,0 +1,55 @@
+import os
+
+from core.entities.Deduplicator import Deduplicator
+from core.entities.Library_index import Library_index
+
+
+def _library(tmp_path) -> Library_index:
+    library = tmp_path / 'library'
+    library.mkdir()
+    for name in ('a.fb2', 'b.fb2', 'c.fb2'):
+        (library / name).write_bytes(b'same book ' * 1000)
+    (library / 'other.fb2').write_bytes(b'other book' * 1000)
+    index = Library_index(tmp_path / 'index.json', library)
+    index.refresh()
+    return index
+
+
+def test_duplicates_are_linked(tmp_path, logger):
+    index = _library(tmp_path)
+    deduplicator = Deduplicator(index, logger, partial_size=1024)
+
+    duplicates = deduplicator.find()
+    report = deduplicator.link(duplicates)
+
+    assert [duplicate.paths for duplicate in duplicates] == [['a.fb2', 'b.fb2', 'c.fb2']]
+    assert report['linked'] == 2 and report['skipped'] == 0
+    assert len({os.stat(tmp_path / 'library' / name).st_ino for name in ('a.fb2', 'b.fb2', 'c.fb2')}) == 1
+    assert deduplicator.find() == []
+
+
+def test_book_edited_after_refresh_is_not_grouped_by_old_hash(tmp_path, logger):
+    index = _library(tmp_path)
+    deduplicator = Deduplicator(index, logger, partial_size=1024)
+    deduplicator.find()  # hashes are cached in index
+    (tmp_path / 'library' / 'c.fb2').write_bytes(b'new edition' * 1000)
+
+    duplicates = deduplicator.find()
+
+    assert [duplicate.paths for duplicate in duplicates] == [['a.fb2', 'b.fb2']]
+
+
+def test_book_edited_after_find_is_not_replaced(tmp_path, logger):
+    index = _library(tmp_path)
+    deduplicator = Deduplicator(index, logger, partial_size=1024)
+    duplicates = deduplicator.find()
+    book = tmp_path / 'library' / 'c.fb2'
+    with open(book, 'r+b') as book_file:  # the same size, other content
+        book_file.write(b'SAME')
+    os.utime(book, ns=(0, 0))
+
+    report = deduplicator.link(duplicates)
+
+    assert report['linked'] == 1 and report['skipped'] == 1
+    assert book.read_bytes().startswith(b'SAME')
+    assert not os.path.exists(str(book) + '.dedup-tmp')
@@ -0,0 +1,95 @@
+import pytest
+
+from core.entities.Client_pool import Client_pool
+from core.entities.Delta_sync import Delta_sync
+
+
+class Fake_disk:
+    """
+    In-memory yandex disk with methods of yadisk.Client used by delta sync, uploads are recorded
+    """
+
+    def __init__(self):
+        self.files: dict[str, bytes] = dict()
+        self.directories: set[str] = set()
+        self.uploads: list[str] = list()
+        self.on_download = None
+
+    def check_token(self) -> bool:
+        return True
+
+    def exists(self, path: str) -> bool:
+        return path in self.files or path in self.directories
+
+    def makedirs(self, path: str) -> None:
+        self.directories.add(path)
+
+    def upload(self, file, path: str, overwrite: bool = False) -> None:
+        if path in self.files and not overwrite:
+            raise FileExistsError(path)
+        self.files[path] = file.read()
+        self.uploads.append(path)
+
+    def download(self, path: str, file) -> None:
+        if self.on_download is not None:
+            self.on_download(path)
+        file.write(self.files[path])
+
+
+def _lines(start: int, end: int) -> bytes:
+    return b''.join(f'Book {number} | Author {number % 7} | 2024 | epub\n'.encode() for number in range(start, end))
+
+
+def _sync(disk: Fake_disk, directory, name: str) -> Delta_sync:
+    return Delta_sync(Client_pool(lambda: disk), directory / name, '/history', directory / (name + '.chunks'),
+                      average_chunk_lines=16)
+
+
+def test_push_and_pull_round_trip(tmp_path):
+    disk = Fake_disk()
+    (tmp_path / 'local.txt').write_bytes(_lines(0, 1000))
+
+    pushed = _sync(disk, tmp_path, 'local.txt').push()
+    content, pulled = _sync(disk, tmp_path, 'other.txt').pull()
+
+    assert content == _lines(0, 1000)
+    assert pushed.chunks_transferred == pushed.chunks_total == pulled.chunks_transferred
+    assert pushed.bytes_sent > len(content)  # chunks and manifest
+    assert pulled.bytes_received > len(content)
+
+
+def test_only_changed_chunks_are_uploaded(tmp_path):
+    disk = Fake_disk()
+    sync = _sync(disk, tmp_path, 'local.txt')
+    (tmp_path / 'local.txt').write_bytes(_lines(0, 1000))
+    first = sync.push()
+    disk.uploads.clear()
+
+    (tmp_path / 'local.txt').write_bytes(_lines(0, 1000) + _lines(1000, 1005))
+    second = sync.push()
+
+    assert 1 <= second.chunks_transferred <= 2
+    assert len(disk.uploads) == second.chunks_transferred + 1  # and manifest
+    assert second.bytes_sent < first.bytes_sent / 10
+    assert sync.push().chunks_transferred == 0
+    assert _sync(disk, tmp_path, 'other.txt').pull()[0] == _lines(0, 1005)
+
+
+def test_manifest_changed_during_push_is_not_overwritten(tmp_path):
+    disk = Fake_disk()
+    (tmp_path / 'newer.txt').write_bytes(_lines(0, 200))
+    _sync(disk, tmp_path, 'newer.txt').push()
+    (tmp_path / 'older.txt').write_bytes(_lines(0, 100))
+    sync = _sync(disk, tmp_path, 'older.txt')
+    downloads = list()
+
+    def other_push(path: str) -> None:  # other device pushes after the first read of manifest
+        downloads.append(path)
+        if len(downloads) == 2:
+            disk.files[path] = b'{"chunks": []}'
+
+    disk.on_download = other_push
+
+    with pytest.raises(Exception, match='changed by other push'):
+        sync.push()
+    assert disk.files['/history/manifest.json'] == b'{"chunks": []}'
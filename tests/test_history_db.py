@@ -0,0 +1,59 @@
+import sqlite3
+
+from core.entities.History_db import History_db
+from core.entities.History_record import History_record
+
+
+def test_get_and_find_are_case_insensitive_for_cyrillic(tmp_path, logger):
+    db = History_db(tmp_path / 'read.db', logger)
+    db.add_many([History_record('Война и мир', 'Лев Толстой', '-', '2024', 'epub'),
+                 History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2')])
+
+    assert [record.name for record in db.get('ВОЙНА И МИР')] == ['Война и мир']
+    assert [record.name for record in db.get('dune')] == ['Dune']
+    assert [record.name for record in db.find('толст')] == ['Война и мир']
+    assert [record.name for record in db.find('МИР')] == ['Война и мир']
+    assert db.find('100%') == []
+
+
+def test_database_without_key_columns_is_upgraded(tmp_path, logger):
+    path = tmp_path / 'read.db'
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                       'name TEXT NOT NULL, author TEXT, date TEXT, when_read TEXT, type TEXT)')
+    connection.execute("INSERT INTO history (name, author, date, when_read, type) "
+                       "VALUES ('Мастер и Маргарита', 'Булгаков', '-', '2022', 'epub')")
+    connection.commit()
+    connection.close()
+
+    db = History_db(path, logger)
+
+    assert [record.name for record in db.get('мастер и маргарита')] == ['Мастер и Маргарита']
+    assert [record.name for record in db.find('БУЛГАКОВ')] == ['Мастер и Маргарита']
+
+
+def test_migration_skips_removed_records(tmp_path, logger):
+    source = tmp_path / 'read.txt'
+    source.write_text('Dune | Frank Herbert | 2023 | fb2\n'
+                      'Solaris | Stanislaw Lem | 2023 | epub\n'
+                      '#removed | 1\n'
+                      '\n'
+                      'Fiasco | Stanislaw Lem | 2024 | epub\n', encoding='utf-8')
+    db = History_db(tmp_path / 'read.db', logger)
+
+    assert db.migrate_from_text(source) == 2
+    assert [record.name for record in db.iter_records()] == ['Solaris', 'Fiasco']
+    assert db.migrate_from_text(source) == 0
+
+
+def test_version_changes_on_every_change(tmp_path, logger):
+    db = History_db(tmp_path / 'read.db', logger)
+    db.add(History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'))
+    db.add(History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub'))
+    versions = [db.version()]
+    db.remove([1])
+    versions.append(db.version())
+    db.add(History_record('Fiasco', 'Stanislaw Lem', '-', '2024', 'epub'))  # count is the same as before removal
+    versions.append(db.version())
+
+    assert len(set(versions)) == 3
@@ -0,0 +1,69 @@
+import multiprocessing
+
+from conftest import Temporary_config
+from core.entities.History_lock import History_lock
+from core.entities.History_reader import History_reader
+from core.entities.History_record import (
+    History_record,
+    format_history_line,
+    parse_history_line,
+    parse_tombstone
+)
+from core.modules.Kindle_history import Kindle_history
+
+_APPENDERS: int = 4
+
+_APPENDS: int = 200
+
+_VICTIMS: int = 20
+
+
+def _append(path: str, appender: int) -> None:
+    lock = History_lock(path)
+    for number in range(_APPENDS):
+        name = f'Book {appender}-{number}' + ' long name' * (number % 3) * 200  # some appends take exclusive lock
+        lock.append(format_history_line(History_record(name, f'Author {appender}', '-', '2024', 'epub')).encode())
+
+
+def _remove(directory: str) -> None:
+    history = Kindle_history([])
+    history.post_init(Temporary_config(directory, compaction_threshold=0.0))  # every removal starts compaction
+    for number in range(_VICTIMS):
+        assert history.remove_book_from_history(f'Victim {number}') == 1
+
+
+def _compact(path: str) -> None:
+    reader = History_reader(path, parse_history_line)
+    for _ in range(_VICTIMS):
+        try:
+            reader.compact()
+        except OSError:  # file was changing too often
+            pass
+
+
+def test_concurrent_appends_removals_and_compactions(tmp_path):
+    config = Temporary_config(tmp_path)
+    path = config.path_to_read_file()
+    with open(path, 'w', encoding='utf-8') as read_file:
+        for number in range(_VICTIMS):
+            read_file.write(format_history_line(History_record(f'Keeper {number}', 'Author', '-', '2023', 'fb2')))
+            read_file.write(format_history_line(History_record(f'Victim {number}', 'Author', '-', '2023', 'fb2')))
+
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_append, args=(path, appender)) for appender in range(_APPENDERS)]
+    processes.append(context.Process(target=_remove, args=(str(tmp_path),)))
+    processes.append(context.Process(target=_compact, args=(path,)))
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    with open(path, encoding='utf-8') as read_file:
+        lines = read_file.readlines()
+    assert all(line.endswith('\n') for line in lines)
+    assert all(parse_history_line(line) is not None or parse_tombstone(line) is not None for line in lines)
+    names = [record.name.split(' long name')[0] for record in History_reader(path, parse_history_line).get_records()]
+    expected = [f'Keeper {number}' for number in range(_VICTIMS)]
+    expected += [f'Book {appender}-{number}' for appender in range(_APPENDERS) for number in range(_APPENDS)]
+    assert sorted(names) == sorted(expected)
@@ -0,0 +1,81 @@
+import pytest
+
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.exceptions.KindleHistoryException import KindleHistoryException
+from core.modules.Kindle_history import Kindle_history
+
+_NAMES = ['Dune', 'Solaris', 'Anathem', 'Hyperion', 'Dune Messiah', 'Blindsight', 'Contact']
+
+
+def _history(config) -> Kindle_history:
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.writelines(format_history_line(History_record(name, 'Author', '-', '2024', 'epub'))
+                             for name in _NAMES)
+    history = Kindle_history([])
+    history.post_init(config)
+    return history
+
+
+def _names(books) -> list[str]:
+    return [book.name for book in books]
+
+
+def test_pages_are_slices_of_history(config):
+    history = _history(config)
+
+    assert _names(history.iter_read_books(offset=0, limit=3)) == _NAMES[:3]
+    assert _names(history.iter_read_books(offset=6, limit=3)) == _NAMES[6:]
+    assert _names(history.iter_read_books(offset=7, limit=3)) == []
+    assert _names(history.iter_read_books(offset=100)) == []
+    assert _names(history.iter_read_books(limit=0)) == []
+    assert history.count_read_books() == len(_NAMES)
+
+
+def test_pages_are_sorted(config):
+    history = _history(config)
+
+    assert _names(history.iter_read_books(offset=0, limit=3, sort='name')) == sorted(_NAMES)[:3]
+    assert _names(history.iter_read_books(offset=5, limit=3, sort='name')) == sorted(_NAMES)[5:]
+    assert _names(history.iter_read_books(offset=0, limit=3, sort='-name')) == sorted(_NAMES, reverse=True)[:3]
+    assert _names(history.iter_read_books(offset=6, limit=3, sort='-name')) == sorted(_NAMES, reverse=True)[6:]
+    assert _names(history.iter_read_books(offset=7, sort='-name')) == []
+    with pytest.raises(KindleHistoryException):
+        list(history.iter_read_books(sort='pages'))
+
+
+def test_pages_are_filtered(config):
+    history = _history(config)
+
+    assert _names(history.iter_read_books(filter='dune')) == ['Dune', 'Dune Messiah']
+    assert _names(history.iter_read_books(offset=1, limit=1, filter='dune', sort='-name')) == ['Dune']
+    assert _names(history.iter_read_books(filter='missing')) == []
+    assert history.count_read_books(filter='dune') == 2
+    assert history.count_read_books(filter='') == len(_NAMES)
+
+
+def test_history_route_bounds_page_arguments(config, logger, monkeypatch):
+    try:
+        from core.entities.browser.WebInterface import Flask_interface
+    except (ImportError, NameError) as e:  # flask is optional for tests, Utils needs aiogram types
+        pytest.skip(f'web interface cannot be imported - {e}')
+
+    rendered: list[dict] = list()
+    monkeypatch.setattr(Flask_interface, 'render_template', lambda template, **context: rendered.append(context) or '')
+    monkeypatch.setattr(Flask_interface.Dp, 'history_mod', _history(config), raising=False)
+    monkeypatch.setattr(Flask_interface.Dp, 'local_logger', logger, raising=False)
+    client = getattr(Flask_interface, '__web_app').test_client()
+
+    assert client.get('/history?page=2&per_page=3&sort=name').status_code == 200
+    assert client.get('/history?page=-5&per_page=100000').status_code == 200
+    assert client.get('/history?page=1&per_page=0&q=dune').status_code == 200
+    assert client.get('/history?page=99').status_code == 200
+
+    page, all_books, filtered, after_last = rendered
+    assert _names(page['books']) == sorted(_NAMES)[3:6]
+    assert (page['page'], page['pages'], page['book_count']) == (2, 3, len(_NAMES))
+    assert (all_books['page'], all_books['per_page'], _names(all_books['books'])) == (1, 500, _NAMES)
+    assert (filtered['per_page'], filtered['book_count'], _names(filtered['books'])) == (1, 2, ['Dune'])
+    assert (after_last['books'], after_last['pages']) == ([], 1)
@@ -0,0 +1,149 @@
+import os
+
+from core.entities.History_reader import History_reader
+from core.entities.History_record import (
+    History_record,
+    format_history_line,
+    parse_history_line
+)
+
+
+def _line(number: int) -> str:
+    return format_history_line(History_record(f'Book {number}', f'Author {number}', '-', '2024', 'epub'))
+
+
+def _write(path, lines: list[str], mode: str = 'w') -> None:
+    with open(path, mode, encoding='utf-8') as read_file:
+        read_file.writelines(lines)
+
+
+class Reader_events:
+    """
+    Callbacks of history reader, which remember what was parsed
+    """
+
+    def __init__(self):
+        self.appended: list[int] = list()
+        self.resets = 0
+
+    def on_append(self, line: int, record: History_record) -> None:
+        self.appended.append(line)
+
+    def on_reset(self) -> None:
+        self.resets += 1
+
+
+def _reader(path, events: Reader_events) -> History_reader:
+    return History_reader(path, parse_history_line, on_append=events.on_append, on_reset=events.on_reset)
+
+
+def test_only_appended_tail_is_parsed(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(number) for number in range(1, 4)])
+    events = Reader_events()
+    reader = _reader(path, events)
+
+    assert reader.refresh()
+    assert not reader.refresh()
+    _write(path, [_line(number) for number in range(4, 6)], mode='a')
+    assert reader.refresh()
+
+    assert events.appended == [1, 2, 3, 4, 5]
+    assert events.resets == 1
+    assert [record.name for record in reader.get_records()] == [f'Book {number}' for number in range(1, 6)]
+
+
+def test_truncated_file_is_parsed_again(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(number) for number in range(1, 4)])
+    events = Reader_events()
+    reader = _reader(path, events)
+    reader.refresh()
+
+    _write(path, [_line(7)])
+
+    assert reader.refresh()
+    assert events.resets == 2
+    assert events.appended == [1, 2, 3, 1]
+    assert [record.name for record in reader.get_records()] == ['Book 7']
+
+
+def test_replaced_file_is_parsed_again(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(number) for number in range(1, 3)])
+    events = Reader_events()
+    reader = _reader(path, events)
+    reader.refresh()
+
+    # new file is longer, but its start differs, so it is not taken as appended
+    _write(tmp_path / 'new.txt', [_line(number) for number in range(5, 9)])
+    os.replace(tmp_path / 'new.txt', path)
+
+    assert reader.refresh()
+    assert events.resets == 2
+    assert [record.name for record in reader.get_records()] == [f'Book {number}' for number in range(5, 9)]
+
+
+def test_removed_file_has_no_records(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(1)])
+    reader = _reader(path, Reader_events())
+    reader.refresh()
+
+    os.remove(path)
+
+    assert reader.refresh()
+    assert len(reader) == 0
+    assert reader.get_records() == []
+
+
+def test_file_rewritten_in_place_is_parsed_again(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(number) for number in range(1, 3)])
+    events = Reader_events()
+    reader = _reader(path, events)
+    reader.refresh()
+
+    _write(path, [_line(number) for number in range(5, 9)])  # same inode, bigger size
+
+    assert reader.refresh()
+    assert events.resets == 2
+    assert [record.name for record in reader.get_records()] == [f'Book {number}' for number in range(5, 9)]
+
+
+def test_records_are_parsed_only_when_accessed(tmp_path):
+    path = tmp_path / 'read.txt'
+    _write(path, [_line(number) for number in range(1, 1001)])
+    parsed: list[str] = list()
+
+    def parse_line(line: str) -> History_record:
+        parsed.append(line)
+        return parse_history_line(line)
+
+    reader = History_reader(path, parse_line)
+    reader.refresh()
+    assert len(reader) == 1000
+    assert parsed == []
+
+    assert reader.record_at(500).name == 'Book 500'
+    assert reader.record_at(1000).name == 'Book 1000'
+    assert parsed == [_line(500), _line(1000)]
+
+
+def test_partial_last_line_is_read_and_completed(tmp_path):
+    path = tmp_path / 'read.txt'
+    complete = _line(1)
+    partial = _line(2)[:-1]  # writer has not finished the line yet
+    _write(path, [complete, partial])
+    reader = _reader(path, Reader_events())
+    reader.refresh()
+
+    assert len(reader) == 2
+    assert reader.record_at(2).name == 'Book 2'
+    assert reader.source()[0] == len(complete.encode('utf-8'))  # only complete lines are counted
+
+    _write(path, ['\n', _line(3)], mode='a')
+
+    assert reader.refresh()
+    assert [record.name for record in reader.get_records()] == ['Book 1', 'Book 2', 'Book 3']
+    assert reader.source()[0] == os.path.getsize(path)
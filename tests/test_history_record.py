@@ -0,0 +1,34 @@
+import tracemalloc
+
+from core.entities.History_record import (
+    History_record,
+    format_history_line,
+    parse_history_line
+)
+
+_LINES = [f'Book {number} | Author {number % 50} | 19{number % 100:02} | 2024 | epub\n' for number in range(20000)]
+
+
+def _peak_memory(parse) -> int:
+    tracemalloc.start()
+    try:
+        records = [parse(line) for line in _LINES]
+        return tracemalloc.get_traced_memory()[1] if len(records) > 0 else 0
+    finally:
+        tracemalloc.stop()
+
+
+def _parse_dict(line: str) -> dict[str, str]:
+    name, author, date, when_read, book_type = [part.strip() for part in line.split('|')]
+    return {'name': name, 'author': author, 'date': date, 'when_read': when_read, 'type': book_type}
+
+
+def test_records_take_less_memory_than_dicts():
+    assert _peak_memory(parse_history_line) < 0.75 * _peak_memory(_parse_dict)
+
+
+def test_record_line_round_trip():
+    record = History_record('Война и мир', 'Лев Толстой', '1869', '2024', 'epub')
+    assert parse_history_line(format_history_line(record)) == record
+    assert parse_history_line('Dune | Frank Herbert | 2023 | fb2\n').date == '-'
+    assert parse_history_line('not a record') is None
@@ -0,0 +1,41 @@
+import os
+
+from core.entities.Copy_engine import Copy_engine
+from core.entities.Incremental_backup import Incremental_backup
+
+
+class Editing_copy_engine(Copy_engine):
+    """
+    Copy engine, which appends to one source file after backup hashed it and before it is copied
+    """
+
+    def __init__(self, logger, edited: str):
+        super().__init__(logger)
+        self.edited = edited
+
+    def copy_files(self, pairs, on_file=None, on_progress=None, fsync=True):
+        with open(self.edited, 'ab') as edited_file:
+            edited_file.write(b' second part')
+        return super().copy_files(pairs, on_file, on_progress, fsync)
+
+
+def test_manifest_has_only_complete_copies(tmp_path, logger):
+    source = tmp_path / 'library'
+    source.mkdir()
+    for name in ('copied.fb2', 'edited.fb2', 'failed.fb2'):
+        (source / name).write_bytes(name.encode())
+    target = tmp_path / 'backup'
+    (target / 'failed.fb2').mkdir(parents=True)  # directory in place of file, so copy cannot replace it
+
+    backup = Incremental_backup(source, target, Editing_copy_engine(logger, str(source / 'edited.fb2')), logger)
+    report = backup.run()
+
+    assert report.copied.failed == [str(source / 'failed.fb2')]
+    assert sorted(backup.load_manifest()) == ['copied.fb2']
+    assert (target / 'edited.fb2').read_bytes() == b'edited.fb2 second part'
+    assert sorted(os.listdir(target)) == ['.backup_manifest.json', 'copied.fb2', 'edited.fb2', 'failed.fb2']
+
+    os.rmdir(target / 'failed.fb2')
+    Incremental_backup(source, target, Copy_engine(logger), logger).run()
+    assert sorted(backup.load_manifest()) == ['copied.fb2', 'edited.fb2', 'failed.fb2']
+    assert (target / 'failed.fb2').read_bytes() == b'failed.fb2'
@@ -0,0 +1,94 @@
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.modules.Kindle_history import Kindle_history
+
+
+def _write_history(config, records: list[History_record]) -> None:
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.writelines(format_history_line(record) for record in records)
+
+
+def _history(config) -> Kindle_history:
+    history = Kindle_history([])
+    history.post_init(config)
+    return history
+
+
+def test_removed_book_is_not_listed(config):
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub'),
+                            History_record('dune', 'Frank Herbert', '-', '2024', 'fb2')])
+    history = _history(config)
+
+    assert history.remove_book_from_history('DUNE') == 2
+    assert [record.name for record in history.list_all_read_book()] == ['Solaris']
+    assert history.remove_book_from_history('Dune') == 0
+
+
+def test_removal_skips_lines_with_other_records(config):
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub')])
+    history = _history(config)
+
+    # line 1 was resolved before compaction moved Solaris into it
+    assert history.memorize_module.remove([1], 'only-local', is_current=lambda line: False) == 0
+    assert len(history.list_all_read_book()) == 2
+
+
+def test_duplicates_are_removed_on_rewrite(config):
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub'),
+                            History_record('DUNE', 'frank  herbert', '-', '2024', 'fb2')])
+    history = _history(config)
+
+    report = history.check_for_duplicates(rewrite=True)
+
+    assert [(group['name'], group['lines']) for group in report] == [('Dune', [1, 3])]
+    assert [record.name for record in history.list_all_read_book()] == ['Dune', 'Solaris']
+    assert history.check_for_duplicates() == []
+
+
+def test_duplicates_are_removed_from_database(config):
+    config.history_storage = 'sqlite'
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub'),
+                            History_record('DUNE', 'frank  herbert', '-', '2024', 'fb2')])
+    history = _history(config)
+    version = history.get_history_version()
+
+    report = history.check_for_duplicates(rewrite=True)
+
+    assert [(group['name'], group['lines']) for group in report] == [('Dune', [1, 3])]
+    assert [record.name for record in history.list_all_read_book()] == ['Dune', 'Solaris']
+    assert history.get_history_version() != version
+
+
+def test_removed_book_is_not_found_by_new_process(config):
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub')])
+    assert _history(config).remove_book_from_history('Dune') == 1
+
+    history = _history(config)
+
+    assert history.find_book('Dune') == []
+    assert history.find_book('removed') == []
+    assert history.count_read_books() == 1
+    assert [record.name for record in history.iter_read_books()] == ['Solaris']
+    assert not history.is_in_history('Dune')
+    assert history.is_in_history('Solaris')
+
+
+def test_records_removed_by_other_process_are_not_found(config):
+    config.history_storage = 'sqlite'
+    _write_history(config, [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+                            History_record('Dune Messiah', 'Frank Herbert', '-', '2024', 'fb2')])
+    history = _history(config)
+    assert len(history.find_book('Dune')) == 2
+
+    assert _history(config).remove_book_from_history('Dune') == 1
+
+    assert [record.name for _, record in history.find_book('Dune')] == ['Dune Messiah']
+    assert [record.name for _, record in history.find_book('dune mesia', fuzzy=True)] == ['Dune Messiah']
+    assert history.count_read_books() == 1
@@ -0,0 +1,28 @@
+import os
+
+from core.entities.Library_index import Library_index
+
+
+def test_file_edited_in_place_is_indexed_again_by_deep_refresh(tmp_path):
+    library = tmp_path / 'library'
+    (library / 'Lem').mkdir(parents=True)
+    book = library / 'Lem' / 'Solaris.fb2'
+    book.write_bytes(b'first edition')
+    (library / 'Lem' / 'Fiasco.fb2').write_bytes(b'fiasco')
+    index = Library_index(tmp_path / 'index.json', library)
+    index.refresh()
+    index.update_files({('Lem', 'Solaris.fb2'): {'content_hash': 'old', 'partial_hash': 'old'},
+                        ('Lem', 'Fiasco.fb2'): {'content_hash': 'kept'}})
+    directory_mtime = os.stat(library / 'Lem').st_mtime_ns
+
+    with open(book, 'r+b') as book_file:  # in place, directory entry is not changed
+        book_file.write(b'second edition, longer')
+    os.utime(library / 'Lem', ns=(directory_mtime, directory_mtime))
+    assert Library_index(tmp_path / 'index.json', library).refresh()['changed_files'] == 0  # warm refresh
+    report = Library_index(tmp_path / 'index.json', library).refresh(deep=True)
+    files = {file.name: file for _, file in Library_index(tmp_path / 'index.json', library).iter_files()}
+
+    assert report['rescanned'] == 0 and report['changed_files'] == 1
+    assert files['Solaris.fb2'].size == len(b'second edition, longer')
+    assert files['Solaris.fb2'].content_hash is None and files['Solaris.fb2'].partial_hash is None
+    assert files['Fiasco.fb2'].content_hash == 'kept'
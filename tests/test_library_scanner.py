@@ -0,0 +1,47 @@
+import os
+
+from core.entities.Library_scanner import Library_scanner
+
+
+def _make_library(root) -> None:
+    for directory, files in {'.': ['a.fb2', 'cover.jpg'],
+                             'sci-fi': ['dune.epub'],
+                             os.path.join('sci-fi', 'lem'): ['solaris.fb2'],
+                             '.git': ['index'],
+                             os.path.join('sci-fi', '.cache'): ['dune.epub'],
+                             'drafts': ['notes.fb2'],
+                             os.path.join('sci-fi', 'drafts'): ['old.fb2']}.items():
+        os.makedirs(root / directory, exist_ok=True)
+        for name in files:
+            (root / directory / name).write_bytes(name.encode())
+
+
+def test_hidden_and_excluded_dirs_are_skipped(tmp_path):
+    _make_library(tmp_path)
+
+    scanned = Library_scanner(tmp_path, exclude_dirs=['drafts'], max_workers=2).scan()
+
+    assert [directory.name for directory in scanned] == ['.', 'sci-fi', os.path.join('sci-fi', 'lem')]
+    assert [directory.subdirs for directory in scanned] == [['sci-fi'], ['lem'], []]
+    assert [[file.name for file in directory.files] for directory in scanned] == \
+           [['a.fb2', 'cover.jpg'], ['dune.epub'], ['solaris.fb2']]
+
+
+def test_only_hidden_dirs_are_skipped_by_default(tmp_path):
+    _make_library(tmp_path)
+
+    scanned = Library_scanner(tmp_path).scan()
+
+    assert [directory.name for directory in scanned] == ['.', 'drafts', 'sci-fi', os.path.join('sci-fi', 'drafts'),
+                                                         os.path.join('sci-fi', 'lem')]
+
+
+def test_files_are_filtered_and_subtree_is_scanned(tmp_path):
+    _make_library(tmp_path)
+
+    scanned = Library_scanner(tmp_path, is_selected=lambda name: name.endswith('.fb2')).scan(tmp_path / 'sci-fi')
+
+    assert [directory.name for directory in scanned] == ['sci-fi', os.path.join('sci-fi', 'drafts'),
+                                                         os.path.join('sci-fi', 'lem')]
+    assert [[file.name for file in directory.files] for directory in scanned] == [[], ['old.fb2'], ['solaris.fb2']]
+    assert scanned[2].files[0].size == len(b'solaris.fb2')
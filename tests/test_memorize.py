@@ -0,0 +1,54 @@
+import threading
+import time
+
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.modules.Kindle_history import Memorize
+
+
+def _memorize(config, logger, disk_client_factory) -> Memorize:
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.write(format_history_line(History_record('Dune', 'Frank Herbert', '-', '2024', 'fb2')))
+    return Memorize(config, logger, remote_backends=[], disk_client_factory=disk_client_factory)
+
+
+def test_slow_backend_times_out_without_delaying_others(config, logger):
+    released = threading.Event()
+
+    def slow_client():
+        released.wait(10)
+        raise ConnectionError('Disk is not reachable')
+
+    memorize = _memorize(config, logger, slow_client)
+    memorize.backend_timeouts['yandex'] = 0.2
+    try:
+        started = time.monotonic()
+        results = memorize.find('Dune', 'all')
+        elapsed = time.monotonic() - started
+    finally:
+        released.set()
+
+    assert elapsed < 2.0
+    assert set(results) == {'only-local', 'google', 'yandex'}
+    assert results['only-local'].status == 'ok' and results['only-local'].value is True
+    assert results['yandex'].status == 'timeout'
+    assert results['yandex'].error == 'No answer in 0.2 s'
+    assert not results['yandex'].is_ok()
+    assert results['google'].status == 'ok' and not results['google'].is_ok()  # storage is not implemented
+
+
+def test_failing_backend_is_reported(config, logger):
+    def broken_client():
+        raise ConnectionError('Disk is not reachable')
+
+    memorize = _memorize(config, logger, broken_client)
+
+    results = memorize.find('Dune', 'all')
+
+    assert results['only-local'].is_ok()
+    assert results['yandex'].status == 'failed'
+    assert 'Disk is not reachable' in results['yandex'].error
+    assert results['yandex'].to_dict()['seconds'] is not None
+    assert any('find in all storages' in message for message in logger.messages)
@@ -0,0 +1,36 @@
+from core.entities.Outbound_queue import Outbound_queue
+from core.entities.Remote_backend import (
+    Directory_backend,
+    Remote_backend
+)
+
+
+class Offline_backend(Remote_backend):
+    """
+    Backend, which is never available
+    """
+
+    def push(self, mutations: list[dict]) -> None:
+        raise ConnectionError('offline')
+
+
+def test_empty_queue_keeps_mutations_of_other_process(tmp_path, logger):
+    journal = tmp_path / 'outbox.jsonl'
+    sending = Outbound_queue(journal, [Directory_backend(tmp_path / 'remote')], logger, fsync=False)
+    stalled = Outbound_queue(journal, [Offline_backend('directory')], logger, base_delay=60.0, fsync=False)
+    stalled_id = stalled.put('add', {'name': 'Dune'})
+    sent_id = sending.put('add', {'name': 'Solaris'})
+
+    assert sending.wait_empty(timeout=10)
+    stalled.close(timeout=10)
+    sending.close(timeout=10)
+
+    # mutation of stalled process is still in journal after the other process emptied its queue
+    restarted = Outbound_queue(journal, [Directory_backend(tmp_path / 'remote')], logger, fsync=False)
+    assert restarted.pending_count() == 1
+    restarted.start()
+    assert restarted.wait_empty(timeout=10)
+    restarted.close(timeout=10)
+    sent = {mutation['id'] for mutation in Directory_backend(tmp_path / 'remote').list_mutations()}
+    assert sent == {stalled_id, sent_id}
+    assert journal.read_text() == ''
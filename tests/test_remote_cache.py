@@ -0,0 +1,115 @@
+import types
+
+import pytest
+
+from core.entities import Remote_cache as remote_cache_module
+from core.entities.Client_pool import Client_pool
+from core.entities.Delta_sync import Delta_sync
+from core.entities.Remote_cache import Remote_cache
+from test_delta_sync import Fake_disk
+
+
+class Remote_storage:
+    """
+    Remote data with revision, counts how many times it was loaded
+    """
+
+    def __init__(self):
+        self.value = ['Dune']
+        self.revision = 'r1'
+        self.loads = 0
+        self.revision_checks = 0
+
+    def load(self) -> list[str]:
+        self.loads += 1
+        return list(self.value)
+
+    def get_revision(self) -> str:
+        self.revision_checks += 1
+        return self.revision
+
+
+@pytest.fixture
+def clock(monkeypatch) -> types.SimpleNamespace:
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(remote_cache_module, 'time', types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def _cache(tmp_path, logger) -> Remote_cache:
+    return Remote_cache(tmp_path / 'remote_cache.db', logger, ttl=60.0)
+
+
+def test_fresh_entry_is_used_without_remote_calls(tmp_path, logger, clock):
+    cache, storage = _cache(tmp_path, logger), Remote_storage()
+
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune']
+    clock.now += 59
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune']
+
+    assert (storage.loads, storage.revision_checks) == (1, 1)
+    assert cache.stats['memory_hits'] == 1
+
+
+def test_expired_entry_with_same_revision_is_revalidated(tmp_path, logger, clock):
+    cache, storage = _cache(tmp_path, logger), Remote_storage()
+    cache.get('yandex:find:dune', storage.load, storage.get_revision)
+
+    clock.now += 61
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune']
+    clock.now += 30  # revalidation started new TTL
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune']
+
+    assert (storage.loads, storage.revision_checks) == (1, 2)
+    assert cache.stats['revalidated'] == 1
+
+
+def test_expired_entry_with_new_revision_is_loaded_again(tmp_path, logger, clock):
+    cache, storage = _cache(tmp_path, logger), Remote_storage()
+    cache.get('yandex:find:dune', storage.load, storage.get_revision)
+    storage.value, storage.revision = ['Dune', 'Dune Messiah'], 'r2'
+
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune']  # still fresh
+    clock.now += 61
+    assert cache.get('yandex:find:dune', storage.load, storage.get_revision) == ['Dune', 'Dune Messiah']
+
+    assert storage.loads == 2
+    assert cache.stats['misses'] == 2
+
+
+def test_entries_survive_restart_and_are_invalidated_by_prefix(tmp_path, logger, clock):
+    storage = Remote_storage()
+    _cache(tmp_path, logger).get('yandex:get:dune', storage.load, storage.get_revision)
+
+    cache = _cache(tmp_path, logger)
+    assert cache.get('yandex:get:dune', storage.load, storage.get_revision) == ['Dune']
+    assert cache.stats['disk_hits'] == 1
+
+    cache.invalidate('yandex:')
+    assert cache.get('yandex:get:dune', storage.load, storage.get_revision) == ['Dune']
+    assert storage.loads == 2
+
+
+def test_entry_is_loaded_again_when_remote_manifest_changes(tmp_path, logger, clock):
+    disk = Fake_disk()
+    local = tmp_path / 'read.txt'
+    local.write_bytes(b'Dune | Frank Herbert | 2024 | fb2\n')
+    delta_sync = Delta_sync(Client_pool(lambda: disk), local, '/history', tmp_path / 'read.txt.chunks')
+    delta_sync.push()
+    cache = _cache(tmp_path, logger)
+
+    def load() -> str:
+        return delta_sync.pull()[0].decode('utf-8')
+
+    assert cache.get('yandex:history', load, delta_sync.revision).count('\n') == 1
+    clock.now += 61
+    assert cache.get('yandex:history', load, delta_sync.revision).count('\n') == 1
+    assert cache.stats['revalidated'] == 1
+
+    with open(local, 'ab') as read_file:
+        read_file.write(b'Solaris | Stanislaw Lem | 2024 | epub\n')
+    delta_sync.push()
+    clock.now += 61
+
+    assert cache.get('yandex:history', load, delta_sync.revision).count('\n') == 2
+    assert cache.stats['misses'] == 2
@@ -0,0 +1,25 @@
+import os
+
+from core.entities.Copy_engine import Copy_engine
+from core.entities.Snapshot_backup import (
+    Retention_policy,
+    Snapshot_backup
+)
+
+
+def test_prune_removes_expired_snapshots_and_leftovers(tmp_path, logger):
+    source = tmp_path / 'library'
+    (source / 'Lem').mkdir(parents=True)
+    (source / 'Lem' / 'Solaris.fb2').write_bytes(b'solaris')
+    target = tmp_path / 'snapshots'
+    for name in ('2020-01-01_000000', '2020-01-02_000000', '2020-01-03_000000.partial', '2020-01-04_000000.pruned',
+                 '2999-01-01_000000.partial'):
+        (target / name / 'Lem').mkdir(parents=True)
+        (target / name / 'Lem' / 'Solaris.fb2').write_bytes(b'solaris')
+
+    report = Snapshot_backup(source, target, Copy_engine(logger), logger).run(Retention_policy(daily=1, weekly=0))
+
+    # partial snapshot newer than the new one may be created right now by other process
+    assert sorted(os.listdir(target)) == [report.name, '2999-01-01_000000.partial']
+    assert report.pruned == ['2020-01-01_000000', '2020-01-02_000000']
+    assert (target / report.name / 'Lem' / 'Solaris.fb2').read_bytes() == b'solaris'
@@ -0,0 +1,67 @@
+from core.entities.History_record import (
+    History_record,
+    format_history_line
+)
+from core.entities.Trigram_index import Trigram_index
+from core.modules.Kindle_history import Kindle_history
+
+_RECORDS = [History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2'),
+            History_record('Solaris', 'Stanislaw Lem', '-', '2023', 'epub'),
+            History_record('Dune Messiah', 'Frank Herbert', '-', '2024', 'fb2'),
+            History_record('Пикник на обочине', 'Стругацкие', '-', '2024', 'fb2')]
+
+
+def _index(records: list[History_record]) -> Trigram_index:
+    index = Trigram_index(lambda line: records[line - 1])
+    index.add_many(enumerate(records, start=1))
+    return index
+
+
+def _history(config) -> Kindle_history:
+    history = Kindle_history([])
+    history.post_init(config)
+    return history
+
+
+def test_search_returns_line_numbers_in_order_of_lines():
+    index = _index(_RECORDS)
+
+    assert [line for line, _ in index.search('dune')] == [1, 3]
+    assert [record.name for _, record in index.search('HERB')] == ['Dune', 'Dune Messiah']
+    assert [line for line, _ in index.search('обочин')] == [4]
+    assert [line for line, _ in index.search('lem')] == [2]  # short query is checked against every key
+    assert index.search('dunes') == []
+    assert index.search('') == []
+
+
+def test_trigrams_do_not_cross_name_and_author():
+    index = _index([History_record('Dune', 'Frank Herbert', '-', '2023', 'fb2')])
+
+    assert index.search('nefr') == []
+    assert index.search('dune frank') == []
+
+
+def test_removed_records_are_not_found():
+    index = _index(_RECORDS)
+
+    index.remove(1)
+    index.remove(1)
+
+    assert [line for line, _ in index.search('dune')] == [3]
+    assert len(index) == 3
+    assert list(index.entries()) == [1, 2, 3]
+
+
+def test_find_book_sees_appended_and_removed_records(config):
+    with open(config.path_to_read_file(), 'w', encoding='utf-8') as read_file:
+        read_file.writelines(format_history_line(record) for record in _RECORDS[:2])
+    history = _history(config)
+    assert [line for line, _ in history.find_book('dune')] == [1]
+
+    with open(config.path_to_read_file(), 'a', encoding='utf-8') as read_file:  # appended by other process
+        read_file.writelines(format_history_line(record) for record in _RECORDS[2:])
+    assert [(line, record.name) for line, record in history.find_book('dune')] == [(1, 'Dune'), (3, 'Dune Messiah')]
+
+    assert history.remove_book_from_history('Dune') == 1
+    assert [(line, record.name) for line, record in history.find_book('dune')] == [(3, 'Dune Messiah')]
+    assert [line for line, _ in history.find_book('пикник')] == [4]